@@ -1,74 +1,339 @@
-#!/usr/bin/env python3  
+#!/usr/bin/env python3
 # Marllus Lustosa - 07-11-2025
-# python3 CV_metric_final.py vm1_report.sar vm2_report.sar
-
-import subprocess  
-import sys  
-import pandas as pd  
-import numpy as np  
-  
-def load_sar(filename, flag, column):  
-   cmd = f"sadf -d {filename} -- {flag}"  
-   out = subprocess.check_output(cmd, shell=True).decode("utf-8")  
-  
-   df = pd.read_csv(pd.io.common.StringIO(out), sep=';')  
-  
-   # Remove '#' do início da primeira coluna e tira espaços extras  
-   df.columns = df.columns.str.replace('#', '', regex=False).str.strip()  
-  
-   # Troca vírgula decimal por ponto  
-   if column in df.columns:  
-       df[column] = df[column].astype(str).str.replace(',', '.', regex=False)  
-       df[column] = pd.to_numeric(df[column], errors='coerce')  
-       return df[column].dropna()  
-   else:  
-       print(f"[debug] Colunas disponíveis: {list(df.columns)}")  
-       return None  
-  
-def stats(series):  
-   mean = series.mean()  
-   median = series.median()  
-   std = series.std()  
-   cv = std / mean if mean != 0 else np.nan  
-   return mean, median, std, cv  
-  
-def show(metric_name, series):  
-   if series is None:  
-       print(f"{metric_name:<12}:  (coluna não encontrada)")  
-       return  
-      
-   mean, median, std, cv = stats(series)  
-   print(f"{metric_name:<12}: Média={mean:.2f} | Mediana={median:.2f} | Desvio={std:.2f} | CV={cv:.3f}")  
-  
-   if cv <= 0.30:  
-       print("   → Baixa variação → **Use Média**")  
-   elif cv > 1.0:  
-       print("   → Alta variação → **Use Mediana**")  
-   else:  
-       print("   → Variação moderada → Ambas são aceitáveis")  
-  
-def process(vm, name):  
-   print(f"\n=== {name} ===")  
-  
-   show("CPU_User",       load_sar(vm, "-u", "%user"))  
-   show("CPU_System",     load_sar(vm, "-u", "%system"))  
-   show("Mem_Used",       load_sar(vm, "-r", "%memused"))  
-   show("Swap_Used",      load_sar(vm, "-S", "%swpused"))  
-   show("IO_TPS",         load_sar(vm, "-b", "tps"))  
-  
-def main():  
-   if len(sys.argv) != 3:  
-       print("Uso: python3 CV_metric_final.py vm1_report.sar vm2_report.sar")  
-       sys.exit(1)  
-  
-   process(sys.argv[1], "VM1")  
-   process(sys.argv[2], "VM2")  
-  
-   print("""  
-Interpretação do CV:  
- CV <= 0.30  → Média representa bem (baixa variação)  
- CV >  1.00  → Mediana é mais confiável (muita oscilação / picos)  
-""")  
-  
-if __name__ == "__main__":  
-   main()
+# python3 CV_metric_final.py vm1_report.sar vm2_report.sar [...] [--group NOME arq ...] [--jobs N]
+#
+# Roda como hook pós-teste em cada nó: o caminho das estatísticas usa só
+# NumPy (seções como {coluna: array}) e o pandas nunca é importado.
+# Inicialização (interpretador + imports) medida com --timing e mantida
+# abaixo de STARTUP_BUDGET.
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from sar_binary import SAFormatError
+from sar_sampler import read_metrics_file
+from sar_cache import SectionCache, DEFAULT_CACHE_DIR
+from sar_runs import add_run_arguments, resolve_runs
+from sar_stats import RunningStats, merge_stats
+from sar_modes import modes_of_samples, modes_of_stats
+from sar_regimes import steady_state
+from sar_profile import add_profile_arguments, finish_profile, pool_map, stage, start_profile
+
+# Seção correspondente a cada flag do sadf
+SECTION_BY_FLAG = {"-u": "CPU", "-r": "MEMORY", "-S": "SWAP", "-b": "IO"}
+
+# Coluna que identifica a seção no header de cada bloco do `sadf -d`
+SECTION_MARKERS = [("%user", "CPU"), ("%memused", "MEMORY"), ("%swpused", "SWAP"), ("tps", "IO")]
+
+def section_from_header(columns):
+    for marker, section in SECTION_MARKERS:
+        if marker in columns:
+            return section
+    return None
+
+def to_numeric(values):
+    """Textos do sadf (vírgula ou ponto decimal) como float64; inválidos viram NaN."""
+    text = np.char.replace(np.asarray(values, dtype=str), ',', '.')
+    try:
+        return text.astype(np.float64)
+    except ValueError:
+        out = np.full(len(text), np.nan)
+        for i, v in enumerate(text):
+            try:
+                out[i] = float(v)
+            except ValueError:
+                pass
+        return out
+
+def split_sadf_sections(lines):
+    """
+    Separa a saída multi-atividade do `sadf -d` (um header '# ...' por atividade)
+    em {coluna: array} por seção, numa única passada pelas linhas.
+    """
+    sections = {}
+    section, header, rows = None, [], []
+
+    def flush():
+        if section and rows:
+            cols = list(zip(*rows))
+            # hostname, intervalo e horário ficam como texto
+            sections[section] = {name: np.array(col, dtype=object) if i < 3 else to_numeric(col)
+                                 for i, (name, col) in enumerate(zip(header, cols))}
+
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+        if line.startswith('#'):
+            flush()
+            # Remove '#' do início da primeira coluna e tira espaços extras
+            header = [c.strip() for c in line.lstrip('#').split(';')]
+            section, rows = section_from_header(header), []
+            continue
+        if section:
+            parts = line.split(';')
+            if len(parts) == len(header):
+                rows.append(parts)
+    flush()
+    return sections
+
+def load_sar_sadf(filename):
+    # Um único sadf para todas as atividades, lido em streaming
+    cmd = ["sadf", "-d", str(filename), "--", "-u", "-r", "-S", "-b"]
+    with stage('subprocess', child=True, cmd=' '.join(cmd)), \
+            subprocess.Popen(cmd, stdout=subprocess.PIPE, encoding="utf-8", errors="ignore") as proc:
+        with stage('parse') as parsing:
+            sections = split_sadf_sections(proc.stdout)
+            parsing.rows = sum(len(next(iter(cols.values()))) for cols in sections.values())
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return sections
+
+# Identifica as entradas deste script no cache em disco (sar_cache.py)
+CACHE_TAG = "cv"
+
+def read_sar_sections(filename, cache=None):
+    """
+    Lê todas as seções (CPU, MEMORY, SWAP, IO) de um arquivo, como
+    {seção: {coluna: array}}. Usa o cache em disco se houver, senão o leitor
+    binário nativo (report.sar ou arquivo do sar_sampler) e, se o formato não
+    for suportado, o sadf.
+    """
+    if cache is not None:
+        with stage('cache', op='load'):
+            sections = cache.load(filename, CACHE_TAG, frames=False)
+        if sections is not None:
+            return sections
+    try:
+        with stage('read') as reading:
+            _, sections = read_metrics_file(filename)
+            reading.rows = sum(len(cols['epoch']) for cols in sections.values())
+    except SAFormatError:
+        sections = load_sar_sadf(filename)
+    if cache is not None:
+        with stage('cache', op='store'):
+            cache.store(filename, CACHE_TAG, sections)
+    return sections
+
+def file_stats(filename, cache=None, trim=True):
+    """
+    ({métrica: RunningStats}, {métrica: (regimes, início, fim, n)},
+    {métrica: mediana exata}) de um arquivo (None se a coluna não existir).
+    Com `trim`, só o patamar estável (sar_regimes) entra nas estatísticas:
+    aquecimento e desaceleração ficam de fora.
+    Roda no worker: só os acumuladores (e a mediana, calculada aqui enquanto
+    as amostras estão em memória) voltam ao processo principal, as seções
+    lidas são descartadas ao fim de cada arquivo.
+    """
+    sections = read_sar_sections(filename, cache)
+    out, regimes, medians = {}, {}, {}
+    for metric_name, flag, column in CV_METRICS:
+        cols = sections.get(SECTION_BY_FLAG[flag])
+        if cols is None or column not in cols:
+            out[metric_name] = None
+            continue
+        values = np.asarray(cols[column], dtype=float)
+        values = values[np.isfinite(values)]
+        if trim:
+            with stage('regimes', rows=len(values), metric=metric_name):
+                steady, n_regimes, start, end = steady_state(values)
+            regimes[metric_name] = (n_regimes, start, end, len(values))
+            values = steady
+        with stage('stats', rows=len(values), metric=metric_name):
+            out[metric_name] = RunningStats.from_values(values)
+            medians[metric_name] = exact_median(values)
+    return out, regimes, medians
+
+def collect_stats(filenames, jobs=None, cache=None, trim=True):
+    # Lê os arquivos em paralelo (um por processo); resultado na ordem recebida
+    filenames = [str(f) for f in filenames]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(filenames)))
+    if jobs == 1:
+        return [file_stats(f, cache, trim) for f in filenames]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return pool_map(executor, file_stats, filenames, [cache] * len(filenames),
+                        [trim] * len(filenames))
+
+def exact_median(values):
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    return float(np.median(values)) if len(values) else np.nan
+
+def stats(series, median=None):
+    """
+    Média, mediana, desvio e CV numa passada (série ou RunningStats já acumulado).
+    A mediana é exata (np.median) para uma série ou quando vem em `median`;
+    de um RunningStats sozinho é a estimativa do t-digest.
+    """
+    acc = series if isinstance(series, RunningStats) else RunningStats.from_values(series)
+    mean = acc.mean if acc.count else np.nan
+    if median is None:
+        median = acc.quantile(0.5) if isinstance(series, RunningStats) else exact_median(series)
+    std = acc.std
+    cv = std / mean if mean != 0 else np.nan
+    return mean, median, std, cv
+
+def median_label(exact):
+    # ≈ marca a mediana estimada pelo t-digest (acumuladores combinados)
+    return "Mediana=" if exact else "Mediana≈"
+
+def show(metric_name, series, modes=None, regime=None, median=None):
+    """
+    `modes`: nº de modos da distribuição (sar_modes); calculado aqui se não vier.
+    `regime`: (regimes, início, fim, n) do recorte do patamar (file_stats).
+    `median`: mediana exata (file_stats); sem ela, a de um RunningStats é aproximada.
+    """
+    if series is None:
+        print(f"{metric_name:<12}:  (coluna não encontrada)")
+        return
+
+    exact = median is not None or not isinstance(series, RunningStats)
+    mean, median, std, cv = stats(series, median)
+    if modes is None:
+        modes = (modes_of_stats([series]) if isinstance(series, RunningStats)
+                 else modes_of_samples([series]))[0]
+    print(f"{metric_name:<12}: Média={mean:.2f} | {median_label(exact)}{median:.2f} | Desvio={std:.2f} | CV={cv:.3f}"
+          f" | Modos={modes}")
+
+    if regime is not None and (regime[1] > 0 or regime[2] < regime[3]):
+        n_regimes, start, end, n = regime
+        print(f"   → {n_regimes} regimes: usadas as amostras {start + 1}-{end} de {n} "
+              f"(aquecimento/desaceleração descartados)")
+    if modes > 1:
+        # Vários patamares: a média pode cair entre eles, mesmo com CV baixo
+        print(f"   → Distribuição multimodal ({modes} modos) → **Use Mediana** e percentis (veja o boxplot)")
+    elif cv <= 0.30:
+        print("   → Baixa variação → **Use Média**")
+    elif cv > 1.0:
+        print("   → Alta variação → **Use Mediana**")
+    else:
+        print("   → Variação moderada → Ambas são aceitáveis")
+
+# Métricas analisadas: (nome, flag do sar, coluna)
+CV_METRICS = [
+    ("CPU_User",   "-u", "%user"),
+    ("CPU_System", "-u", "%system"),
+    ("Mem_Used",   "-r", "%memused"),
+    ("Swap_Used",  "-S", "%swpused"),
+    ("IO_TPS",     "-b", "tps"),
+]
+
+def process(vm, name, metric_stats=None, modes=None, regimes=None, medians=None, trim=True):
+    """
+    Imprime as métricas de uma run; `metric_stats`, `regimes` e `medians` (de
+    file_stats) evitam reler o arquivo e `modes` ({métrica: nº de modos})
+    recalcular os modos.
+    """
+    print(f"\n=== {name} ===")
+
+    if metric_stats is None:
+        metric_stats, regimes, medians = file_stats(vm, trim=trim)
+    for metric_name, _, _ in CV_METRICS:
+        show(metric_name, metric_stats.get(metric_name), (modes or {}).get(metric_name),
+             (regimes or {}).get(metric_name), (medians or {}).get(metric_name))
+
+def count_all_modes(stats):
+    """{chave: nº de modos} de {chave: RunningStats}, numa única passada vetorizada."""
+    keys = list(stats)
+    return dict(zip(keys, modes_of_stats([stats[k] for k in keys]).tolist()))
+
+def show_summary(stats, title, medians=None):
+    """
+    Tabela a partir de {(run ou grupo, métrica): RunningStats}; `medians`
+    ({mesma chave: mediana exata}) substitui a estimativa do t-digest.
+    """
+    print(f"\n=== {title} ===")
+    modes = count_all_modes(stats)
+    medians = medians or {}
+    for (key, metric_name), acc in stats.items():
+        r = acc.as_row()
+        exact = (key, metric_name) in medians
+        median = medians[(key, metric_name)] if exact else r['median']
+        print(f"{key:<12} {metric_name:<12}: Média={r['mean']:.2f} | {median_label(exact)}{median:.2f} | "
+              f"P95={r['p95']:.2f} | P99={r['p99']:.2f} | Desvio={r['std']:.2f} | CV={r['cv']:.3f}"
+              f" | Modos={modes[(key, metric_name)]}")
+
+# Orçamento de inicialização (s de CPU até main: interpretador + imports).
+# Só NumPy: ~0.2 s; com o pandas passaria de 0.6 s, mais que o cálculo em si.
+STARTUP_BUDGET = 0.3
+
+def show_timing(startup, total):
+    """Tempos de CPU do processo (time.process_time) na inicialização e no fim."""
+    print(f"Tempo: inicialização {startup * 1000:.0f} ms (orçamento {STARTUP_BUDGET * 1000:.0f} ms), "
+          f"total {total * 1000:.0f} ms (processo principal)")
+    if startup > STARTUP_BUDGET:
+        heavy = [m for m in ('pandas', 'matplotlib') if m in sys.modules]
+        print(f"   → Inicialização acima do orçamento" + (f" ({', '.join(heavy)} importado)" if heavy else ""))
+
+def main():
+    ap = argparse.ArgumentParser(description="Média, mediana e CV das métricas do sar")
+    add_run_arguments(ap)
+    ap.add_argument("-j", "--jobs", type=int, default=None,
+                    help="processos para ler os arquivos em paralelo (padrão: nº de CPUs)")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                    help="diretório do cache de dados já parseados")
+    ap.add_argument("--no-cache", action="store_true", help="não usa o cache em disco")
+    ap.add_argument("--no-trim", action="store_true",
+                    help="usa a captura inteira (sem descartar aquecimento/desaceleração)")
+    ap.add_argument("--timing", action="store_true",
+                    help="mostra o tempo de inicialização (interpretador + imports) e o total")
+    add_profile_arguments(ap)
+    args = ap.parse_args()
+    startup = time.process_time()
+    start_profile(args)
+
+    try:
+        runs = resolve_runs(args.files, args.group)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    if not runs:
+        print("Uso: python3 CV_metric_final.py vm1_report.sar vm2_report.sar [...] [--group NOME arq ...]")
+        sys.exit(1)
+
+    cache = None if args.no_cache else SectionCache(args.cache_dir)
+    # Só os acumuladores de cada arquivo ficam em memória (não as amostras)
+    with stage('load'):
+        collected = collect_stats([path for _, _, path in runs], jobs=args.jobs, cache=cache,
+                                  trim=not args.no_trim)
+    per_file = [metric_stats for metric_stats, _, _ in collected]
+    # Modos de todas as métricas de todas as runs de uma vez
+    with stage('modes'):
+        modes = count_all_modes({(i, m): acc for i, metric_stats in enumerate(per_file)
+                                 for m, acc in metric_stats.items() if acc is not None and acc.count})
+    for i, ((label, _, path), (metric_stats, regimes, medians)) in enumerate(zip(runs, collected)):
+        process(str(path), label, metric_stats,
+                {m: modes[(i, m)] for m, _, _ in CV_METRICS if (i, m) in modes}, regimes, medians)
+
+    # Visão consolidada quando há mais de duas runs ou grupos
+    if len(runs) > 2 or args.group:
+        by_run = {(label, m): acc for (label, _, _), metric_stats in zip(runs, per_file)
+                  for m, acc in metric_stats.items() if acc is not None and acc.count}
+        run_medians = {(label, m): median for (label, _, _), (_, _, medians) in zip(runs, collected)
+                       for m, median in medians.items()}
+        show_summary(by_run, "RESUMO POR RUN", run_medians)
+        if args.group:
+            by_group = {}
+            for (label, group, _), metric_stats in zip(runs, per_file):
+                for m, acc in metric_stats.items():
+                    if acc is not None and acc.count:
+                        by_group.setdefault((group or label, m), []).append(acc)
+            show_summary({k: merge_stats(v) for k, v in by_group.items()}, "RESUMO POR GRUPO")
+
+    print("""
+Interpretação do CV:
+ CV <= 0.30  → Média representa bem (baixa variação)
+ CV >  1.00  → Mediana é mais confiável (muita oscilação / picos)
+ Modos >  1  → Distribuição multimodal: a média pode não representar nenhum patamar
+""")
+    if args.timing:
+        show_timing(startup, time.process_time())
+    finish_profile(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+sar_align.py
+Alinhamento temporal entre runs.
+
+Cada run começa num horário diferente e pode ter intervalo de coleta diferente
+ou amostras perdidas; comparar pela posição da linha desalinha as séries. Aqui
+cada série passa a tempo relativo ao início da própria run (segundos, com
+fração nas coletas abaixo de 1 s) e todas são reamostradas por interpolação
+linear (np.interp) numa grade comum. Trechos sem amostras por mais de
+`max_gap` ficam NaN em vez de serem interpolados.
+"""
+
+import numpy as np
+
+
+def median_interval(epoch):
+    """Intervalo típico de coleta (s) de uma série de epoch."""
+    if len(epoch) < 2:
+        return 1.0
+    d = np.diff(np.asarray(epoch, dtype=np.float64))
+    d = d[d > 0]
+    return float(np.median(d)) if len(d) else 1.0
+
+
+def common_grid(epochs, step=None, max_points=None):
+    """
+    Grade de tempo relativo (s) comum a várias runs: de 0 até a maior duração,
+    com passo `step` ou, por padrão, o maior intervalo típico entre as runs
+    (a resolução que todas têm). `max_points` aumenta o passo se a grade
+    ficar maior que isso.
+    """
+    epochs = [np.asarray(e, dtype=np.float64) for e in epochs if len(e)]
+    if not epochs:
+        return np.empty(0)
+    duration = max(float(e[-1] - e[0]) for e in epochs)
+    if step is None:
+        step = max(median_interval(e) for e in epochs)
+    step = max(float(step), 1e-9)
+    if max_points and duration / step + 1 > max_points:
+        step = duration / max(max_points - 1, 1)
+    return np.arange(0.0, duration + step / 2, step)
+
+
+def align_values(epoch, values, grid, max_gap=None):
+    """
+    Reamostra `values` (nos instantes `epoch`) na grade relativa `grid`.
+    Pontos fora da run, ou em buracos maiores que `max_gap` (padrão: 3x o
+    intervalo típico), ficam NaN.
+    """
+    epoch = np.asarray(epoch, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(grid), np.nan)
+    if len(epoch) == 0:
+        return out
+    rel = epoch - epoch[0]
+    valid = np.isfinite(values)
+    rel, values = rel[valid], values[valid]
+    if len(rel) == 0:
+        return out
+    if len(rel) == 1:
+        out[np.isclose(grid, rel[0])] = values[0]
+        return out
+
+    out = np.interp(grid, rel, values, left=np.nan, right=np.nan)
+    if max_gap is None:
+        max_gap = 3 * median_interval(epoch)
+    idx = np.searchsorted(rel, grid, side='right')
+    left = rel[np.clip(idx - 1, 0, len(rel) - 1)]
+    right = rel[np.clip(idx, 0, len(rel) - 1)]
+    out[(right - left) > max_gap] = np.nan
+    return out
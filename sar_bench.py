@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+sar_bench.py
+Benchmark das etapas do pipeline com dados sintéticos (sar_synth.py).
+
+  python3 sar_bench.py run [--sizes 1000 100000 10000000] [--locale pt] [--clock 12h] [--cpus 4] [--disks 2]
+  python3 sar_bench.py report [--threshold 0.1]
+
+Para cada tamanho (intervalos por métrica) gera, uma vez, o texto do sar e o
+CSV do sadf (guardados em --workdir) e mede cada etapa:
+
+  parse   SARDataParser2.parse_sar_output sobre o texto do sar (em streaming)
+  sadf    split_sadf_sections do CV_metric_final (o fallback via sadf)
+  stats   CV_metric_final.stats de cada métrica (média/mediana/desvio/CV)
+  plot    figura de séries temporais (time_series_tasks + render, backend Agg)
+
+O tempo é o melhor de --repeat execuções; o pico de memória (tracemalloc,
+que também contabiliza os arrays do NumPy) vem de uma execução à parte, para
+o custo do rastreamento não entrar no tempo.
+
+Cada medição vira uma linha JSON em --output (padrão bench_results.jsonl), com
+a versão do código (git describe), então execuções de versões diferentes se
+acumulam no mesmo arquivo; `report` compara a versão mais recente com a
+anterior e marca as etapas que ficaram mais lentas que --threshold (etapas
+abaixo de MIN_SECONDS não contam: a diferença é ruído).
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from sar_cache import DEFAULT_CACHE_DIR
+from sar_synth import CLOCKS, LOCALES, SYNTH_VERSION, generate_sadf, generate_sar, write
+
+DEFAULT_SIZES = [1000, 100000, 10000000]
+STAGES = ('parse', 'sadf', 'stats', 'plot')
+DEFAULT_OUTPUT = 'bench_results.jsonl'
+DEFAULT_WORKDIR = DEFAULT_CACHE_DIR / 'bench'
+# Etapa mais lenta que a versão anterior por mais que isso (fração) é regressão
+DEFAULT_THRESHOLD = 0.10
+# Abaixo disso (s) a diferença entre versões é ruído de medição
+MIN_SECONDS = 0.05
+
+
+def code_version():
+    """git describe do diretório do script (ou 'desconhecida' fora de um repositório)."""
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'],
+                                       cwd=Path(__file__).resolve().parent, encoding='utf-8',
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecida'
+
+
+def environment():
+    import numpy as np
+    import pandas as pd
+    import matplotlib
+
+    return {'host': platform.node(), 'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'matplotlib': matplotlib.__version__, 'cpus': os.cpu_count()}
+
+
+# -----------------------
+# Dados sintéticos
+# -----------------------
+def synth_files(workdir, rows, locale, clock, cpus, disks=0):
+    """(texto do sar, CSV do sadf) para `rows` intervalos, gerados só na primeira vez."""
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    stem = f'synth-v{SYNTH_VERSION}-{rows}-{locale}-{clock}-{cpus}-{disks}'
+    sar, sadf = workdir / f'{stem}.txt', workdir / f'{stem}.csv'
+    for path, chunks in ((sar, lambda: generate_sar(rows, cpus, locale, clock, disks=disks)),
+                         (sadf, lambda: generate_sadf(rows, locale))):
+        if not path.exists():
+            started = time.perf_counter()
+            tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+            size = write(chunks(), tmp)
+            os.replace(tmp, path)
+            print(f"  gerado {path.name} ({size / 1e6:.1f} MB) em {time.perf_counter() - started:.1f}s")
+    return sar, sadf
+
+
+# -----------------------
+# Etapas
+# -----------------------
+# Cada etapa recebe o contexto (arquivos e resultados das etapas anteriores)
+# e devolve o que as seguintes precisam.
+def stage_parse(ctx):
+    from sar_visualize import SARDataParser2
+
+    parser = SARDataParser2()
+    with open(ctx['sar'], encoding='utf-8') as f:
+        parser.parse_sar_output(f, 'VM1')
+    return parser
+
+
+def stage_sadf(ctx):
+    from CV_metric_final import split_sadf_sections
+
+    with open(ctx['sadf'], encoding='utf-8') as f:
+        return split_sadf_sections(f)
+
+
+def stage_stats(ctx):
+    from CV_metric_final import CV_METRICS, SECTION_BY_FLAG, stats
+
+    sections = ctx['sadf_result']
+    return {name: stats(sections[SECTION_BY_FLAG[flag]][column])
+            for name, flag, column in CV_METRICS if column in sections.get(SECTION_BY_FLAG[flag], {})}
+
+
+def stage_plot(ctx):
+    from sar_render import use_batch_backend
+    from sar_visualize import time_series_tasks
+
+    use_batch_backend()
+    fn, kwargs = time_series_tasks(ctx['parse_result'], ['VM1'])
+    kwargs['filename'] = str(Path(ctx['workdir']) / 'bench_series')
+    return fn(**kwargs)
+
+
+STAGE_FUNCS = {'parse': stage_parse, 'sadf': stage_sadf, 'stats': stage_stats, 'plot': stage_plot}
+# Resultado de qual etapa cada uma usa
+STAGE_DEPENDS = {'stats': 'sadf', 'plot': 'parse'}
+
+
+def measure(fn, ctx, repeat=1, memory=True):
+    """(resultado, melhor tempo em s, pico de memória em bytes ou None)."""
+    best, result = None, None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = fn(ctx)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(ctx)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, best, peak
+
+
+def run_size(rows, stages, args, meta):
+    """Mede as etapas para um tamanho; devolve os registros (dicts)."""
+    print(f"\n{rows} intervalos ({args.locale}, {args.clock}, {args.cpus} núcleos, {args.disks} discos)")
+    sar, sadf = synth_files(args.workdir, rows, args.locale, args.clock, args.cpus, args.disks)
+    ctx = {'sar': sar, 'sadf': sadf, 'workdir': args.workdir}
+    needed = set(stages) | {STAGE_DEPENDS[s] for s in stages if s in STAGE_DEPENDS}
+    records = []
+    for stage in STAGES:
+        if stage not in needed:
+            continue
+        result, seconds, peak = measure(STAGE_FUNCS[stage], ctx, args.repeat, args.memory and stage in stages)
+        ctx[f'{stage}_result'] = result
+        if stage not in stages:
+            continue
+        record = {**meta, 'stage': stage, 'rows': rows, 'locale': args.locale, 'clock': args.clock,
+                  'cpus_synth': args.cpus, 'disks_synth': args.disks, 'seconds': seconds, 'rows_per_s': rows / seconds if seconds else None,
+                  'peak_mb': peak / 1e6 if peak is not None else None}
+        records.append(record)
+        mem = f", pico {record['peak_mb']:.1f} MB" if peak is not None else ""
+        print(f"  {stage:<6}: {seconds:8.3f}s ({record['rows_per_s']:,.0f} intervalos/s{mem})")
+    return records
+
+
+# -----------------------
+# Relatório
+# -----------------------
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def report(records, threshold=DEFAULT_THRESHOLD):
+    """
+    Por (etapa, tamanho, locale, relógio, núcleos, discos): tempo da versão mais
+    recente contra o da anterior. Retorna o nº de regressões.
+    """
+    by_case = {}
+    for r in records:
+        case = (r['stage'], r['rows'], r['locale'], r['clock'], r.get('cpus_synth', 0), r.get('disks_synth', 0))
+        by_case.setdefault(case, []).append(r)
+
+    regressions = 0
+    print(f"{'etapa':<6} {'intervalos':>10} {'variante':<12} {'versão':<18} {'tempo':>9} "
+          f"{'anterior':>9} {'Δ':>7} {'pico MB':>8}")
+    for case in sorted(by_case, key=lambda c: (STAGES.index(c[0]) if c[0] in STAGES else 99, c[1:])):
+        runs = sorted(by_case[case], key=lambda r: r['date'])
+        # Melhor tempo de cada versão, versões na ordem da primeira medição
+        best = {}
+        for r in runs:
+            if r['version'] not in best or r['seconds'] < best[r['version']]['seconds']:
+                best[r['version']] = r
+        versions = list(dict.fromkeys(r['version'] for r in runs))
+        last = best[versions[-1]]
+        prev = best[versions[-2]] if len(versions) > 1 else None
+        change, flag = "", ""
+        if prev:
+            delta = last['seconds'] / prev['seconds'] - 1 if prev['seconds'] else 0.0
+            change = f"{delta:+.0%}"
+            if delta > threshold and last['seconds'] >= MIN_SECONDS:
+                flag = "  ← regressão"
+                regressions += 1
+        stage, rows, locale, clock, cpus, disks = case
+        peak = f"{last['peak_mb']:8.1f}" if last.get('peak_mb') is not None else f"{'-':>8}"
+        before = f"{prev['seconds']:.3f}s" if prev else "-"
+        variant = f"{locale}/{clock}/{cpus}/{disks}"
+        print(f"{stage:<6} {rows:>10} {variant:<12} {last['version']:<18} "
+              f"{last['seconds']:8.3f}s {before:>9} {change:>7} {peak}{flag}")
+    return regressions
+
+
+# -----------------------
+# Main
+# -----------------------
+def cmd_run(args):
+    stages = args.stages or list(STAGES)
+    meta = {'version': args.label or code_version(), 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            **environment()}
+    print(f"Versão {meta['version']} - Python {meta['python']}, NumPy {meta['numpy']}, pandas {meta['pandas']}")
+    records = []
+    for rows in args.sizes:
+        records += run_size(rows, stages, args, meta)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r) + '\n')
+    print(f"\n{len(records)} medições acrescentadas em '{args.output}'")
+
+
+def cmd_report(args):
+    try:
+        records = load_results(args.output)
+    except FileNotFoundError:
+        print(f"Arquivo não encontrado: {args.output}")
+        sys.exit(1)
+    regressions = report(records, args.threshold)
+    if regressions:
+        print(f"\n{regressions} etapa(s) mais lenta(s) que a versão anterior em mais de {args.threshold:.0%}")
+        sys.exit(2)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark do pipeline com saídas sintéticas do sar")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="mede as etapas e acrescenta os resultados em --output")
+    run.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="intervalos por métrica")
+    run.add_argument("--stages", nargs="+", choices=STAGES, default=None, help="etapas (padrão: todas)")
+    run.add_argument("--locale", choices=sorted(LOCALES), default='en')
+    run.add_argument("--clock", choices=CLOCKS, default='24h')
+    run.add_argument("--cpus", type=int, default=0, help="linhas por núcleo (sar -P ALL) no texto gerado")
+    run.add_argument("--disks", type=int, default=0, help="dispositivos da seção DISK (sar -d) no texto gerado")
+    run.add_argument("--repeat", type=int, default=1, help="execuções por etapa (vale o melhor tempo)")
+    run.add_argument("--no-memory", dest="memory", action="store_false",
+                     help="não mede o pico de memória (uma execução a menos por etapa)")
+    run.add_argument("--workdir", type=Path, default=DEFAULT_WORKDIR, help="onde ficam os arquivos gerados")
+    run.add_argument("--label", default=None, help="nome da versão (padrão: git describe)")
+    run.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    run.set_defaults(func=cmd_run)
+
+    rep = sub.add_parser("report", help="compara a versão mais recente com a anterior")
+    rep.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    rep.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                     help="aumento de tempo (fração) considerado regressão")
+    rep.set_defaults(func=cmd_report)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+sar_binary.py
+Leitor nativo dos arquivos binários do sysstat (saDD / report.sar).
+
+Lê diretamente os registros gravados por:
+  sar -u -P ALL -r -S -b -d -n DEV -o report.sar 1 60
+
+sem executar `sar`/`sadf`. Os contadores brutos de CPU (total e por núcleo),
+memória, swap e I/O são decodificados com struct/NumPy em arrays colunares e
+convertidos nas mesmas colunas que o `sar` imprime (%user, %memused, %swpused,
+tps, ...). Discos (-d) e interfaces (-n DEV) não são decodificados aqui: ficam
+listados em header['text_sections'] para quem chama lê-los via `sar`.
+
+Suporta o formato de arquivo do sysstat >= 11.7.1 (FORMAT_MAGIC 0x2175), em
+qualquer endianness. Para qualquer outro formato é levantado SAFormatError,
+e quem chama deve cair no caminho via subprocesso (sar/sadf).
+"""
+
+import struct
+import numpy as np
+
+# -----------------------
+# Constantes do formato (sa.h)
+# -----------------------
+SYSSTAT_MAGIC = 0xd596
+SYSSTAT_MAGIC_SWAPPED = 0x96d5
+FORMAT_MAGIC = 0x2175
+
+FILE_MAGIC_SIZE = 76       # 8 bytes de versão + 5 unsigned int + 48 de padding
+UTSNAME_LEN = 65
+MAX_COMMENT_LEN = 64
+
+# Tipos de registro
+R_STATS = 1
+R_RESTART = 2
+R_COMMENT = 4
+
+# Atividades (id -> seção, nº de campos unsigned long long esperados)
+A_CPU = 1
+A_IO = 6
+A_MEMORY = 7
+A_DISK = 11
+A_NET_DEV = 12
+
+KNOWN_ACTIVITIES = {
+    A_CPU: ('CPU', 10),
+    A_IO: ('IO', 7),
+    A_MEMORY: ('MEMORY', 17),
+}
+
+# Atividades por dispositivo que este leitor não decodifica (seção do parser de texto)
+TEXT_ACTIVITIES = {
+    A_DISK: 'DISK',
+    A_NET_DEV: 'NET',
+}
+
+
+class SAFormatError(Exception):
+    """Arquivo não é um sa file suportado por este leitor."""
+
+
+class SATruncatedError(SAFormatError):
+    """Cabeçalho ainda incompleto (arquivo recém-criado pelo sadc)."""
+
+
+# -----------------------
+# Leitura do cabeçalho
+# -----------------------
+def _detect_endian(buf):
+    if len(buf) < FILE_MAGIC_SIZE:
+        raise SATruncatedError("arquivo muito curto para ser um sa file")
+    magic = struct.unpack_from('<H', buf, 0)[0]
+    if magic == SYSSTAT_MAGIC:
+        return '<'
+    if magic == SYSSTAT_MAGIC_SWAPPED:
+        return '>'
+    raise SAFormatError(f"magic inválido: 0x{magic:04x}")
+
+
+def read_sa_header(buf):
+    """
+    Decodifica file_magic, file_header e a lista de file_activity.
+    Retorna dict com endianness, versão, offsets e atividades.
+    """
+    e = _detect_endian(buf)
+    (_, format_magic, ver, patch, sub, extra,
+     header_size) = struct.unpack_from(e + 'HHBBBBI', buf, 0)
+    if format_magic != FORMAT_MAGIC:
+        raise SAFormatError(
+            f"formato 0x{format_magic:04x} (sysstat {ver}.{patch}.{sub}) não suportado")
+
+    pos = FILE_MAGIC_SIZE
+    if len(buf) < pos + header_size:
+        raise SATruncatedError("cabeçalho truncado")
+
+    sa_cpu_nr, sa_act_nr, sa_year = struct.unpack_from(e + 'III', buf, pos + 16)
+    act_size, rec_size, extra_next = struct.unpack_from(e + 'III', buf, pos + 52)
+    sa_day, sa_month = struct.unpack_from(e + 'BB', buf, pos + 64)
+    node_off = pos + 67 + UTSNAME_LEN
+    nodename = buf[node_off:node_off + UTSNAME_LEN].split(b'\0', 1)[0].decode('utf-8', 'ignore')
+    if extra_next:
+        raise SAFormatError("estruturas extras no cabeçalho não suportadas")
+    if not (0 < sa_act_nr < 256) or act_size < 36 or rec_size < 24:
+        raise SAFormatError("cabeçalho inconsistente")
+    pos += header_size
+
+    activities = []
+    for _ in range(sa_act_nr):
+        if len(buf) < pos + act_size:
+            raise SATruncatedError("lista de atividades truncada")
+        (act_id, _magic, nr_ini, nr2, has_nr, size,
+         ull_nr, ul_nr, u_nr) = struct.unpack_from(e + 'IIiiiiIII', buf, pos)
+        if act_id in KNOWN_ACTIVITIES:
+            section, expected_ull = KNOWN_ACTIVITIES[act_id]
+            if ull_nr != expected_ull or ul_nr or u_nr or size < 8 * ull_nr:
+                raise SAFormatError(
+                    f"layout inesperado para {section}: {ull_nr}/{ul_nr}/{u_nr} campos")
+        activities.append({
+            'id': act_id, 'nr_ini': nr_ini, 'nr2': max(nr2, 1),
+            'has_nr': bool(has_nr), 'size': size, 'ull_nr': ull_nr,
+        })
+        pos += act_size
+
+    return {
+        'endian': e,
+        'version': f"{ver}.{patch}.{sub}",
+        'cpu_nr': sa_cpu_nr,
+        'date': (sa_year + 1900, sa_month + 1, sa_day),
+        'nodename': nodename,
+        'rec_size': rec_size,
+        'activities': activities,
+        'text_sections': [TEXT_ACTIVITIES[a['id']] for a in activities if a['id'] in TEXT_ACTIVITIES],
+        'data_offset': pos,
+    }
+
+
+# -----------------------
+# Leitura dos registros
+# -----------------------
+def _read_records(buf, hdr, pos=None, new_segment=True):
+    """
+    Percorre os registros a partir de `pos` (padrão: início dos dados) e devolve
+    arrays brutos:
+      uptime_cs, ust_time, seg_start (primeiro registro após início/RESTART)
+      e, para cada atividade conhecida, uma lista com um array (itens, campos)
+      de contadores por registro (CPU: item 0 = "all", depois um por núcleo);
+    mais a posição logo após o último registro completo e se o próximo
+    registro inicia um segmento (para continuar a leitura dali depois).
+    """
+    e = hdr['endian']
+    rec_size = hdr['rec_size']
+    acts = hdr['activities']
+    rec_fmt = struct.Struct(e + 'QQIBBBB')
+    nr_fmt = struct.Struct(e + 'i')
+    ull = np.dtype(e + 'u8')
+    known = {a['id']: a for a in acts if a['id'] in KNOWN_ACTIVITIES}
+    zeros = {act_id: np.zeros((1, a['ull_nr']), dtype=ull) for act_id, a in known.items()}
+
+    uptime, ust, seg_start = [], [], []
+    values = {act_id: [] for act_id in known}
+    pos = hdr['data_offset'] if pos is None else pos
+    end = len(buf)
+
+    def result(stop):
+        return uptime, ust, seg_start, values, stop, new_segment
+
+    while pos + rec_size <= end:
+        rec_start = pos
+        uptime_cs, ust_time, rec_extra, rtype, _h, _m, _s = rec_fmt.unpack_from(buf, pos)
+        pos += rec_size
+        if rec_extra:
+            raise SAFormatError("estruturas extras em registro não suportadas")
+
+        if rtype == R_COMMENT:
+            if pos + MAX_COMMENT_LEN > end:
+                return result(rec_start)
+            pos += MAX_COMMENT_LEN
+            continue
+        if rtype == R_RESTART:
+            # Após um RESTART o sadc grava o novo número de CPUs
+            if pos + nr_fmt.size > end:
+                return result(rec_start)
+            pos += nr_fmt.size
+            new_segment = True
+            continue
+        if rtype != R_STATS:
+            raise SAFormatError(f"tipo de registro desconhecido: {rtype}")
+
+        row = {}
+        for a in acts:
+            if a['has_nr']:
+                if pos + nr_fmt.size > end:
+                    return result(rec_start)
+                nr = nr_fmt.unpack_from(buf, pos)[0]
+                pos += nr_fmt.size
+            else:
+                nr = a['nr_ini']
+            nbytes = nr * a['nr2'] * a['size']
+            if nr < 0 or pos + nbytes > end:
+                # Registro incompleto (arquivo ainda sendo gravado)
+                return result(rec_start)
+            if a['id'] in known and nr > 0:
+                # Os campos unsigned long long ficam no início de cada item
+                row[a['id']] = np.ndarray((nr * a['nr2'], a['ull_nr']), dtype=ull, buffer=buf,
+                                          offset=pos, strides=(a['size'], 8)).copy()
+            pos += nbytes
+
+        uptime.append(uptime_cs)
+        ust.append(ust_time)
+        seg_start.append(new_segment)
+        for act_id, vals in values.items():
+            vals.append(row.get(act_id, zeros[act_id]))
+        new_segment = False
+
+    return result(pos)
+
+
+# -----------------------
+# Conversão para as colunas do sar
+# -----------------------
+def _pct(num, den):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.where(den > 0, num * 100.0 / den, 0.0)
+    return out
+
+
+def _stack_items(rows):
+    """Lista de arrays (itens, campos) -> array (registros, itens, campos), com zeros nos itens ausentes."""
+    n_items = max(r.shape[0] for r in rows)
+    out = np.zeros((len(rows), n_items, rows[0].shape[1]), dtype=np.int64)
+    for i, r in enumerate(rows):
+        out[i, :r.shape[0]] = r
+    return out
+
+
+def _cpu_columns(d, entity):
+    # stats_cpu: user nice sys idle iowait steal hardirq softirq guest guest_nice
+    d = np.maximum(d, 0).astype(np.float64)
+    user, nice, sys_, idle, iowait, steal, hardirq, softirq, guest, guest_nice = d.T
+    total = user + nice + sys_ + idle + iowait + steal + hardirq + softirq
+    return {
+        'CPU': entity,
+        '%user': _pct(user - guest, total),
+        '%nice': _pct(nice - guest_nice, total),
+        '%system': _pct(sys_ + hardirq + softirq, total),
+        '%iowait': _pct(iowait, total),
+        '%steal': _pct(steal, total),
+        '%idle': _pct(idle, total),
+    }
+
+
+def _io_columns(raw, cur, prev, itv):
+    # stats_io: tps rtps wtps rblk wblk dtps dblk
+    d = np.maximum(raw[cur] - raw[prev], 0).astype(np.float64)
+    tps, rtps, wtps, rblk, wblk, dtps, dblk = d.T
+    return {
+        'tps': tps / itv,
+        'rtps': rtps / itv,
+        'wtps': wtps / itv,
+        'dtps': dtps / itv,
+        'bread/s': rblk / itv,
+        'bwrtn/s': wblk / itv,
+        'bdscd/s': dblk / itv,
+    }
+
+
+def _memory_columns(raw, cur):
+    # stats_memory: frmkb bufkb camkb tlmkb frskb tlskb caskb comkb activekb
+    #               inactkb dirtykb anonpgkb slabkb kstackkb pgtblkb vmusedkb availablekb
+    m = raw[cur].astype(np.float64)
+    (frmkb, bufkb, camkb, tlmkb, frskb, tlskb, caskb, comkb, activekb,
+     inactkb, dirtykb, _anon, slabkb, _kstack, _pgtbl, _vmused, availablekb) = m.T
+
+    nousedmem = frmkb + bufkb + camkb + slabkb
+    nousedmem = np.where(nousedmem > tlmkb, frmkb, nousedmem)
+    memused = tlmkb - nousedmem
+    swpused = tlskb - frskb
+
+    memory = {
+        'kbmemfree': frmkb,
+        'kbavail': availablekb,
+        'kbmemused': memused,
+        '%memused': _pct(memused, tlmkb),
+        'kbbuffers': bufkb,
+        'kbcached': camkb,
+        'kbcommit': comkb,
+        '%commit': _pct(comkb, tlmkb + tlskb),
+        'kbactive': activekb,
+        'kbinact': inactkb,
+        'kbdirty': dirtykb,
+    }
+    swap = {
+        'kbswpfree': frskb,
+        'kbswpused': swpused,
+        '%swpused': _pct(swpused, tlskb),
+        'kbswpcad': caskb,
+        '%swpcad': _pct(caskb, swpused),
+    }
+    return memory, swap
+
+
+def _decode_records(uptime, ust, seg_start, values):
+    """Converte os registros brutos de _read_records nas seções do sar."""
+    uptime = np.asarray(uptime, dtype=np.int64)
+    ust = np.asarray(ust, dtype=np.int64)
+    seg_start = np.asarray(seg_start, dtype=bool)
+
+    # Cada linha do sar corresponde a um par de registros consecutivos no mesmo segmento
+    cur = np.flatnonzero(~seg_start)
+    prev = cur - 1
+    itv = (uptime[cur] - uptime[prev]) / 100.0
+    itv = np.where(itv > 0, itv, 1.0)
+    epoch = ust[cur]
+
+    sections = {}
+    for act_id, rows in values.items():
+        if not rows:
+            continue
+        items = _stack_items(rows)
+        raw = items[:, 0]
+        if act_id == A_CPU:
+            sections['CPU'] = _cpu_columns(raw[cur] - raw[prev],
+                                           np.full(len(cur), 'all', dtype=object))
+            n_cpu = items.shape[1] - 1
+            if n_cpu > 0:
+                # Um núcleo por linha, na ordem (intervalo, núcleo) em que o sar -P ALL imprime
+                d = (items[cur, 1:] - items[prev, 1:]).reshape(-1, items.shape[2])
+                names = np.arange(n_cpu).astype(str).astype(object)
+                sections['PERCPU'] = _cpu_columns(d, np.tile(names, len(cur)))
+                sections['PERCPU']['epoch'] = np.repeat(epoch, n_cpu)
+        elif act_id == A_IO:
+            sections['IO'] = _io_columns(raw, cur, prev, itv)
+        elif act_id == A_MEMORY:
+            sections['MEMORY'], sections['SWAP'] = _memory_columns(raw, cur)
+
+    for cols in sections.values():
+        cols.setdefault('epoch', epoch)
+    return sections
+
+
+def decode_sa_buffer(buf):
+    """
+    Decodifica um sa file já carregado em memória.
+    Retorna (header, sections) onde sections é um dict
+    {'CPU'|'PERCPU'|'MEMORY'|'SWAP'|'IO': {coluna: np.ndarray}} e cada seção
+    tem a coluna 'epoch' (segundos UTC) do fim de cada intervalo. PERCPU tem
+    uma linha por (intervalo, núcleo), com o núcleo na coluna 'CPU'.
+    """
+    hdr = read_sa_header(buf)
+    uptime, ust, seg_start, values, _, _ = _read_records(buf, hdr)
+    return hdr, _decode_records(uptime, ust, seg_start, values)
+
+
+def read_sa_file(path):
+    """Lê e decodifica um sa file do disco (ver decode_sa_buffer)."""
+    with open(path, 'rb') as f:
+        buf = f.read()
+    return decode_sa_buffer(buf)
+
+
+# -----------------------
+# Leitura incremental (arquivo ainda sendo gravado)
+# -----------------------
+class SATail:
+    """
+    Acompanha um sa file que o sadc ainda está gravando (sar -o ... durante o
+    stress_test.sh). Guarda o offset do último registro completo e os
+    contadores desse registro: cada poll() lê só os bytes novos e decodifica
+    só os registros novos, com custo proporcional ao que foi acrescentado.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hdr = None
+        self.offset = None        # posição logo após o último registro completo
+        self._new_segment = True  # próximo registro inicia segmento (início/RESTART)
+        self._last = None         # (uptime, ust, {atividade: itens}) do último registro
+
+    def poll(self):
+        """
+        Decodifica os registros acrescentados desde a chamada anterior.
+        Retorna {seção: {coluna: np.ndarray}} só com as linhas novas ({} se não
+        houver). Registros incompletos ficam para o próximo poll(); um arquivo
+        que ainda não existe (sar ainda não começou) também devolve {}.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return {}
+        with f:
+            if self.hdr is None:
+                try:
+                    self.hdr = read_sa_header(f.read())
+                except SATruncatedError:
+                    return {}
+                self.offset = self.hdr['data_offset']
+            f.seek(self.offset)
+            buf = f.read()
+        if not buf:
+            return {}
+
+        uptime, ust, seg_start, values, stop, new_segment = _read_records(
+            buf, self.hdr, pos=0, new_segment=self._new_segment)
+        self.offset += stop
+        self._new_segment = new_segment
+        if not uptime:
+            return {}
+
+        if self._last is not None and not seg_start[0]:
+            # O último registro já lido entra só como base das diferenças
+            last_uptime, last_ust, last_values = self._last
+            uptime.insert(0, last_uptime)
+            ust.insert(0, last_ust)
+            seg_start.insert(0, True)
+            for act_id, rows in values.items():
+                rows.insert(0, last_values[act_id])
+        self._last = (uptime[-1], ust[-1], {act_id: rows[-1] for act_id, rows in values.items()})
+
+        sections = _decode_records(uptime, ust, seg_start, values)
+        return {section: cols for section, cols in sections.items() if len(cols['epoch'])}
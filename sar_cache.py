@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+sar_cache.py
+Cache em disco das seções já parseadas (CPU, MEMORY, SWAP, IO) de cada report.sar.
+
+Cada entrada é um .npz com as seções de um arquivo (DataFrames ou dicts
+{coluna: array}, ver load), nomeado pelo hash do
+conteúdo do .sar + versão do parser. Se o arquivo ou o parser mudarem o nome
+muda e a entrada antiga deixa de ser usada; o diretório é limitado por tamanho,
+removendo primeiro as entradas usadas há mais tempo (LRU pelo mtime, que é
+atualizado a cada leitura). Se o diretório não puder ser gravado (sem
+permissão, disco cheio), o cache avisa uma vez e o processo segue sem ele.
+
+Diretório padrão: $SAR_CACHE_DIR ou ~/.cache/sar-tools
+"""
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Incrementar quando a saída do parser mudar (invalida todo o cache)
+CACHE_VERSION = 5
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("SAR_CACHE_DIR", Path.home() / ".cache" / "sar-tools"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Hash (blake2b) do conteúdo do arquivo, lido em blocos."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+# -----------------------
+# Serialização das seções
+# -----------------------
+def _is_numeric(values):
+    dtype = getattr(values, 'dtype', None)
+    # dtypes do pandas (ex: Float64) expõem o equivalente NumPy em numpy_dtype
+    dtype = getattr(dtype, 'numpy_dtype', dtype)
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biuf'
+
+
+def _is_missing(v):
+    """None, NaN e os nulos do pandas (pd.NA/NaT), sem importar o pandas."""
+    return v is None or (isinstance(v, float) and v != v) or type(v).__name__ in ('NAType', 'NaTType')
+
+
+def _encode_frames(frames):
+    """Seções (DataFrames ou dicts {coluna: array}) como arrays do .npz."""
+    arrays = {}
+    for section, df in frames.items():
+        kinds, names = [], []
+        for i, (col, values) in enumerate(df.items()):
+            names.append(str(col))
+            if _is_numeric(values):
+                kinds.append('n')
+                arrays[f'{section}__c{i}'] = np.asarray(values)
+                continue
+            # Texto/objeto: guarda como unicode + máscara de nulos
+            kinds.append('s' if str(getattr(values, 'dtype', '')) == 'string' else 'o')
+            values = np.asarray(values, dtype=object)
+            mask = np.array([_is_missing(v) for v in values], dtype=bool)
+            arrays[f'{section}__c{i}'] = np.array(['' if m else str(v) for v, m in zip(values, mask)], dtype=str)
+            arrays[f'{section}__m{i}'] = mask
+        arrays[f'{section}__names'] = np.array(names, dtype=str)
+        arrays[f'{section}__kinds'] = np.array(kinds, dtype=str)
+    return arrays
+
+
+def _decode_frames(npz, frames=True):
+    """{seção: DataFrame}, ou {seção: {coluna: array}} sem o pandas se not `frames`."""
+    if frames:
+        import pandas as pd
+    sections = sorted({k.split('__', 1)[0] for k in npz.files})
+    out = {}
+    for section in sections:
+        names = npz[f'{section}__names']
+        kinds = npz[f'{section}__kinds']
+        columns = {}
+        for i, (name, kind) in enumerate(zip(names, kinds)):
+            values = npz[f'{section}__c{i}']
+            if kind == 'n':
+                columns[str(name)] = values
+                continue
+            mask = npz[f'{section}__m{i}']
+            obj = values.astype(object)
+            obj[mask] = None
+            columns[str(name)] = pd.Series(obj, dtype=str if kind == 's' else object) if frames else obj
+        out[section] = pd.DataFrame(columns) if frames else columns
+    return out
+
+
+# -----------------------
+# Cache
+# -----------------------
+class SectionCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        # hash já calculado por arquivo (load + store no mesmo processo leem o .sar uma vez)
+        self._digests = {}
+        # Após o primeiro erro de gravação o cache deixa de gravar (e de avisar)
+        self.disabled = False
+
+    def entry_path(self, sarfile_path, tag):
+        key = str(sarfile_path)
+        if key not in self._digests:
+            self._digests[key] = file_digest(sarfile_path)
+        return self.cache_dir / f"{self._digests[key]}-{tag}-v{CACHE_VERSION}.npz"
+
+    def load(self, sarfile_path, tag, frames=True):
+        """
+        Retorna {seção: DataFrame} do cache, ou None se não houver entrada
+        válida. Com frames=False, {seção: {coluna: array}} (não importa o pandas).
+        """
+        entry = self.entry_path(sarfile_path, tag)
+        try:
+            with np.load(entry, allow_pickle=False) as npz:
+                frames = _decode_frames(npz, frames)
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(entry)  # marca como usado recentemente (LRU)
+        except OSError:
+            pass
+        return frames
+
+    def store(self, sarfile_path, tag, frames):
+        """Grava as seções; se o diretório não aceitar a escrita, avisa e segue sem cache."""
+        if self.disabled:
+            return
+        entry = self.entry_path(sarfile_path, tag)
+        tmp = entry.with_name(entry.name + f".{os.getpid()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                np.savez(f, **_encode_frames(frames))
+            os.replace(tmp, entry)
+        except OSError as e:
+            try:
+                tmp.unlink(missing_ok=True)
+            except OSError:
+                pass
+            self._disable(e)
+            return
+        self.evict()
+
+    def _disable(self, error):
+        if self.disabled:
+            return
+        self.disabled = True
+        print(f"Aviso: cache em {self.cache_dir} indisponível ({error}); seguindo sem cache",
+              file=sys.stderr)
+
+    def evict(self):
+        """Remove as entradas usadas há mais tempo até o diretório caber em max_bytes."""
+        entries = []
+        try:
+            paths = list(self.cache_dir.glob("*.npz"))
+        except OSError as e:
+            self._disable(e)
+            return
+        for p in paths:
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+sar_compare.py
+Significância e tamanho de efeito em comparações A/B (ex: nó com BBR,
+swappiness e THP ajustados x nó padrão).
+
+A diferença de médias sozinha não diz se o ajuste ajudou: amostras do sar
+a cada 1 s são autocorrelacionadas (uma carga de 30 s gera 30 amostras
+quase iguais), então testes que supõem amostras independentes dão p-valores
+pequenos demais. Aqui, para cada métrica e par (base, outra run/grupo):
+
+  n efetivo       n / tau, com tau (tempo de autocorrelação integrado) pela
+                  autocorrelação via FFT e a sequência inicial positiva de Geyer.
+  Mann-Whitney U  postos vetorizados (empates com posto médio); a variância
+                  de U usa os n efetivos no lugar de n.
+  bootstrap       IC das diferenças de média, mediana e p99 por bootstrap de
+                  blocos móveis (blocos de ~tau amostras preservam a
+                  autocorrelação); as reamostragens são matrizes NumPy
+                  (lote x n), sem loop em Python por reamostragem.
+
+Cada (métrica, par) é uma tarefa independente, distribuída num pool de
+processos. Diferenças são base - outra, como "Diferença Média" em print_stats.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from sar_profile import pool_map, stage
+
+DEFAULT_BOOT = 1000
+DEFAULT_ALPHA = 0.05
+# Elementos (lote x n) por matriz de reamostragem: limita a memória do bootstrap
+BOOT_BATCH_ELEMENTS = 1 << 22
+
+# Estatísticas comparadas no bootstrap (quantis por nome -> q)
+BOOT_STATISTICS = ('mean', 'median', 'p99')
+BOOT_QUANTILES = {'median': 0.5, 'p99': 0.99}
+
+
+def row_statistics(m):
+    """{estatística: valor por linha} de uma matriz; os quantis saem de uma única partição."""
+    out = {'mean': m.mean(axis=1)}
+    qs = np.quantile(m, list(BOOT_QUANTILES.values()), axis=1)
+    out.update(zip(BOOT_QUANTILES, qs))
+    return out
+
+
+# -----------------------
+# Autocorrelação
+# -----------------------
+def autocorrelation_time(x):
+    """Tempo de autocorrelação integrado (>= 1) de uma série."""
+    x = np.asarray(x, dtype=np.float64)
+    x = x[np.isfinite(x)]
+    n = len(x)
+    if n < 4:
+        return 1.0
+    d = x - x.mean()
+    var = d @ d
+    if var == 0:
+        return 1.0
+    nfft = 1 << (2 * n - 1).bit_length()
+    f = np.fft.rfft(d, nfft)
+    acf = np.fft.irfft(f * np.conj(f), nfft)[:n] / var
+    # Geyer: soma os pares (rho_2k + rho_2k+1) enquanto forem positivos
+    pairs = acf[:2 * (n // 2)].reshape(-1, 2).sum(axis=1)
+    stop = np.flatnonzero(pairs <= 0)
+    k = stop[0] if len(stop) else len(pairs)
+    return max(-1.0 + 2.0 * pairs[:k].sum(), 1.0)
+
+
+def effective_sample_size(x):
+    """Número de amostras independentes equivalente (n / tau)."""
+    x = np.asarray(x, dtype=np.float64)
+    n = int(np.isfinite(x).sum())
+    return n / autocorrelation_time(x) if n else 0.0
+
+
+# -----------------------
+# Testes
+# -----------------------
+def mann_whitney_u(a, b, n_eff_a=None, n_eff_b=None):
+    """
+    Mann-Whitney U bilateral (aproximação normal, correção de empates).
+    Com n_eff_a/n_eff_b a variância de U é a de amostras independentes desses
+    tamanhos. Devolve (U de `a`, p-valor, efeito), com efeito = correlação
+    bisserial de postos (P(a > b) - P(a < b), de -1 a 1).
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return np.nan, np.nan, np.nan
+    _, inverse, counts = np.unique(np.concatenate([a, b]), return_inverse=True, return_counts=True)
+    avg_rank = np.cumsum(counts) - (counts - 1) / 2.0
+    u = avg_rank[inverse[:n1]].sum() - n1 * (n1 + 1) / 2.0
+    n = n1 + n2
+    effect = 2.0 * u / (n1 * n2) - 1.0
+
+    ties = (counts.astype(np.float64) ** 3 - counts).sum()
+    var = n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1))) if n > 1 else 0.0
+    if n_eff_a is not None and n_eff_b is not None:
+        # Var(U / n1n2) ~ (n + 1) / (12 n1 n2): troca n1, n2 pelos efetivos
+        ne1, ne2 = max(n_eff_a, 1.0), max(n_eff_b, 1.0)
+        var *= (n1 * n2) / (ne1 * ne2) * (ne1 + ne2 + 1) / (n + 1)
+    if var <= 0:
+        # Todos os valores empatados: nenhuma evidência de diferença
+        return u, 1.0, effect
+    z = max(abs(u - n1 * n2 / 2.0) - 0.5, 0.0) / math.sqrt(var)
+    return u, math.erfc(z / math.sqrt(2)), effect
+
+
+def block_bootstrap(x, n_boot, block, rng):
+    """
+    {estatística: array (n_boot,)} por bootstrap de blocos móveis de tamanho
+    `block`; as reamostragens saem em lotes de matrizes (lote x n).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    block = int(min(max(block, 1), n))
+    n_blocks = -(-n // block)
+    per_batch = max(1, BOOT_BATCH_ELEMENTS // n)
+    out = {name: np.empty(n_boot) for name in BOOT_STATISTICS}
+    offsets = np.arange(block)
+    for start in range(0, n_boot, per_batch):
+        size = min(per_batch, n_boot - start)
+        starts = rng.integers(0, n - block + 1, size=(size, n_blocks))
+        idx = (starts[:, :, None] + offsets).reshape(size, -1)[:, :n]
+        for name, values in row_statistics(x[idx]).items():
+            out[name][start:start + size] = values
+    return out
+
+
+def compare_samples(a, b, n_boot=DEFAULT_BOOT, alpha=DEFAULT_ALPHA, seed=None):
+    """
+    Compara duas amostras (base `a`, outra `b`). Devolve um dict com n e n
+    efetivo de cada lado, U, p-valor e efeito do Mann-Whitney e, para média,
+    mediana e p99, a diferença a - b com o IC (1 - alpha) do bootstrap.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    a, b = a[np.isfinite(a)], b[np.isfinite(b)]
+    tau_a, tau_b = autocorrelation_time(a), autocorrelation_time(b)
+    row = {'n_a': len(a), 'n_eff_a': len(a) / tau_a, 'n_b': len(b), 'n_eff_b': len(b) / tau_b}
+    row['u'], row['p_value'], row['effect'] = mann_whitney_u(a, b, row['n_eff_a'], row['n_eff_b'])
+
+    rng = np.random.default_rng(seed)
+    boot_a = block_bootstrap(a, n_boot, math.ceil(tau_a), rng) if n_boot and len(a) else None
+    boot_b = block_bootstrap(b, n_boot, math.ceil(tau_b), rng) if n_boot and len(b) else None
+    point_a = row_statistics(a[None, :]) if len(a) else None
+    point_b = row_statistics(b[None, :]) if len(b) else None
+    for name in BOOT_STATISTICS:
+        row[f'{name}_diff'] = (float(point_a[name][0] - point_b[name][0])
+                               if point_a and point_b else np.nan)
+        if boot_a is None or boot_b is None:
+            row[f'{name}_low'] = row[f'{name}_high'] = np.nan
+            continue
+        low, high = np.quantile(boot_a[name] - boot_b[name], [alpha / 2, 1 - alpha / 2])
+        row[f'{name}_low'], row[f'{name}_high'] = float(low), float(high)
+    row['significant'] = bool(row['p_value'] < alpha) if np.isfinite(row['p_value']) else False
+    return row
+
+
+# -----------------------
+# Todas as métricas de uma vez
+# -----------------------
+def _compare_task(task):
+    metric, base, other, a, b, n_boot, alpha, seed = task
+    with stage('compare', rows=len(a) + len(b), metric=metric):
+        return {'metric': metric, 'base': base, 'other': other,
+                **compare_samples(a, b, n_boot=n_boot, alpha=alpha, seed=seed)}
+
+
+def compare_all(samples, pairs, n_boot=DEFAULT_BOOT, alpha=DEFAULT_ALPHA, jobs=None, seed=0):
+    """
+    samples: {(run ou grupo, métrica): array}
+    pairs:   lista de (métrica, base, outra)
+    Cada par vira uma tarefa do pool (`jobs` processos). Devolve um dict por
+    par, na ordem de `pairs`; resultados reproduzíveis por `seed`.
+    """
+    pairs = [(m, x, y) for m, x, y in pairs if (x, m) in samples and (y, m) in samples]
+    if not pairs:
+        return []
+    seeds = np.random.SeedSequence(seed).spawn(len(pairs))
+    tasks = [(m, x, y, samples[(x, m)], samples[(y, m)], n_boot, alpha, s)
+             for (m, x, y), s in zip(pairs, seeds)]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+    if jobs == 1:
+        rows = [_compare_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            rows = pool_map(executor, _compare_task, tasks)
+    return rows
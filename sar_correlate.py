@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+sar_correlate.py
+Correlação e defasagem entre métricas de uma mesma run.
+
+Responde perguntas como "picos de %system antecedem quedas de tps ou
+atividade de swap?". Para cada run:
+
+  1. todas as métricas das seções CPU, MEMORY, SWAP, IO... (não as por
+     entidade) são alinhadas numa grade de tempo comum (sar_align) e
+     padronizadas (z-score) numa matriz tempo x métrica;
+  2. a matriz de correlação sai de um único produto Z'Z / T;
+  3. a correlação cruzada de todos os pares, até ±max_lag, sai da FFT:
+     uma rfft da matriz inteira e, para cada métrica i, uma irfft de
+     conj(F_i) * F contra todas as métricas de uma vez.
+
+O par (i, j) com pico em defasagem k > 0 significa que i antecede j em k
+segundos. A tabela é ordenada pela |correlação| no pico; o heatmap mostra a
+correlação sem defasagem e a defasagem do pico.
+"""
+
+import numpy as np
+
+from sar_align import align_values, common_grid
+from sar_render import DEFAULT_FORMAT, save_figure
+from sar_store import ENTITY_SECTIONS
+
+MAX_LAG = 300          # segundos
+MIN_POINTS = 10
+# Pares com |correlação| no pico abaixo disso ficam em branco no heatmap de defasagens
+MIN_LAG_CORR = 0.3
+
+
+def run_matrix(store, run, step=None):
+    """
+    (passo em s, nomes 'SEÇÃO:métrica', matriz T x M) das métricas de uma run
+    alinhadas numa grade comum; métricas constantes ou vazias ficam de fora.
+    """
+    sections = [s for r, s in store.keys() if r == run and s not in ENTITY_SECTIONS]
+    epochs = [store.epoch(run, s) for s in sections]
+    grid = common_grid(epochs, step)
+    names, cols = [], []
+    for section, epoch in zip(sections, epochs):
+        for metric in store.metrics(run, section):
+            values = align_values(epoch, store.values(run, section, metric), grid)
+            finite = values[np.isfinite(values)]
+            if len(finite) < MIN_POINTS or finite.std() == 0:
+                continue
+            names.append(f'{section}:{metric}')
+            cols.append(values)
+    step = float(grid[1] - grid[0]) if len(grid) > 1 else 1.0
+    matrix = np.column_stack(cols) if cols else np.empty((len(grid), 0))
+    return step, names, matrix
+
+
+def standardize(matrix):
+    """z-score por coluna; buracos (NaN) viram 0 (a média) para a FFT."""
+    mean = np.nanmean(matrix, axis=0)
+    std = np.nanstd(matrix, axis=0)
+    z = (matrix - mean) / np.where(std > 0, std, 1)
+    return np.nan_to_num(z)
+
+
+def cross_correlation(z, max_lag):
+    """
+    Correlação cruzada normalizada de todos os pares de colunas de `z`:
+    (defasagens -L..L, array M x M x (2L + 1)), com
+    C[i, j, k] = média de z_i[t] * z_j[t + k].
+    """
+    n, m = z.shape
+    max_lag = int(min(max_lag, n - 1))
+    nfft = 1 << (n + max_lag).bit_length()   # sem sobreposição circular até max_lag
+    spectrum = np.fft.rfft(z, nfft, axis=0)
+    out = np.empty((m, m, 2 * max_lag + 1))
+    for i in range(m):
+        cc = np.fft.irfft(np.conj(spectrum[:, i:i + 1]) * spectrum, nfft, axis=0) / n
+        out[i] = np.concatenate([cc[nfft - max_lag:], cc[:max_lag + 1]]).T
+    return np.arange(-max_lag, max_lag + 1), out
+
+
+def analyze_run(store, run, max_lag=MAX_LAG, step=None):
+    """
+    Correlações de uma run: dict com 'names', 'corr' (M x M, sem defasagem),
+    'lag' (M x M, defasagem do pico em s) e 'peak' (correlação no pico).
+    None se a run tiver menos de duas métricas variáveis.
+    """
+    step, names, matrix = run_matrix(store, run, step)
+    if len(names) < 2:
+        return None
+    z = standardize(matrix)
+    lags, cc = cross_correlation(z, round(max_lag / step))
+    best = np.argmax(np.abs(cc), axis=2)
+    peak = np.take_along_axis(cc, best[:, :, None], axis=2)[:, :, 0]
+    return {
+        'names': names,
+        'corr': cc[:, :, len(lags) // 2],
+        'lag': lags[best] * step,
+        'peak': peak,
+    }
+
+
+# Campos de cada par devolvido por pair_table (colunas do correlacoes.csv)
+PAIR_COLUMNS = ['run', 'a', 'b', 'corr', 'lag_s', 'peak_corr']
+
+
+def pair_table(run, result):
+    """Um dict por par de métricas (i < j), ordenados pela |correlação| no pico."""
+    names = result['names']
+    i, j = np.triu_indices(len(names), k=1)
+    order = np.argsort(-np.abs(result['peak'][i, j]), kind='stable')
+    i, j = i[order], j[order]
+    return [{'run': run, 'a': names[a], 'b': names[b], 'corr': float(result['corr'][a, b]),
+             'lag_s': float(result['lag'][a, b]), 'peak_corr': float(result['peak'][a, b])}
+            for a, b in zip(i.tolist(), j.tolist())]
+
+
+def plot_correlation(run, result, filename, dpi=150, fmt=DEFAULT_FORMAT):
+    """Heatmaps lado a lado: correlação sem defasagem e defasagem (s) do pico; retorna o arquivo."""
+    import matplotlib.pyplot as plt
+
+    names = result['names']
+    size = max(8, 0.35 * len(names) + 4)
+    fig, (ax_corr, ax_lag) = plt.subplots(1, 2, figsize=(2 * size, size))
+    im = ax_corr.imshow(result['corr'], cmap='coolwarm', vmin=-1, vmax=1)
+    ax_corr.set_title(f'{run} - Correlação (defasagem 0)', fontweight='bold')
+    fig.colorbar(im, ax=ax_corr, fraction=0.046, pad=0.04)
+
+    lag = np.where(np.abs(result['peak']) >= MIN_LAG_CORR, result['lag'], np.nan)
+    limit = max(np.nanmax(np.abs(lag)) if np.isfinite(lag).any() else 0, 1)
+    im = ax_lag.imshow(lag, cmap='PuOr', vmin=-limit, vmax=limit)
+    ax_lag.set_title(f'{run} - Defasagem do pico (s; linha antecede coluna se > 0)', fontweight='bold')
+    fig.colorbar(im, ax=ax_lag, fraction=0.046, pad=0.04)
+
+    for ax in (ax_corr, ax_lag):
+        ax.set_xticks(range(len(names)))
+        ax.set_xticklabels(names, rotation=90, fontsize=7)
+        ax.set_yticks(range(len(names)))
+        ax.set_yticklabels(names, fontsize=7)
+    fig.tight_layout()
+    return save_figure(fig, filename, dpi, fmt)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+sar_downsample.py
+Redução de pontos (level of detail) antes de plotar.
+
+Uma captura de 24h a 1 s tem 86400 amostras por série; desenhar todas em cada
+um dos 8 gráficos (x N runs) deixa a renderização lenta e o PNG enorme, sem
+ganho visual: o eixo só tem alguns milhares de pixels de largura. Aqui cada
+série é reduzida para ~a largura do eixo em pixels, preservando os picos:
+
+  lttb    Largest-Triangle-Three-Buckets: mantém a forma da curva escolhendo,
+          em cada balde, o ponto que forma o maior triângulo com os vizinhos.
+  minmax  envelope: mínimo e máximo de cada balde (nenhum pico se perde).
+
+Trechos NaN (buracos entre amostras) são preservados como quebras na linha.
+Nos heatmaps por entidade, bucket_reduce faz o mesmo no eixo do tempo.
+"""
+
+import warnings
+
+import numpy as np
+
+LOD_METHODS = ('lttb', 'minmax')
+
+
+def axis_pixel_width(ax, dpi):
+    """Largura (px) de um eixo do matplotlib quando salvo com `dpi`."""
+    fig = ax.get_figure()
+    return max(int(fig.get_figwidth() * ax.get_position().width * dpi), 2)
+
+
+def _finite_segments(y):
+    """Intervalos [início, fim) de valores finitos consecutivos."""
+    finite = np.concatenate([[False], np.isfinite(y), [False]])
+    edges = np.flatnonzero(np.diff(finite.astype(np.int8)))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def _lttb_segment(x, y, n_out):
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n) if n <= n_out else np.array([0, n - 1])
+    # n_out - 2 baldes entre o primeiro e o último ponto (que sempre ficam)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def _minmax_segment(x, y, n_out):
+    n = len(x)
+    buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+    size = -(-n // buckets)
+    pad = size * buckets - n
+    vals = np.concatenate([y, np.full(pad, np.nan)]).reshape(buckets, size)
+    base = np.arange(buckets) * size
+    lo = base + np.argmin(np.where(np.isnan(vals), np.inf, vals), axis=1)
+    hi = base + np.argmax(np.where(np.isnan(vals), -np.inf, vals), axis=1)
+    idx = np.unique(np.concatenate([lo, hi, [0, n - 1]]))
+    return idx[idx < n]
+
+
+def downsample(x, y, n_out, method='lttb'):
+    """
+    Reduz (x, y) para ~`n_out` pontos com `method` ('lttb' ou 'minmax').
+    Devolve (x, y) novos; sem redução quando a série já cabe em `n_out`.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if not n_out or len(x) <= n_out:
+        return x, y
+    if method not in LOD_METHODS:
+        raise ValueError(f"método de redução desconhecido: {method}")
+    reduce_segment = _lttb_segment if method == 'lttb' else _minmax_segment
+
+    segments = _finite_segments(y)
+    total = sum(end - start for start, end in segments)
+    if total == 0:
+        return x[:0], y[:0]
+    xs, ys = [], []
+    for start, end in segments:
+        # Cada trecho contínuo recebe pontos proporcionais ao seu tamanho
+        budget = max(int(round(n_out * (end - start) / total)), 2)
+        idx = start + reduce_segment(x[start:end], y[start:end], budget)
+        if xs:
+            # NaN entre trechos mantém a quebra da linha
+            xs.append([x[start - 1]])
+            ys.append([np.nan])
+        xs.append(x[idx])
+        ys.append(y[idx])
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def bucket_reduce(matrix, n_out, how='max'):
+    """
+    Reduz as linhas (tempo) de uma matriz tempo x entidade para ~`n_out`
+    baldes, com o máximo (preserva picos de saturação) ou a média de cada um.
+    Devolve (índice da primeira linha de cada balde, matriz reduzida).
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = matrix.shape[0]
+    if not n_out or n <= n_out:
+        return np.arange(n), matrix
+    size = -(-n // n_out)
+    buckets = -(-n // size)
+    pad = np.full((size * buckets - n, matrix.shape[1]), np.nan)
+    blocks = np.concatenate([matrix, pad]).reshape(buckets, size, matrix.shape[1])
+    reduce = np.nanmax if how == 'max' else np.nanmean
+    with warnings.catch_warnings():
+        # Baldes só com NaN (entidade sem amostras) continuam NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        out = reduce(blocks, axis=1)
+    return np.arange(buckets) * size, out
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+sar_live.py
+Painel ao vivo dos report.sar enquanto o teste roda (ex: soak test de horas).
+
+  python sar_live.py report.sar --interval 1 --window 3600
+  python sar_live.py VM1=vm1/report.sar VM2=vm2/report.sar
+
+Usa os mesmos 8 gráficos de sar_visualize.py, mas a figura fica aberta e, a
+cada intervalo:
+  - só os registros novos de cada arquivo são decodificados (sar_binary.SATail);
+  - os pontos entram num buffer circular de tamanho fixo por métrica/run
+    (--window pontos), então memória e custo de desenho não crescem com a
+    duração do teste;
+  - as linhas são redesenhadas por blitting (só as linhas, sobre o fundo já
+    renderizado); a figura inteira só é redesenhada quando os limites dos
+    eixos precisam mudar ou a cada --refresh segundos (médias nos títulos).
+
+Requer o leitor nativo (sar_binary) e um backend interativo do matplotlib.
+"""
+
+import argparse
+import sys
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from sar_binary import SAFormatError, SATail
+from sar_runs import add_run_arguments, resolve_runs
+from sar_stats import RunningStats
+from sar_visualize import TIME_SERIES_PANELS, group_of, pref_text, run_colors
+
+DEFAULT_WINDOW = 3600
+DEFAULT_REFRESH = 30.0
+
+
+class RingBuffer:
+    """Últimos `capacity` pontos (x, y) em vetores de tamanho fixo."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.x = np.full(capacity, np.nan)
+        self.y = np.full(capacity, np.nan)
+        self.head = 0   # próxima posição de escrita
+        self.size = 0
+
+    def extend(self, x, y):
+        x = np.asarray(x, dtype=np.float64)[-self.capacity:]
+        y = np.asarray(y, dtype=np.float64)[-self.capacity:]
+        idx = (self.head + np.arange(len(x))) % self.capacity
+        self.x[idx] = x
+        self.y[idx] = y
+        self.head = (self.head + len(x)) % self.capacity
+        self.size = min(self.size + len(x), self.capacity)
+
+    def view(self):
+        """(x, y) em ordem cronológica."""
+        if self.size < self.capacity:
+            return self.x[:self.size], self.y[:self.size]
+        return (np.concatenate((self.x[self.head:], self.x[:self.head])),
+                np.concatenate((self.y[self.head:], self.y[:self.head])))
+
+
+def find_column(columns, candidates):
+    """Como SARDataParser2.get_column_by_candidates, sobre um dict de colunas."""
+    lower = {c.lower(): c for c in columns}
+    for cand in candidates:
+        if cand.lower() in lower:
+            return lower[cand.lower()]
+        for c in columns:
+            if cand.lower() in c.lower():
+                return c
+    return None
+
+
+class LiveDashboard:
+    def __init__(self, runs, window=DEFAULT_WINDOW, refresh=DEFAULT_REFRESH):
+        """`runs`: lista de (rótulo, grupo, caminho) como em sar_runs.resolve_runs."""
+        self.labels = [label for label, _, _ in runs]
+        self.groups = {label: group for label, group, _ in runs if group}
+        self.tails = {label: SATail(str(path)) for label, _, path in runs}
+        self.refresh = refresh
+        self.t0 = {}           # epoch da primeira amostra de cada run
+        self.last_full = 0.0
+
+        keys = list(dict.fromkeys(group_of(l, self.groups) for l in self.labels))
+        colors = run_colors(keys)
+        grouped = len(keys) < len(self.labels)
+
+        self.fig, axes = plt.subplots(4, 2, figsize=(20, 16))
+        self.fig.suptitle('Séries Temporais - Ao Vivo', fontsize=16, fontweight='bold', y=0.98)
+        # Por painel: (eixo, seção, candidatos, escala, título, pref, ylim fixo, {rótulo: (linha, buffer, stats)})
+        self.panels = []
+        for row, col, section, candidates, pref_key, title, ylabel, scale, ylim in TIME_SERIES_PANELS:
+            ax = axes[row, col]
+            lines = {}
+            in_legend = set()
+            for label in self.labels:
+                k = group_of(label, self.groups)
+                line, = ax.plot([], [], color=colors[k], animated=True,
+                                label=k if k not in in_legend else None,
+                                linewidth=1 if grouped else 2, alpha=0.6 if grouped else 1)
+                in_legend.add(k)
+                lines[label] = (line, RingBuffer(window), RunningStats())
+            ax.set_ylabel(ylabel)
+            ax.set_xlabel('Tempo desde o início (s)')
+            ax.grid(True, alpha=0.3)
+            ax.legend(loc='upper left')
+            ax.set_xlim(0, 60)
+            ax.set_ylim(*(ylim or (0, 1)))
+            self.panels.append((ax, section, candidates, scale, title, pref_key, ylim, lines))
+        self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+        self.backgrounds = None
+
+    # -----------------------
+    # Dados
+    # -----------------------
+    def poll(self):
+        """Lê os registros novos e os coloca nos buffers; retorna os eixos que mudaram."""
+        changed = set()
+        for label, tail in self.tails.items():
+            sections = tail.poll()
+            for ax, section, candidates, scale, _, _, _, lines in self.panels:
+                columns = sections.get(section)
+                if not columns:
+                    continue
+                col = find_column([c for c in columns if c != 'epoch'], candidates)
+                if col is None:
+                    continue
+                epoch = columns['epoch']
+                self.t0.setdefault(label, int(epoch[0]))
+                values = np.asarray(columns[col], dtype=np.float64) * scale
+                line, ring, stats = lines[label]
+                ring.extend(epoch - self.t0[label], values)
+                stats.update(values)
+                changed.add(ax)
+        return changed
+
+    def needs_relimit(self, ax, ylim, lines):
+        """Ajusta os limites se algum ponto saiu da área visível (exige redesenho completo)."""
+        xs, ys = [], []
+        for line, ring, _ in lines.values():
+            x, y = ring.view()
+            if len(x):
+                xs.append(x)
+                ys.append(y[np.isfinite(y)])
+        if not xs:
+            return False
+        x_min = min(x[0] for x in xs)
+        x_max = max(x[-1] for x in xs)
+        relimit = False
+        lo, hi = ax.get_xlim()
+        if x_max > hi:
+            # Janela com folga de 25% à direita para não redesenhar a cada ponto
+            span = max(x_max - x_min, 60)
+            ax.set_xlim(x_min, x_min + span * 1.25)
+            relimit = True
+        ys = np.concatenate(ys) if ys else np.empty(0)
+        if ylim is None and len(ys):
+            lo, hi = ax.get_ylim()
+            if ys.max() > hi or ys.min() < lo:
+                margin = 0.1 * max(ys.max() - ys.min(), abs(ys.max()), 1e-9)
+                ax.set_ylim(ys.min() - margin if ys.min() < lo else lo, max(hi, ys.max() + margin))
+                relimit = True
+        return relimit
+
+    # -----------------------
+    # Desenho
+    # -----------------------
+    def full_redraw(self):
+        """Redesenha a figura (fundo), guarda o fundo de cada eixo e desenha as linhas por cima."""
+        for ax, _, _, _, title, pref_key, _, lines in self.panels:
+            means = {}
+            for label, (_, _, stats) in lines.items():
+                if stats.count:
+                    means.setdefault(group_of(label, self.groups), []).append(stats.mean)
+            mean_txt = ", ".join(f"{k}={np.mean(v):.2f}" for k, v in means.items())
+            ax.set_title(f'{title} (Média {mean_txt} — {pref_text(pref_key)})' if mean_txt else title,
+                         fontweight='bold')
+        canvas = self.fig.canvas
+        canvas.draw()
+        self.backgrounds = {ax: canvas.copy_from_bbox(ax.bbox) for ax, *_ in self.panels}
+        self.blit([ax for ax, *_ in self.panels])
+        self.last_full = time.monotonic()
+
+    def blit(self, axes):
+        """Restaura o fundo dos eixos e desenha só as linhas (sem redesenhar a figura)."""
+        canvas = self.fig.canvas
+        for ax, _, _, _, _, _, _, lines in self.panels:
+            if ax not in axes:
+                continue
+            canvas.restore_region(self.backgrounds[ax])
+            for line, ring, _ in lines.values():
+                line.set_data(*ring.view())
+                ax.draw_artist(line)
+            canvas.blit(ax.bbox)
+        canvas.flush_events()
+
+    def update(self):
+        changed = self.poll()
+        if not changed and self.backgrounds is not None:
+            return False
+        relimit = False
+        for ax, _, _, _, _, _, ylim, lines in self.panels:
+            if ax in changed:
+                relimit |= self.needs_relimit(ax, ylim, lines)
+        if (relimit or self.backgrounds is None
+                or time.monotonic() - self.last_full >= self.refresh):
+            self.full_redraw()
+        else:
+            self.blit(changed)
+        return bool(changed)
+
+    def run(self, interval):
+        """Atualiza a cada `interval` segundos até a janela ser fechada (ou Ctrl+C)."""
+        plt.show(block=False)
+        self.full_redraw()
+        while plt.fignum_exists(self.fig.number):
+            started = time.monotonic()
+            self.update()
+            # start_event_loop processa eventos da janela sem redesenhar a figura (plt.pause redesenharia)
+            self.fig.canvas.start_event_loop(max(0.01, interval - (time.monotonic() - started)))
+
+
+# -----------------------
+# Main
+# -----------------------
+def main():
+    ap = argparse.ArgumentParser(description="Painel ao vivo de report.sar ainda em gravação")
+    add_run_arguments(ap, default_files=["report.sar"])
+    ap.add_argument("--interval", type=float, default=1.0, help="segundos entre atualizações")
+    ap.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                    help="pontos mantidos por métrica/run (buffer circular)")
+    ap.add_argument("--refresh", type=float, default=DEFAULT_REFRESH,
+                    help="segundos entre redesenhos completos (médias nos títulos)")
+    args = ap.parse_args()
+
+    try:
+        runs = resolve_runs(args.files, args.group)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+    dashboard = LiveDashboard(runs, window=args.window, refresh=args.refresh)
+    try:
+        dashboard.run(args.interval)
+    except SAFormatError as e:
+        print(f"Painel ao vivo requer o leitor nativo ({e})")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nPainel encerrado.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+sar_modes.py
+Detecção de distribuições multimodais (média enganosa).
+
+Uma métrica que alterna entre dois patamares (ex: CPU ociosa e saturada em
+rajadas) pode ter CV baixo em cada patamar e uma média que não corresponde a
+nenhum deles. Aqui o número de modos de cada série é contado pelos picos de
+uma KDE gaussiana sobre uma grade de GRID_POINTS baldes:
+
+  1. cada série vira uma linha de uma matriz série x balde (contagens), a
+     partir das amostras ou do histograma de um RunningStats (sar_stats);
+  2. a KDE de todas as linhas sai de uma única convolução via FFT, com a
+     largura de banda de Silverman de cada linha (e nunca menor que o
+     espaçamento entre valores distintos, senão valores discretos como tps
+     inteiros virariam um "modo" por valor);
+  3. um pico conta como modo se tiver pelo menos MIN_PEAK_FRACTION da altura
+     do maior e se o vale até o modo anterior descer abaixo de
+     MAX_VALLEY_RATIO do menor dos dois.
+
+Tudo é vetorizado sobre as séries: milhares de séries custam uma FFT.
+"""
+
+import numpy as np
+
+GRID_POINTS = 512
+MIN_PEAK_FRACTION = 0.05
+MAX_VALLEY_RATIO = 0.8
+
+
+# -----------------------
+# Matriz de contagens
+# -----------------------
+def _binned(rows, values, weights, lo, hi, grid_points):
+    """Contagens (séries x baldes) de `values` (com linha `rows`) na grade [lo, hi] de cada linha."""
+    span = np.where(hi > lo, hi - lo, 1.0)
+    pos = np.rint((values - lo[rows]) / span[rows] * (grid_points - 1)).astype(np.int64)
+    pos = np.clip(pos, 0, grid_points - 1)
+    counts = np.bincount(rows * grid_points + pos, weights=weights, minlength=len(lo) * grid_points)
+    return counts.reshape(len(lo), grid_points)
+
+
+def binned_from_samples(samples, grid_points=GRID_POINTS):
+    """(contagens, mínimo, máximo) de uma lista de arrays de amostras."""
+    samples = [np.asarray(s, dtype=np.float64) for s in samples]
+    samples = [s[np.isfinite(s)] for s in samples]
+    lo = np.array([s.min() if len(s) else 0.0 for s in samples])
+    hi = np.array([s.max() if len(s) else 0.0 for s in samples])
+    rows = np.repeat(np.arange(len(samples)), [len(s) for s in samples])
+    values = np.concatenate(samples) if samples else np.empty(0)
+    return _binned(rows, values, None, lo, hi, grid_points), lo, hi
+
+
+def binned_from_stats(stats, grid_points=GRID_POINTS):
+    """(contagens, mínimo, máximo) a partir do histograma de RunningStats (combinados ou não)."""
+    rows, centers, weights = [], [], []
+    for i, acc in enumerate(stats):
+        lower, upper, counts = acc.hist.bins()
+        rows.append(np.full(len(counts), i))
+        centers.append((lower + upper) / 2)
+        weights.append(counts)
+    lo = np.array([acc.min if acc.count else 0.0 for acc in stats], dtype=np.float64)
+    hi = np.array([acc.max if acc.count else 0.0 for acc in stats], dtype=np.float64)
+    if not stats:
+        return np.zeros((0, grid_points)), lo, hi
+    return (_binned(np.concatenate(rows).astype(np.int64), np.concatenate(centers),
+                    np.concatenate(weights).astype(np.float64), lo, hi, grid_points), lo, hi)
+
+
+# -----------------------
+# KDE e picos
+# -----------------------
+def bandwidth_bins(counts):
+    """
+    Largura de banda (em baldes) por linha: regra de Silverman sobre desvio e
+    IQR da grade, com piso no espaçamento mediano entre baldes ocupados.
+    """
+    grid = np.arange(counts.shape[1], dtype=np.float64)
+    n = counts.sum(axis=1)
+    safe_n = np.where(n > 0, n, 1)
+    mean = counts @ grid / safe_n
+    std = np.sqrt(np.maximum(counts @ grid ** 2 / safe_n - mean ** 2, 0))
+    cdf = np.cumsum(counts, axis=1) / safe_n[:, None]
+    iqr = (cdf < 0.75).sum(axis=1) - (cdf < 0.25).sum(axis=1)
+    spread = np.where(iqr > 0, np.minimum(std, iqr / 1.34), std)
+    bw = 0.9 * spread * safe_n ** -0.2
+
+    gaps = np.ones(len(counts))
+    for i, row in enumerate(counts):
+        occupied = np.flatnonzero(row)
+        if len(occupied) > 1:
+            gaps[i] = np.median(np.diff(occupied))
+    return np.maximum(bw, gaps)
+
+
+def smooth(counts, bw):
+    """KDE gaussiana de cada linha (desvio `bw` baldes), numa única FFT para todas."""
+    n_grid = counts.shape[1]
+    nfft = 1 << (2 * n_grid - 1).bit_length()  # folga contra o efeito circular
+    freq = np.fft.rfftfreq(nfft)
+    spectrum = np.fft.rfft(counts, nfft, axis=1)
+    spectrum *= np.exp(-2 * (np.pi * freq[None, :] * bw[:, None]) ** 2)
+    return np.fft.irfft(spectrum, nfft, axis=1)[:, :n_grid]
+
+
+def count_peaks(density):
+    """Número de modos de cada linha de uma matriz de densidades."""
+    padded = np.pad(density, ((0, 0), (1, 1)))
+    mid = padded[:, 1:-1]
+    peak = (mid > padded[:, :-2]) & (mid >= padded[:, 2:])
+    peak &= mid >= MIN_PEAK_FRACTION * density.max(axis=1, keepdims=True)
+    modes = np.minimum(peak.sum(axis=1), 1)
+    for i in np.flatnonzero(peak.sum(axis=1) > 1):
+        row = density[i]
+        kept = []   # picos aceitos, da esquerda para a direita
+        for p in np.flatnonzero(peak[i]):
+            if kept and row[kept[-1]:p + 1].min() > MAX_VALLEY_RATIO * min(row[kept[-1]], row[p]):
+                # Vale raso: mesmo modo, fica o pico mais alto
+                if row[p] > row[kept[-1]]:
+                    kept[-1] = p
+                continue
+            kept.append(p)
+        modes[i] = len(kept)
+    return modes
+
+
+def count_modes(counts):
+    """Modos de cada linha de uma matriz de contagens (binned_from_samples/_stats)."""
+    counts = np.asarray(counts, dtype=np.float64)
+    if not len(counts):
+        return np.zeros(0, dtype=np.int64)
+    return count_peaks(smooth(counts, bandwidth_bins(counts)))
+
+
+def modes_of_samples(samples, grid_points=GRID_POINTS):
+    return count_modes(binned_from_samples(samples, grid_points)[0])
+
+
+def modes_of_stats(stats, grid_points=GRID_POINTS):
+    return count_modes(binned_from_stats(stats, grid_points)[0])
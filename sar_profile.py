@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+sar_profile.py
+Instrumentação por etapa (--profile nos três scripts).
+
+As etapas do pipeline são marcadas com `with stage('parse', rows=n):`. Com o
+perfil desligado (padrão) stage() devolve um objeto vazio e o custo é uma
+chamada de função. Ligado, cada etapa registra:
+
+  parede   tempo decorrido (time.perf_counter)
+  CPU      tempo de CPU do processo, mais o dos filhos já encerrados
+           (o `sar`/`sadf` chamados por subprocess)
+  RSS      pico de memória residente do processo até o fim da etapa
+  linhas   linhas/amostras processadas, quando a etapa informa
+
+Etapas podem ser aninhadas (o parse inclui o convert e o flush); o resumo
+mostra o tempo total e o próprio (sem as etapas internas). O sar/sadf lido
+em streaming fica numa trilha à parte, com a CPU só do processo filho. Etapas
+executadas em workers (ProcessPoolExecutor) voltam ao processo principal
+por pool_map, que substitui executor.map.
+
+Saídas: tabela no terminal e, com --profile-out, um trace do Chrome
+(.json, abre em chrome://tracing ou ui.perfetto.dev) ou um arquivo do
+cProfile (qualquer outra extensão; ler com `python -m pstats`).
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Pico de RSS do processo em MB (None sem o módulo resource)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em kB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def cpu_seconds(children_only=False):
+    """CPU do processo + dos filhos já encerrados (sar, sadf, workers do pool)."""
+    t = os.times()
+    children = t.children_user + t.children_system
+    return children if children_only else time.process_time() + children
+
+
+class _NullStage:
+    """Etapa com o perfil desligado: não mede nada (e ignora etapa.rows = n)."""
+    rows = 0
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullStage()
+
+CHILD_TID = 0
+
+
+class _Stage:
+    def __init__(self, profiler, name, rows, child, args):
+        self.profiler, self.name, self.rows, self.child, self.args = profiler, name, rows, child, args
+
+    def __enter__(self):
+        self._cpu = cpu_seconds(self.child)
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter()
+        self.profiler.events.append({
+            'name': self.name, 'start': self._wall, 'wall': wall - self._wall,
+            'cpu': cpu_seconds(self.child) - self._cpu, 'rss_mb': peak_rss_mb(), 'rows': self.rows,
+            # Processos externos ficam numa trilha própria (tid 0): lidos em
+            # streaming, o tempo deles se sobrepõe ao do parse que os consome
+            'pid': os.getpid(), 'tid': CHILD_TID if self.child else threading.get_ident(),
+            'args': self.args,
+        })
+        return False
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._cprofile = None
+
+    def stage(self, name, rows=None, child=False, **args):
+        """
+        Context manager de uma etapa; `rows` pode ser definido dentro do bloco
+        (etapa.rows = n). child=True marca a vida de um processo externo
+        (sar, sadf): só a CPU dele conta e a etapa não engloba as do consumidor.
+        """
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name, rows, child, args)
+
+    def start(self, cprofile=False):
+        self.enabled = True
+        self.events = []
+        if cprofile:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+    # -----------------------
+    # Resumo
+    # -----------------------
+    def summary(self):
+        """
+        Linhas (etapa, chamadas, parede, própria, CPU, linhas, pico RSS) na
+        ordem da primeira ocorrência de cada etapa.
+        """
+        own = self._self_times()
+        rows = {}
+        for i, e in enumerate(self.events):
+            r = rows.setdefault(e['name'], {'stage': e['name'], 'calls': 0, 'wall': 0.0, 'self': 0.0,
+                                            'cpu': 0.0, 'rows': None, 'rss_mb': None})
+            r['calls'] += 1
+            r['wall'] += e['wall']
+            r['self'] += own[i]
+            r['cpu'] += e['cpu']
+            if e['rows'] is not None:
+                r['rows'] = (r['rows'] or 0) + e['rows']
+            if e['rss_mb'] is not None:
+                r['rss_mb'] = max(r['rss_mb'] or 0, e['rss_mb'])
+        return list(rows.values())
+
+    def _self_times(self):
+        """Tempo de cada evento descontadas as etapas aninhadas (mesmo processo e thread)."""
+        own = [e['wall'] for e in self.events]
+        order = sorted(range(len(self.events)),
+                       key=lambda i: (self.events[i]['pid'], self.events[i]['tid'],
+                                      self.events[i]['start'], -self.events[i]['wall']))
+        stack = []
+        for i in order:
+            e = self.events[i]
+            while stack and (self.events[stack[-1]]['pid'], self.events[stack[-1]]['tid']) != (e['pid'], e['tid']):
+                stack.pop()
+            while stack and e['start'] >= self.events[stack[-1]]['start'] + self.events[stack[-1]]['wall']:
+                stack.pop()
+            if stack:
+                own[stack[-1]] -= e['wall']
+            stack.append(i)
+        return own
+
+    def print_summary(self):
+        table = self.summary()
+        print("\nPERFIL POR ETAPA (parede inclui as etapas internas; própria não)")
+        print("="*80)
+        print(f"{'etapa':<12} {'chamadas':>8} {'parede (s)':>11} {'própria (s)':>12} {'CPU (s)':>9} "
+              f"{'linhas':>12} {'pico RSS (MB)':>14}")
+        for r in table:
+            rows = f"{r['rows']:,}" if r['rows'] is not None else "-"
+            rss = f"{r['rss_mb']:.0f}" if r['rss_mb'] is not None else "-"
+            print(f"{r['stage']:<12} {r['calls']:>8} {r['wall']:>11.3f} {r['self']:>12.3f} {r['cpu']:>9.3f} "
+                  f"{rows:>12} {rss:>14}")
+        workers = len({e['pid'] for e in self.events} - {os.getpid()})
+        if workers:
+            print(f"(inclui etapas de {workers} processo(s) worker)")
+
+    # -----------------------
+    # Exportação
+    # -----------------------
+    def chrome_trace(self):
+        """Eventos no formato trace-event do Chrome ('X' = duração completa, em µs)."""
+        origin = min((e['start'] for e in self.events), default=0.0)
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': CHILD_TID, 'args': {'name': 'subprocess'}}
+                 for pid in dict.fromkeys(e['pid'] for e in self.events if e['tid'] == CHILD_TID)]
+        for e in self.events:
+            args = {k: v for k, v in e['args'].items()}
+            args.update({'cpu_ms': round(e['cpu'] * 1000, 3), 'rows': e['rows'], 'rss_mb': e['rss_mb']})
+            trace.append({'name': e['name'], 'cat': 'sar', 'ph': 'X',
+                          'ts': round((e['start'] - origin) * 1e6, 1), 'dur': round(e['wall'] * 1e6, 1),
+                          'pid': e['pid'], 'tid': e['tid'] % (1 << 31), 'args': args})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        """Trace do Chrome (.json) ou estatísticas do cProfile (outras extensões)."""
+        path = str(path)
+        if path.endswith('.json'):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.chrome_trace(), f, default=str)
+        elif self._cprofile is not None:
+            self._cprofile.dump_stats(path)
+        else:
+            raise ValueError("cProfile não foi ativado (use start(cprofile=True))")
+
+
+PROFILER = Profiler()
+
+
+def stage(name, rows=None, child=False, **args):
+    return PROFILER.stage(name, rows, child, **args)
+
+
+# -----------------------
+# Workers
+# -----------------------
+def _traced_call(fn, *args):
+    # No worker: liga o perfil só para esta tarefa e devolve os eventos junto
+    PROFILER.enabled = True
+    PROFILER.events = []
+    result = fn(*args)
+    return result, PROFILER.drain()
+
+
+def pool_map(executor, fn, *iterables):
+    """
+    executor.map(fn, ...) que, com o perfil ligado, traz de volta as etapas
+    registradas nos workers. Devolve uma lista (na ordem das tarefas).
+    """
+    if not PROFILER.enabled:
+        return list(executor.map(fn, *iterables))
+    out = []
+    for result, events in executor.map(_traced_call, itertools.repeat(fn), *iterables):
+        PROFILER.events.extend(events)
+        out.append(result)
+    return out
+
+
+# -----------------------
+# Linha de comando
+# -----------------------
+def add_profile_arguments(ap):
+    ap.add_argument("--profile", action="store_true",
+                    help="mede tempo, CPU, pico de RSS e linhas por etapa e imprime um resumo")
+    ap.add_argument("--profile-out", metavar="ARQ", default=None,
+                    help="salva o perfil: trace do Chrome (.json) ou cProfile/pstats (outra extensão)")
+
+
+def start_profile(args):
+    """Liga o perfil se pedido na linha de comando (--profile ou --profile-out)."""
+    if args.profile or args.profile_out:
+        PROFILER.start(cprofile=bool(args.profile_out) and not args.profile_out.endswith('.json'))
+
+
+def finish_profile(args):
+    """Imprime o resumo e grava --profile-out."""
+    if not PROFILER.enabled:
+        return
+    PROFILER.stop()
+    PROFILER.print_summary()
+    if args.profile_out:
+        PROFILER.dump(args.profile_out)
+        print(f"Perfil salvo em '{args.profile_out}'")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+sar_regimes.py
+Segmentação das séries em regimes (fases do teste de stress).
+
+O stress_test.sh inicia fio, stress-ng e sysbench em momentos diferentes e
+os encerra no fim: cada captura tem subida, patamar estável e cauda, e as
+estatísticas da captura inteira misturam as três fases.
+
+  segment       pontos de mudança de média por segmentação binária sobre as
+                somas acumuladas: o ganho de cada corte possível de um trecho
+                sai vetorizado das somas prefixadas (O(n) por trecho, O(n log n)
+                no total). Um corte só é aceito se o ganho passar de uma
+                penalidade BIC (PENALTY * variância * log n). A variância é a de
+                longo prazo (variância dos resíduos x tempo de autocorrelação,
+                sar_compare), senão amostras a cada 1 s, autocorrelacionadas,
+                gerariam cortes demais no patamar.
+  steady_window regimes curtos no início/fim (aquecimento e desaceleração,
+                até TRIM_MAX_FRACTION da série de cada lado) são descartados;
+                o que sobra é o patamar usado no CV e nos boxplots.
+"""
+
+import numpy as np
+
+from sar_compare import autocorrelation_time
+
+PENALTY = 3.0
+# Menor regime aceito (amostras)
+MIN_SEGMENT = 5
+MAX_REGIMES = 20
+# Máximo descartado em cada ponta (fração da série)
+TRIM_MAX_FRACTION = 0.25
+
+
+def _binary_segmentation(x, penalty, min_size, max_regimes):
+    """Limites [0, t1, ..., n] dos regimes, cortando sempre o trecho de maior ganho."""
+    n = len(x)
+    csum = np.concatenate([[0.0], np.cumsum(x)])
+
+    def best_split(a, b):
+        # Ganho (redução do custo quadrático) de cada corte t em [a + min, b - min]
+        t = np.arange(a + min_size, b - min_size + 1)
+        if not len(t):
+            return None
+        left, right = csum[t] - csum[a], csum[b] - csum[t]
+        gain = left ** 2 / (t - a) + right ** 2 / (b - t) - (csum[b] - csum[a]) ** 2 / (b - a)
+        i = int(np.argmax(gain))
+        return gain[i], int(t[i])
+
+    bounds = [0, n]
+    candidates = {}
+    pending = [(0, n)]
+    while len(bounds) - 1 < max_regimes:
+        for a, b in pending:
+            candidates[(a, b)] = best_split(a, b)
+        pending = []
+        viable = {k: v for k, v in candidates.items() if v is not None and v[0] > penalty}
+        if not viable:
+            break
+        (a, b), (_, t) = max(viable.items(), key=lambda kv: kv[1][0])
+        del candidates[(a, b)]
+        bounds.append(t)
+        pending = [(a, t), (t, b)]
+    return sorted(bounds)
+
+
+def segment(values, penalty=PENALTY, min_size=MIN_SEGMENT, max_regimes=MAX_REGIMES):
+    """
+    Limites [0, t1, ..., n] dos regimes de média constante de `values`
+    (índices sobre os valores finitos, na ordem original).
+    """
+    x = np.asarray(values, dtype=np.float64)
+    x = x[np.isfinite(x)]
+    n = len(x)
+    if n < 2 * min_size:
+        return [0, n]
+    # 1ª passada com a variância do ruído branco (diferenças, robusta a degraus)
+    sigma2 = (1.4826 * np.median(np.abs(np.diff(x) - np.median(np.diff(x))))) ** 2 / 2
+    if sigma2 == 0:
+        sigma2 = max(x.var(), 1e-12)
+    bounds = _binary_segmentation(x, penalty * sigma2 * np.log(n), min_size, max_regimes)
+    # 2ª passada com a variância de longo prazo dos resíduos da 1ª
+    resid = x - np.repeat([x[a:b].mean() for a, b in zip(bounds, bounds[1:])], np.diff(bounds))
+    long_run = resid.var() * autocorrelation_time(resid)
+    if long_run > 0:
+        bounds = _binary_segmentation(x, penalty * long_run * np.log(n), min_size, max_regimes)
+    return bounds
+
+
+def steady_window(bounds, max_trim=TRIM_MAX_FRACTION):
+    """
+    (início, fim) do patamar: descarta regimes iniciais e finais enquanto o
+    total descartado em cada ponta couber em `max_trim` da série.
+    """
+    n = bounds[-1]
+    limit = max_trim * n
+    start, end = 0, n
+    inner = bounds[1:-1]
+    for t in inner:
+        if t > limit:
+            break
+        start = t
+    for t in reversed(inner):
+        if n - t > limit or t <= start:
+            break
+        end = t
+    return start, end
+
+
+def steady_state(values, **kwargs):
+    """(valores do patamar, nº de regimes, início, fim) de uma série."""
+    x = np.asarray(values, dtype=np.float64)
+    x = x[np.isfinite(x)]
+    bounds = segment(x, **kwargs)
+    start, end = steady_window(bounds)
+    return x[start:end], len(bounds) - 1, start, end
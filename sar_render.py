@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+sar_render.py
+Renderização das figuras em lote (sem janela), em paralelo.
+
+Cada figura é descrita por uma tarefa (função, kwargs) com os dados já
+prontos (arrays, títulos, cores): a função monta a figura do zero, salva e
+fecha. Como as tarefas não dependem umas das outras nem do estado do pyplot,
+podem ser distribuídas num pool de processos, cada um com o backend Agg: um
+relatório com dezenas de figuras passa a ser limitado pelo nº de núcleos, e
+não pelas chamadas sequenciais ao matplotlib.
+
+Em modo lote (--batch, ou sem DISPLAY) o backend Agg é forçado e nada é
+mostrado na tela, então jobs de CI não ficam presos em plt.show().
+O matplotlib só é importado quando alguma figura é de fato gerada.
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from sar_profile import pool_map, stage
+
+FORMATS = ('png', 'svg', 'webp')
+DEFAULT_DPI = 300
+DEFAULT_FORMAT = 'png'
+
+# Backends sem janela
+NON_INTERACTIVE = {'agg', 'cairo', 'pdf', 'pgf', 'ps', 'svg', 'template'}
+
+
+def use_batch_backend():
+    """Força o backend Agg (também usado como inicializador dos workers)."""
+    import matplotlib
+
+    matplotlib.use('Agg', force=True)
+
+
+def is_batch():
+    import matplotlib
+
+    return matplotlib.get_backend().lower() in NON_INTERACTIVE
+
+
+def headless():
+    """Sem servidor gráfico (ex: runner de CI no Linux)."""
+    return (sys.platform.startswith('linux')
+            and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'))
+
+
+def output_name(name, fmt=DEFAULT_FORMAT):
+    """Nome do arquivo (sem extensão; rótulos de run podem ter pontos) no formato escolhido."""
+    return f'{name}.{fmt}'
+
+
+def save_figure(fig, name, dpi=DEFAULT_DPI, fmt=DEFAULT_FORMAT, show=False):
+    """Salva no formato pedido e fecha a figura; retorna o nome do arquivo."""
+    import matplotlib.pyplot as plt
+
+    filename = output_name(name, fmt)
+    with stage('savefig', fmt=fmt):
+        fig.savefig(filename, dpi=dpi, format=fmt, bbox_inches='tight')
+    if show and not is_batch():
+        plt.show()
+    plt.close(fig)
+    return filename
+
+
+def _run_task(task):
+    fn, kwargs = task
+    with stage('render', task=fn.__name__):
+        saved = fn(**kwargs)
+    return saved if isinstance(saved, list) else [saved]
+
+
+def render_all(tasks, jobs=None):
+    """
+    Executa as tarefas (função, kwargs) de renderização em `jobs` processos
+    e devolve os arquivos gerados, na ordem das tarefas.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return []
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+    if jobs == 1:
+        results = [_run_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=use_batch_backend) as executor:
+            results = pool_map(executor, _run_task, tasks)
+    return [filename for saved in results for filename in saved]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+sar_runs.py
+Comparação de N execuções (runs) do sar de uma vez.
+
+Cada run tem um rótulo (VM1, VM2, ... ou o informado) e opcionalmente um grupo
+(ex: "tuned" / "baseline" com 10-50 nós cada). As estatísticas de cada run e
+de cada grupo saem de uma passada pelas séries (RunningStats, sar_stats), sem
+loop por par de VMs.
+"""
+
+from pathlib import Path
+
+# Métricas comparadas: (nome, seção, colunas candidatas)
+METRICS = [
+    ('CPU_User', 'CPU', ['%user']),
+    ('CPU_System', 'CPU', ['%system']),
+    ('Memory_Used', 'MEMORY', ['%memused']),
+    ('Swap_Used', 'SWAP', ['%swpused']),
+    ('IO_TPS', 'IO', ['tps']),
+]
+
+
+def resolve_runs(files=(), groups=()):
+    """
+    Monta a lista de runs como (rótulo, grupo, caminho).
+
+    files:  caminhos avulsos, opcionalmente no formato 'RÓTULO=caminho';
+            sem rótulo recebem VM1, VM2, ... na ordem informada.
+    groups: listas [grupo, arq1, arq2, ...] (opção --group); os arquivos de
+            cada grupo recebem os rótulos '<grupo>-1', '<grupo>-2', ...
+    """
+    runs = []
+    for i, spec in enumerate(files):
+        spec = str(spec)
+        label, sep, path = spec.partition('=')
+        if not sep or Path(spec).exists():
+            label, path = f'VM{i + 1}', spec
+        runs.append((label, None, Path(path)))
+    for group, *paths in groups or ():
+        for j, path in enumerate(paths):
+            runs.append((f'{group}-{j + 1}', group, Path(path)))
+    labels = [label for label, _, _ in runs]
+    if len(set(labels)) != len(labels):
+        raise ValueError(f"rótulos repetidos: {labels}")
+    return runs
+
+
+def add_run_arguments(ap, default_files=()):
+    """Argumentos comuns: arquivos avulsos + --group NOME ARQ [ARQ ...] repetível."""
+    ap.add_argument("files", nargs="*", default=list(default_files),
+                    help="arquivos report.sar (opcionalmente RÓTULO=arquivo)")
+    ap.add_argument("-g", "--group", nargs="+", action="append", default=[],
+                    metavar=("NOME", "ARQ"),
+                    help="grupo de runs: nome seguido dos arquivos (pode repetir)")
+    return ap
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+sar_sampler.py
+Coletor nativo em Python, alternativa ao `sar -o` do stress_test.sh.
+
+  python3 sar_sampler.py record -o report.proc -i 0.1 -d 60
+  python3 sar_sampler.py info report.proc
+
+Lê /proc/stat, /proc/meminfo, /proc/swaps e /proc/diskstats com descritores
+abertos uma única vez e os.pread (sem open/close nem seek por amostra), em
+intervalos menores que 1 s e sem sysstat instalado. O agendamento é por
+instante absoluto (início + k * intervalo, relógio monotônico): o tempo de
+leitura e os atrasos do sleep não se acumulam; ticks perdidos por atraso
+maior que um intervalo são pulados e contados.
+
+Os contadores brutos são gravados nos mesmos layouts do sysstat (stats_cpu,
+stats_memory, stats_io) mais os de cada disco, em blocos colunares int64
+(um array contíguo por atividade) acrescentados a cada --flush segundos.
+read_sample_file decodifica com as mesmas funções do sar_binary e devolve
+as seções do leitor nativo (CPU, PERCPU, MEMORY, SWAP, IO, DISK), então os
+arquivos entram direto no SARDataParser2 e no CV_metric_final (read_metrics_file
+escolhe o leitor pelo magic).
+
+read_sample_file devolve uma linha por amostra, na resolução da coleta, com
+o epoch em segundos com fração (o MetricStore e o sar_align trabalham com
+essa resolução). read_samples devolve os contadores brutos.
+
+O custo do próprio coletor (CPU por amostra, % de um núcleo, atraso em relação
+ao agendado) é medido, impresso ao final e gravado no arquivo.
+"""
+
+import argparse
+import json
+import os
+import platform
+import signal
+import struct
+import sys
+import time
+
+import numpy as np
+
+from sar_binary import _cpu_columns, _io_columns, _memory_columns, _pct, read_sa_file
+from sar_stats import RunningStats
+
+MAGIC = b'SARPROC1'
+SAMPLE_VERSION = 1
+DEFAULT_INTERVAL = 0.1
+DEFAULT_FLUSH = 5.0
+# Buffer inicial do pread; dobra se o arquivo do /proc não couber
+READ_SIZE = 1 << 16
+
+# Registros após o cabeçalho: tag (1 byte) + tamanho (uint32) + conteúdo
+REC_BLOCK = b'B'
+REC_END = b'E'
+REC_HEAD = struct.Struct('<cI')
+
+# /proc/stat: user nice system idle iowait irq softirq steal guest guest_nice
+# -> ordem do stats_cpu do sysstat: user nice sys idle iowait steal hardirq softirq guest guest_nice
+CPU_ORDER = (0, 1, 2, 3, 4, 7, 5, 6, 8, 9)
+CPU_FIELDS = 10
+
+# stats_memory do sysstat <- chaves do /proc/meminfo (Swap* vêm do /proc/swaps)
+MEMORY_KEYS = (b'MemFree', b'Buffers', b'Cached', b'MemTotal', b'SwapFree', b'SwapTotal',
+               b'SwapCached', b'Committed_AS', b'Active', b'Inactive', b'Dirty', b'AnonPages',
+               b'Slab', b'KernelStack', b'PageTables', b'VmallocUsed', b'MemAvailable')
+SWAP_FREE, SWAP_TOTAL = 4, 5
+
+# stats_io: tps rtps wtps rblk wblk dtps dblk
+IO_FIELDS = 7
+
+# /proc/diskstats (a partir da 4ª coluna) guardados por disco
+DISK_STATS = ('rd_ios', 'rd_sec', 'rd_ticks', 'wr_ios', 'wr_sec', 'wr_ticks',
+              'io_ticks', 'time_in_queue', 'dc_ios', 'dc_sec', 'dc_ticks')
+# posição de cada um entre os campos depois do nome do dispositivo
+DISK_COLUMNS = (0, 2, 3, 4, 6, 7, 9, 10, 11, 13, 14)
+
+
+class ProcSampler:
+    """
+    Descritores do /proc abertos uma vez; sample() lê todos com os.pread e
+    preenche a linha `i` dos buffers do bloco atual.
+    """
+
+    def __init__(self, block_rows):
+        self.size = READ_SIZE
+        self.stat_fd = os.open('/proc/stat', os.O_RDONLY)
+        self.mem_fd = os.open('/proc/meminfo', os.O_RDONLY)
+        self.swap_fd = self._open_optional('/proc/swaps')
+        self.disk_fd = self._open_optional('/proc/diskstats')
+
+        stat = self._pread(self.stat_fd).split(b'\n')
+        self.cpu_nr = sum(1 for line in stat if line.startswith(b'cpu')) - 1
+        self._mem_index = None
+        self.disks = self._physical_disks()
+        # Discos de DISK/IO; os adicionados depois do início não entram
+        self._disk_names = [name.encode() for name in self.disks]
+        self.widths = {'t': 1, 'wall': 1, 'cpu': (self.cpu_nr + 1) * CPU_FIELDS,
+                       'mem': len(MEMORY_KEYS), 'io': IO_FIELDS, 'disk': len(self.disks) * len(DISK_STATS)}
+        self.block = {name: np.zeros((block_rows, w), dtype=np.int64) for name, w in self.widths.items()}
+
+    @staticmethod
+    def _open_optional(path):
+        try:
+            return os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+
+    def _pread(self, fd):
+        while True:
+            data = os.pread(fd, self.size, 0)
+            if len(data) < self.size:
+                return data
+            self.size *= 2
+
+    def _physical_disks(self):
+        """Discos inteiros com dispositivo por trás (sem partições, loop, ram, zram)."""
+        if self.disk_fd is None:
+            return []
+        names = [line.split()[2].decode() for line in self._pread(self.disk_fd).splitlines() if line.strip()]
+        return [n for n in names if os.path.exists(f'/sys/block/{n.replace("/", "!")}/device')]
+
+    def close(self):
+        for fd in (self.stat_fd, self.mem_fd, self.swap_fd, self.disk_fd):
+            if fd is not None:
+                os.close(fd)
+
+    # -----------------------
+    # Uma amostra
+    # -----------------------
+    def sample(self, i):
+        b = self.block
+        b['t'][i, 0] = time.monotonic_ns()
+        b['wall'][i, 0] = time.time_ns()
+        b['cpu'][i] = self._cpu()
+        b['mem'][i] = self._memory()
+        if self.disk_fd is not None:
+            io, disk = self._disks()
+            b['io'][i] = io
+            b['disk'][i] = disk
+
+    def _cpu(self):
+        row = [0] * ((self.cpu_nr + 1) * CPU_FIELDS)
+        for line in self._pread(self.stat_fd).split(b'\n'):
+            if not line.startswith(b'cpu'):
+                break
+            f = line.split()
+            # 'cpu' é o total; 'cpuN' vai para a posição N+1 (núcleos offline ficam zerados)
+            pos = 0 if len(f[0]) == 3 else (int(f[0][3:]) + 1) * CPU_FIELDS
+            if pos >= len(row):
+                continue
+            v = f[1:] + [b'0'] * (CPU_FIELDS + 1 - len(f))
+            row[pos:pos + CPU_FIELDS] = [int(v[k]) for k in CPU_ORDER]
+        return row
+
+    def _memory(self):
+        lines = self._pread(self.mem_fd).split(b'\n')
+        index = self._mem_index
+        if index is None or any(not lines[j].startswith(key) for key, j in zip(MEMORY_KEYS, index) if j >= 0):
+            # Posição de cada chave no arquivo, resolvida uma vez (a ordem do meminfo não muda)
+            names = [line.split(b':', 1)[0] for line in lines]
+            index = self._mem_index = [names.index(k) if k in names else -1 for k in MEMORY_KEYS]
+        row = [int(lines[j].split()[1]) if j >= 0 else 0 for j in index]
+        if self.swap_fd is not None:
+            size = used = 0
+            for line in self._pread(self.swap_fd).split(b'\n')[1:]:
+                f = line.split()
+                if len(f) >= 4:
+                    size += int(f[2])
+                    used += int(f[3])
+            row[SWAP_TOTAL], row[SWAP_FREE] = size, size - used
+        return row
+
+    def _disks(self):
+        wanted = self._disk_names
+        stats = {}
+        for line in self._pread(self.disk_fd).split(b'\n'):
+            f = line.split()
+            if len(f) > 3 and f[2] in wanted:
+                v = f[3:] + [b'0'] * (15 - len(f[3:]))
+                stats[f[2]] = [int(v[k]) for k in DISK_COLUMNS]
+        disk = []
+        io = [0] * IO_FIELDS
+        for name in wanted:
+            s = stats.get(name, [0] * len(DISK_STATS))
+            disk += s
+            rd_ios, rd_sec, _, wr_ios, wr_sec, _, _, _, dc_ios, dc_sec, _ = s
+            io[0] += rd_ios + wr_ios + dc_ios
+            io[1] += rd_ios
+            io[2] += wr_ios
+            io[3] += rd_sec
+            io[4] += wr_sec
+            io[5] += dc_ios
+            io[6] += dc_sec
+        return io, disk
+
+
+# -----------------------
+# Arquivo
+# -----------------------
+def write_header(f, sampler, interval):
+    meta = {
+        'version': SAMPLE_VERSION, 'interval': interval, 'nodename': platform.node(),
+        'kernel': platform.release(), 'cpu_nr': sampler.cpu_nr, 'disks': sampler.disks,
+        'widths': sampler.widths, 'start': time.time(),
+    }
+    raw = json.dumps(meta).encode()
+    f.write(MAGIC + struct.pack('<I', len(raw)) + raw)
+
+
+def write_block(f, block, n):
+    """Um bloco colunar: nº de linhas + um array int64 por atividade (na ordem de `widths`)."""
+    payload = struct.pack('<I', n) + b''.join(np.ascontiguousarray(a[:n], dtype='<i8').tobytes()
+                                              for a in block.values())
+    f.write(REC_HEAD.pack(REC_BLOCK, len(payload)) + payload)
+    f.flush()
+
+
+def write_end(f, overhead):
+    raw = json.dumps(overhead).encode()
+    f.write(REC_HEAD.pack(REC_END, len(raw)) + raw)
+    f.flush()
+
+
+def is_sample_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_samples(path):
+    """
+    (cabeçalho, {atividade: int64[amostras, largura]}) com os contadores
+    brutos. Um bloco incompleto no fim (coletor interrompido) é ignorado.
+    """
+    with open(path, 'rb') as f:
+        buf = f.read()
+    if buf[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} não é um arquivo do sar_sampler")
+    (size,) = struct.unpack_from('<I', buf, len(MAGIC))
+    pos = len(MAGIC) + 4
+    hdr = json.loads(buf[pos:pos + size])
+    pos += size
+    widths = hdr['widths']
+    parts = {name: [] for name in widths}
+    hdr['overhead'] = None
+    while pos + REC_HEAD.size <= len(buf):
+        tag, size = REC_HEAD.unpack_from(buf, pos)
+        start, pos = pos + REC_HEAD.size, pos + REC_HEAD.size + size
+        if pos > len(buf):
+            break
+        if tag == REC_END:
+            hdr['overhead'] = json.loads(buf[start:pos])
+        elif tag == REC_BLOCK:
+            (n,) = struct.unpack_from('<I', buf, start)
+            offset = start + 4
+            for name, w in widths.items():
+                parts[name].append(np.frombuffer(buf, dtype='<i8', count=n * w, offset=offset).reshape(n, w))
+                offset += n * w * 8
+    data = {name: (np.concatenate(p) if p else np.zeros((0, widths[name]), dtype=np.int64))
+            for name, p in parts.items()}
+    return hdr, data
+
+
+# -----------------------
+# Decodificação nas seções do sar
+# -----------------------
+def _disk_columns(d, itv, names):
+    """Colunas do `sar -d` a partir das diferenças (intervalos, discos, DISK_STATS)."""
+    d = np.maximum(d, 0).astype(np.float64)
+    rd_ios, rd_sec, rd_ticks, wr_ios, wr_sec, wr_ticks, io_ticks, queue, dc_ios, dc_sec, dc_ticks = \
+        np.moveaxis(d, 2, 0)
+    itv = itv[:, None]
+    ios = rd_ios + wr_ios + dc_ios
+    kb = (rd_sec + wr_sec + dc_sec) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns = {
+            'DEV': np.tile(np.array(names, dtype=object), d.shape[0]),
+            'tps': ios / itv,
+            'rkB/s': rd_sec / 2 / itv,
+            'wkB/s': wr_sec / 2 / itv,
+            'dkB/s': dc_sec / 2 / itv,
+            'areq-sz': np.where(ios > 0, kb / np.where(ios > 0, ios, 1), 0.0),
+            'aqu-sz': queue / itv / 1000,
+            'await': np.where(ios > 0, (rd_ticks + wr_ticks + dc_ticks) / np.where(ios > 0, ios, 1), 0.0),
+            '%util': np.minimum(_pct(io_ticks, itv * 1000), 100.0),
+        }
+    return {k: v if k == 'DEV' else v.ravel() for k, v in columns.items()}
+
+
+def read_sample_file(path, every=1):
+    """
+    Lê um arquivo do sar_sampler e devolve (header, sections) como
+    sar_binary.read_sa_file: {'CPU'|'PERCPU'|'MEMORY'|'SWAP'|'IO'|'DISK':
+    {coluna: np.ndarray}}, com 'epoch' (s, float64) no fim de cada intervalo.
+    Por padrão uma linha por amostra; `every` > 1 usa uma a cada `every`
+    (os contadores são cumulativos, então as taxas do intervalo maior são
+    exatas). O epoch é o relógio de parede da primeira amostra mais o tempo
+    monotônico decorrido: estritamente crescente mesmo se o relógio for ajustado.
+    """
+    hdr, data = read_samples(path)
+    hdr['text_sections'] = []
+    t, wall = data['t'][:, 0], data['wall'][:, 0]
+    keep = np.arange(0, len(t), max(int(every), 1))
+    cur, prev = keep[1:], keep[:-1]
+    if len(cur) == 0:
+        return hdr, {}
+    itv = (t[cur] - t[prev]) / 1e9
+    itv = np.where(itv > 0, itv, 1.0)
+    epoch = (wall[0] + (t[cur] - t[0])) / 1e9
+
+    cpu = data['cpu'].reshape(len(t), hdr['cpu_nr'] + 1, CPU_FIELDS)
+    sections = {'CPU': _cpu_columns(cpu[cur, 0] - cpu[prev, 0], np.full(len(cur), 'all', dtype=object))}
+    if hdr['cpu_nr'] > 0:
+        d = (cpu[cur, 1:] - cpu[prev, 1:]).reshape(-1, CPU_FIELDS)
+        names = np.arange(hdr['cpu_nr']).astype(str).astype(object)
+        sections['PERCPU'] = _cpu_columns(d, np.tile(names, len(cur)))
+        sections['PERCPU']['epoch'] = np.repeat(epoch, hdr['cpu_nr'])
+    sections['MEMORY'], sections['SWAP'] = _memory_columns(data['mem'], cur)
+    if hdr['disks']:
+        sections['IO'] = _io_columns(data['io'], cur, prev, itv)
+        disk = data['disk'].reshape(len(t), len(hdr['disks']), len(DISK_STATS))
+        sections['DISK'] = _disk_columns(disk[cur] - disk[prev], itv, hdr['disks'])
+        sections['DISK']['epoch'] = np.repeat(epoch, len(hdr['disks']))
+    for cols in sections.values():
+        cols.setdefault('epoch', epoch)
+    return hdr, sections
+
+
+def read_metrics_file(path):
+    """read_sample_file ou sar_binary.read_sa_file, conforme o magic do arquivo."""
+    return read_sample_file(path) if is_sample_file(path) else read_sa_file(path)
+
+
+# -----------------------
+# Coleta
+# -----------------------
+class _Stop(Exception):
+    pass
+
+
+def record(path, interval=DEFAULT_INTERVAL, duration=None, count=None, flush=DEFAULT_FLUSH):
+    """
+    Coleta até `duration` segundos ou `count` amostras (ou SIGINT/SIGTERM)
+    e devolve o resumo do custo do coletor (também gravado no fim do arquivo).
+    """
+    block_rows = max(1, int(round(flush / interval)))
+    sampler = ProcSampler(block_rows)
+    if count is None and duration is not None:
+        count = int(round(duration / interval)) + 1
+    step = int(interval * 1e9)
+    # Atraso de cada amostra em relação ao instante agendado (µs), acumulado por bloco
+    late, lateness = np.zeros(block_rows), RunningStats()
+    sample_cpu = n = missed = rows = 0
+
+    # Um sinal durante o sleep encerra na hora; no meio de uma amostra ou de
+    # uma gravação, só ao fim dela (o bloco nunca fica pela metade)
+    state = {'stop': False, 'sleeping': False}
+
+    def on_signal(signum, frame):
+        state['stop'] = True
+        if state['sleeping']:
+            raise _Stop()
+
+    old = {s: signal.signal(s, on_signal) for s in (signal.SIGINT, signal.SIGTERM)}
+    cpu0, wall0 = time.process_time_ns(), time.monotonic_ns()
+    f = open(path, 'wb')
+    try:
+        write_header(f, sampler, interval)
+        start = time.monotonic_ns()
+        tick = 0
+        while (count is None or n < count) and not state['stop']:
+            target = start + tick * step
+            delay = target - time.monotonic_ns()
+            if delay > 0:
+                state['sleeping'] = True
+                try:
+                    time.sleep(delay / 1e9)
+                except _Stop:
+                    break
+                finally:
+                    state['sleeping'] = False
+            c = time.process_time_ns()
+            sampler.sample(rows)
+            sample_cpu += time.process_time_ns() - c
+            late[rows] = (sampler.block['t'][rows, 0] - target) / 1e3
+            n += 1
+            rows += 1
+            if rows == block_rows:
+                write_block(f, sampler.block, rows)
+                lateness.update(late[:rows])
+                rows = 0
+            # Próximo tick no agendamento absoluto; ticks cujo instante já passou
+            # inteiro (atraso maior que um intervalo) são pulados
+            tick += 1
+            behind = (time.monotonic_ns() - start) // step - tick
+            if behind > 0:
+                missed += behind
+                tick += behind
+    finally:
+        for s, handler in old.items():
+            signal.signal(s, handler)
+        if rows:
+            write_block(f, sampler.block, rows)
+            lateness.update(late[:rows])
+        wall = (time.monotonic_ns() - wall0) / 1e9
+        cpu = (time.process_time_ns() - cpu0) / 1e9
+        late_row = lateness.as_row()
+        overhead = {
+            'samples': n, 'missed': missed, 'wall_s': wall, 'cpu_s': cpu,
+            'cpu_pct': 100 * cpu / wall if wall else 0.0,
+            'sample_cpu_us': sample_cpu / 1e3 / n if n else 0.0,
+            'late_mean_us': float(late_row['mean']) if n else 0.0,
+            'late_p99_us': float(late_row['p99']) if n else 0.0,
+            'late_max_us': float(late_row['max']) if n else 0.0,
+        }
+        write_end(f, overhead)
+        f.close()
+        sampler.close()
+    return overhead
+
+
+def print_overhead(o, interval=None):
+    print(f"Amostras: {o['samples']} (ticks perdidos: {o['missed']}) em {o['wall_s']:.1f}s"
+          + (f", intervalo {interval:g}s" if interval else ""))
+    print(f"Custo do coletor: {o['cpu_s'] * 1000:.0f} ms de CPU ({o['cpu_pct']:.2f}% de um núcleo), "
+          f"{o['sample_cpu_us']:.0f} µs por amostra")
+    print(f"Atraso em relação ao agendado: média {o['late_mean_us']:.0f} µs, "
+          f"p99 {o['late_p99_us']:.0f} µs, máx {o['late_max_us']:.0f} µs")
+
+
+# -----------------------
+# Main
+# -----------------------
+def cmd_record(args):
+    if not os.path.exists('/proc/stat'):
+        print("Coletor nativo requer Linux (/proc)")
+        sys.exit(1)
+    print(f"Coletando a cada {args.interval:g}s em '{args.output}' (Ctrl+C para encerrar)...")
+    overhead = record(args.output, args.interval, args.duration, args.count, args.flush)
+    print_overhead(overhead, args.interval)
+
+
+def cmd_info(args):
+    hdr, data = read_samples(args.file)
+    n = len(data['t'])
+    span = (data['t'][-1, 0] - data['t'][0, 0]) / 1e9 if n > 1 else 0.0
+    print(f"{args.file}: {hdr['nodename']} (kernel {hdr['kernel']}), {hdr['cpu_nr']} núcleos, "
+          f"discos: {', '.join(hdr['disks']) or '-'}")
+    print(f"{n} amostras em {span:.1f}s, intervalo {hdr['interval']:g}s, "
+          f"{os.path.getsize(args.file) / max(n, 1):.0f} bytes por amostra")
+    if hdr['overhead']:
+        print_overhead(hdr['overhead'])
+    else:
+        print("Sem resumo de custo (coleta interrompida antes do fim)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Coletor de métricas via /proc (alternativa ao sar -o)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="coleta até --duration/--count ou Ctrl+C")
+    rec.add_argument("-o", "--output", default="report.proc")
+    rec.add_argument("-i", "--interval", type=float, default=DEFAULT_INTERVAL, help="segundos entre amostras")
+    rec.add_argument("-d", "--duration", type=float, default=None, help="duração da coleta (s)")
+    rec.add_argument("-n", "--count", type=int, default=None, help="nº de amostras")
+    rec.add_argument("--flush", type=float, default=DEFAULT_FLUSH,
+                     help="segundos de amostras por bloco gravado no arquivo")
+    rec.set_defaults(func=cmd_record)
+
+    info = sub.add_parser("info", help="resume um arquivo gravado (amostras, custo da coleta)")
+    info.add_argument("file")
+    info.set_defaults(func=cmd_info)
+
+    args = ap.parse_args()
+    if args.command == "record" and args.interval <= 0:
+        ap.error("--interval deve ser positivo")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
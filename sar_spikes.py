@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+sar_spikes.py
+Detecção de picos (anomalias) com mediana/MAD móveis.
+
+Picos são justamente o que torna a média enganosa, mas nos gráficos eles só
+aparecem como linhas. Aqui cada amostra é comparada com a vizinhança:
+
+  z = (x - mediana da janela) / (1.4826 * MAD da janela)
+
+com janelas centradas de WINDOW amostras. Mediana e MAD são robustos: o
+próprio pico não desloca a referência (como deslocaria média/desvio ou uma
+EWMA). Amostras com |z| >= THRESHOLD viram anomalias, e anomalias separadas
+por até MERGE_GAP amostras formam uma janela de anomalia.
+
+As janelas móveis são vistas (sliding_window_view, sem cópia) sobre blocos
+da série, reduzidas por linha com uma partição: memória limitada a
+CHUNK x WINDOW valores, tempo linear no número de amostras.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from sar_store import ENTITY_SECTIONS
+
+WINDOW = 61
+# Com ruído gaussiano, ~10 janelas falsas por milhão de amostras
+THRESHOLD = 6.0
+MERGE_GAP = 2
+# Campos de cada janela devolvida por detect_spikes (colunas do anomalias.csv)
+SPIKE_COLUMNS = ['run', 'section', 'metric', 'start', 'end', 'samples', 'peak', 'baseline', 'score']
+# Amostras por bloco (linhas da matriz de janelas)
+CHUNK = 1 << 16
+# Piso do MAD, relativo à mediana: evita que séries quase constantes gerem
+# "picos" a cada oscilação mínima
+MAD_FLOOR_FRACTION = 0.01
+MAD_FLOOR_ABS = 1e-6
+
+
+def rolling_median_mad(values, window=WINDOW, chunk=CHUNK):
+    """Mediana e MAD móveis (janela centrada; bordas repetem o primeiro/último valor)."""
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    window = max(1, min(window, n) | 1)   # ímpar: a janela fica centrada
+    half = window // 2
+    padded = np.pad(x, half, mode='edge')
+    med = np.empty(n)
+    mad = np.empty(n)
+    has_nan = np.isnan(x).any()
+
+    def median(windows):
+        if has_nan:
+            return np.nanmedian(windows, axis=1)
+        # Janela ímpar: a mediana é o elemento do meio, e uma partição basta
+        # (bem mais rápida que np.median)
+        return np.partition(windows, half, axis=1)[:, half]
+
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        windows = sliding_window_view(padded[start:end + 2 * half], window)
+        m = median(windows)
+        med[start:end] = m
+        mad[start:end] = median(np.abs(windows - m[:, None]))
+    return med, mad
+
+
+def robust_scores(values, window=WINDOW):
+    """z robusto de cada amostra; também devolve a mediana móvel (referência)."""
+    x = np.asarray(values, dtype=np.float64)
+    if not len(x):
+        return np.empty(0), np.empty(0)
+    med, mad = rolling_median_mad(x, window)
+    scale = 1.4826 * np.maximum(mad, np.maximum(MAD_FLOOR_FRACTION * np.abs(med), MAD_FLOOR_ABS))
+    return (x - med) / scale, med
+
+
+def spike_windows(epoch, values, window=WINDOW, threshold=THRESHOLD, merge_gap=MERGE_GAP):
+    """
+    Janelas de anomalia de uma série: lista de dicts com início/fim (epoch),
+    nº de amostras, valor de pico, mediana de referência no pico e z do pico.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    epoch = np.asarray(epoch, dtype=np.float64)
+    z, med = robust_scores(x, window)
+    flagged = np.flatnonzero(np.abs(np.nan_to_num(z)) >= threshold)
+    if not len(flagged):
+        return []
+    # Quebra onde a distância até a próxima anomalia passa de merge_gap
+    breaks = np.flatnonzero(np.diff(flagged) > merge_gap + 1)
+    starts = flagged[np.r_[0, breaks + 1]]
+    ends = flagged[np.r_[breaks, len(flagged) - 1]]
+    out = []
+    for a, b in zip(starts, ends):
+        peak = a + int(np.argmax(np.abs(z[a:b + 1])))
+        out.append({
+            'start': float(epoch[a]), 'end': float(epoch[b]), 'samples': int(b - a + 1),
+            'peak': float(x[peak]), 'baseline': float(med[peak]), 'score': float(z[peak]),
+        })
+    return out
+
+
+def detect_spikes(store, runs=None, window=WINDOW, threshold=THRESHOLD, merge_gap=MERGE_GAP):
+    """
+    Janelas de anomalia de todas as séries do MetricStore (todas as runs,
+    seções e métricas; seções por entidade ficam de fora), como lista de
+    dicts com as colunas de SPIKE_COLUMNS, ordenada por |z|.
+    """
+    rows = []
+    for run, section in store.keys():
+        if section in ENTITY_SECTIONS or (runs is not None and run not in runs):
+            continue
+        epoch = store.epoch(run, section)
+        for metric in store.metrics(run, section):
+            for w in spike_windows(epoch, store.values(run, section, metric), window, threshold, merge_gap):
+                rows.append({'run': run, 'section': section, 'metric': metric, **w})
+    rows.sort(key=lambda r: abs(r['score']), reverse=True)
+    return rows
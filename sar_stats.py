@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+sar_stats.py
+Estatísticas em streaming: alimentadas bloco a bloco, combináveis entre
+arquivos/nós e serializáveis.
+
+  RunningStats   count, média, desvio (Welford/Chan), CV, mínimo, máximo e
+                 quantis aproximados (mediana, p90, p95, p99).
+  QuantileSketch t-digest ("merging digest") vetorizado com NumPy: guarda no
+                 máximo ~`compression` centroides, com centroides menores nas
+                 caudas (p99 preciso). Enquanto houver poucos pontos os
+                 valores são guardados sem compressão e os quantis são exatos.
+  LogHistogram   histograma com baldes logarítmicos de largura relativa fixa
+                 (~1%): mesmos baldes em todos os nós, então a combinação é
+                 só somar as contagens (forma da distribuição, multimodalidade).
+
+A memória não depende do nº de amostras: relatórios de CV/percentis de
+semanas de dados da frota toda cabem num dicionário por (run, métrica).
+"""
+
+import numpy as np
+
+DEFAULT_COMPRESSION = 200
+# Tamanho dos blocos usados para alimentar os acumuladores a partir de um array
+STATS_CHUNK = 65536
+QUANTILES = (('median', 0.5), ('p90', 0.90), ('p95', 0.95), ('p99', 0.99))
+# Erro relativo máximo do valor representado por um balde do histograma
+HIST_RELATIVE_ERROR = 0.01
+# Valores com módulo abaixo disso vão para o balde do zero
+HIST_MIN_VALUE = 1e-9
+
+
+class QuantileSketch:
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+        self._buffer = []
+        self._buffered = 0
+
+    def update(self, values):
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[np.isfinite(arr)]
+        if not len(arr):
+            return
+        self.min = min(self.min, arr.min())
+        self.max = max(self.max, arr.max())
+        self._buffer.append(arr)
+        self._buffered += len(arr)
+        if self._buffered >= 5 * self.compression:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        values = np.concatenate(self._buffer)
+        self._buffer, self._buffered = [], 0
+        self._compress(np.concatenate([self.means, values]),
+                       np.concatenate([self.weights, np.ones(len(values))]))
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        if len(means) <= self.compression:
+            self.means, self.weights = means, weights
+            return
+        # Escala k1 do t-digest: cada centroide cobre no máximo uma unidade de k,
+        # o que dá centroides pequenos perto de q=0 e q=1
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        bins = np.floor(k - k[0]).astype(np.int64)
+        w = np.bincount(bins, weights=weights)
+        m = np.bincount(bins, weights=weights * means)
+        keep = w > 0
+        self.means, self.weights = m[keep] / w[keep], w[keep]
+
+    def merge(self, other):
+        other._flush()
+        self._flush()
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]),
+                       np.concatenate([self.weights, other.weights]))
+        return self
+
+    def quantile(self, q):
+        self._flush()
+        if not len(self.means):
+            return np.nan
+        if (self.weights == 1).all():
+            # Ainda sem compressão: quantil exato (mesma interpolação do pandas)
+            return float(np.quantile(self.means, q))
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * total, np.concatenate([[0], centers, [total]]),
+                               np.concatenate([[self.min], self.means, [self.max]])))
+
+    def to_dict(self):
+        self._flush()
+        return {'compression': self.compression, 'means': self.means.tolist(),
+                'weights': self.weights.tolist(), 'min': float(self.min), 'max': float(self.max)}
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['compression'])
+        sketch.means = np.asarray(d['means'], dtype=np.float64)
+        sketch.weights = np.asarray(d['weights'], dtype=np.float64)
+        sketch.min, sketch.max = d['min'], d['max']
+        return sketch
+
+
+class LogHistogram:
+    """
+    Balde k (k inteiro) cobre (gamma^(k-1), gamma^k], com
+    gamma = (1 + erro) / (1 - erro); negativos usam os mesmos baldes no
+    módulo. Os índices não dependem dos dados, então histogramas de
+    arquivos/nós diferentes combinam somando as contagens por índice.
+    """
+
+    def __init__(self, relative_error=HIST_RELATIVE_ERROR):
+        self.relative_error = relative_error
+        self._log_gamma = np.log((1 + relative_error) / (1 - relative_error))
+        self.zero = 0
+        self.positive = {}   # índice -> contagem
+        self.negative = {}
+
+    def _add(self, buckets, values):
+        keys, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64),
+                                 return_counts=True)
+        for k, c in zip(keys.tolist(), counts.tolist()):
+            buckets[k] = buckets.get(k, 0) + c
+
+    def update(self, values):
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[np.isfinite(arr)]
+        small = np.abs(arr) < HIST_MIN_VALUE
+        self.zero += int(small.sum())
+        arr = arr[~small]
+        if (arr > 0).any():
+            self._add(self.positive, arr[arr > 0])
+        if (arr < 0).any():
+            self._add(self.negative, -arr[arr < 0])
+
+    def merge(self, other):
+        if other.relative_error != self.relative_error:
+            raise ValueError("histogramas com erro relativo diferente não podem ser combinados")
+        self.zero += other.zero
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for k, c in theirs.items():
+                mine[k] = mine.get(k, 0) + c
+        return self
+
+    @property
+    def count(self):
+        return self.zero + sum(self.positive.values()) + sum(self.negative.values())
+
+    def bins(self):
+        """(limite inferior, limite superior, contagem) de cada balde não vazio, em ordem crescente."""
+        gamma = np.exp(self._log_gamma)
+        rows = [(-gamma ** k, -gamma ** (k - 1), c) for k, c in sorted(self.negative.items(), reverse=True)]
+        if self.zero:
+            rows.append((-HIST_MIN_VALUE, HIST_MIN_VALUE, self.zero))
+        rows += [(gamma ** (k - 1), gamma ** k, c) for k, c in sorted(self.positive.items())]
+        if not rows:
+            return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+        lower, upper, counts = zip(*rows)
+        return np.array(lower), np.array(upper), np.array(counts, dtype=np.int64)
+
+    def to_dict(self):
+        # Chaves de dicionário JSON são texto: guarda como listas paralelas
+        return {'relative_error': self.relative_error, 'zero': self.zero,
+                'positive': [list(self.positive), list(self.positive.values())],
+                'negative': [list(self.negative), list(self.negative.values())]}
+
+    @classmethod
+    def from_dict(cls, d):
+        hist = cls(d['relative_error'])
+        hist.zero = d['zero']
+        hist.positive = dict(zip(*d['positive']))
+        hist.negative = dict(zip(*d['negative']))
+        return hist
+
+
+class RunningStats:
+    """
+    count, média, desvio, mínimo, máximo, quantis e histograma acumulados
+    por blocos: cada update() custa o tamanho do bloco novo. Os blocos (e
+    outros RunningStats, via merge) são combinados pela fórmula de Chan.
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(compression)
+        self.hist = LogHistogram()
+
+    @classmethod
+    def from_values(cls, values, chunk=STATS_CHUNK):
+        """Acumula um array (ou Series) inteiro, em blocos de `chunk`."""
+        stats = cls()
+        arr = np.asarray(values, dtype=np.float64)
+        for start in range(0, len(arr), chunk):
+            stats.update(arr[start:start + chunk])
+        return stats
+
+    def _combine(self, count, mean, m2, vmin, vmax):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+
+    def update(self, values):
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[~np.isnan(arr)]
+        if not len(arr):
+            return
+        mean = arr.mean()
+        self._combine(len(arr), mean, ((arr - mean) ** 2).sum(), arr.min(), arr.max())
+        self.sketch.update(arr)
+        self.hist.update(arr)
+
+    def merge(self, other):
+        """Combina outro RunningStats (outro arquivo/nó) neste."""
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.sketch.merge(other.sketch)
+        self.hist.merge(other.hist)
+        return self
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+    def as_row(self):
+        std = self.std
+        row = {
+            'count': self.count,
+            'mean': self.mean if self.count else np.nan,
+            'std': std,
+            'max': self.max if self.count else np.nan,
+            'min': self.min if self.count else np.nan,
+            'cv': std / self.mean if self.count and self.mean != 0 else np.nan,
+        }
+        for name, q in QUANTILES:
+            row[name] = self.quantile(q)
+        return row
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': float(self.min), 'max': float(self.max),
+                'sketch': self.sketch.to_dict(), 'hist': self.hist.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = d['count'], d['mean'], d['m2']
+        stats.min, stats.max = d['min'], d['max']
+        stats.sketch = QuantileSketch.from_dict(d['sketch'])
+        stats.hist = LogHistogram.from_dict(d['hist'])
+        return stats
+
+
+def merge_stats(items):
+    """Combina vários RunningStats num novo (ex: todas as runs de um grupo)."""
+    out = RunningStats()
+    for stats in items:
+        out.merge(stats)
+    return out
+
+
+# Colunas de RunningStats.as_row (e de summary_table)
+SUMMARY_COLUMNS = ['count', 'mean', 'median', 'std', 'max', 'min', 'cv', 'p90', 'p95', 'p99']
+
+
+def summary_table(stats):
+    """
+    DataFrame indexado por (run/grupo, métrica), com count, mean, median,
+    std, max, min, cv e p90/p95/p99, a partir de {(chave, métrica): RunningStats}.
+    """
+    import pandas as pd
+
+    index = pd.MultiIndex.from_tuples(list(stats), names=['key', 'metric'])
+    return pd.DataFrame([s.as_row() for s in stats.values()], index=index, columns=SUMMARY_COLUMNS)
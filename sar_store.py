@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+sar_store.py
+Armazenamento colunar das métricas parseadas.
+
+Em vez de um DataFrame "largo" por chave (VM1_CPU, ...) com colunas object/float64,
+cada (run, seção) guarda um vetor float64 de epoch e um vetor float32 por métrica,
+indexados num dict por (run, seção, métrica): buscar uma coluna é um acesso
+direto ao dict, e cada amostra ocupa 4 bytes por métrica + 8 de horário.
+O epoch é em segundos com fração: o sar grava segundos inteiros, mas o
+sar_sampler coleta abaixo de 1 s e todas as linhas são guardadas.
+
+Seções por entidade (núcleo do -P ALL, disco do -d, interface do -n DEV) têm
+uma linha por (horário, entidade): além do epoch, guardam um vetor int32 com o
+código da entidade e a lista de nomes. matrix() monta a matriz
+horário x entidade de uma métrica de uma vez, para os heatmaps.
+
+Gravar e ler vetores só usa NumPy: o pandas é importado apenas para montar
+os DataFrames largos de parser.data[...] e converter horários em texto.
+"""
+
+import datetime
+import time
+from collections.abc import MutableMapping
+
+import numpy as np
+
+# Seções com uma linha por entidade -> coluna do sar que identifica a entidade
+ENTITY_SECTIONS = {'PERCPU': 'CPU', 'DISK': 'DEV', 'NET': 'IFACE'}
+
+
+def numeric_values(values):
+    """Valores como float64; textos que não são número (e None) viram NaN."""
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        out = np.full(len(values), np.nan)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+
+def factorize(names):
+    """(códigos int32, nomes) com os nomes na ordem em que aparecem (0, 1, ..., 10)."""
+    names = np.asarray(names, dtype=object).astype(str)
+    unique, first, codes = np.unique(names, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return rank[codes.ravel()], unique[order].tolist()
+
+
+# Trocas de fuso (horário de verão) caem em múltiplos de 15 min em UTC
+TZ_STEP = 900
+
+
+def epoch_to_clock(epoch):
+    """
+    Converte epoch (s, UTC) para 'HH:MM:SS' no fuso local, como o sar imprime
+    (a fração de segundo é descartada). O deslocamento do fuso é o de cada
+    registro (muda no horário de verão): time.localtime roda uma vez por
+    bloco de TZ_STEP segundos distinto.
+    """
+    epoch = np.floor(np.asarray(epoch, dtype=np.float64)).astype(np.int64)
+    if len(epoch) == 0:
+        return []
+    steps, step_of = np.unique(epoch // TZ_STEP, return_inverse=True)
+    offsets = np.array([time.localtime(int(b) * TZ_STEP).tm_gmtoff for b in steps], dtype=np.int64)
+    sod, sod_of = np.unique((epoch + offsets[step_of.ravel()]) % 86400, return_inverse=True)
+    text = np.array([f'{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}' for s in sod.tolist()], dtype=object)
+    return text[sod_of.ravel()]
+
+
+def clock_to_epoch(clock, ampm=None, date=None):
+    """
+    Converte os horários 'HH:MM:SS' do sar (com coluna 'AM'/'PM' opcional) para
+    epoch int64, de forma vetorizada. Um horário menor que o anterior é a virada
+    da meia-noite e soma um dia. `date` (datetime.date) é o dia da primeira
+    amostra; sem ele usa 1970-01-02, e só o tempo relativo é significativo.
+    Retorna None se algum horário não puder ser lido.
+    """
+    import pandas as pd
+
+    parts = pd.Series(clock, dtype=object).astype(str).str.extract(r'^(\d{1,2}):(\d{2}):(\d{2})')
+    if parts.isna().any().any():
+        return None
+    h, m, s = (parts[i].astype(np.int64).to_numpy() for i in range(3))
+    if ampm is not None:
+        pm = pd.Series(ampm, dtype=object).astype(str).str.upper().to_numpy() == 'PM'
+        h = h % 12 + np.where(pm, 12, 0)
+    sod = h * 3600 + m * 60 + s
+    days = np.concatenate([[0], np.cumsum(np.diff(sod) < 0)]) if len(sod) else sod
+    base = int(time.mktime((date or datetime.date(1970, 1, 2)).timetuple()))
+    return base + sod + days * 86400
+
+
+class MetricStore:
+    def __init__(self):
+        self._epoch = {}     # (run, seção) -> float64[n] (s, com fração abaixo de 1 s)
+        self._clock = {}     # (run, seção) -> True se epoch é horário real (não só posição)
+        self._metrics = {}   # (run, seção) -> [métrica, ...] na ordem do sar
+        self._values = {}    # (run, seção, métrica) -> float32[n]
+        self._lower = {}     # (run, seção) -> {métrica.lower(): métrica}
+        self._entity = {}    # (run, seção) -> (int32[n] códigos, [nomes]) nas seções por entidade
+        self._backing = {}   # (run, seção) -> {'epoch'|'codes'|métrica: buffer com folga} após append
+
+    # -----------------------
+    # Escrita
+    # -----------------------
+    def put_columns(self, run, section, columns, epoch=None, entity=None):
+        """
+        Grava uma seção. `columns` é {métrica: valores}; colunas não numéricas
+        são ignoradas. Sem `epoch`, usa a posição da amostra (0..n-1).
+        `entity` (nome da entidade de cada linha) marca uma seção por entidade.
+        """
+        key = (run, section)
+        self.drop(run, section)
+        n = None
+        metrics = []
+        for name, values in columns.items():
+            arr = np.asarray(values)
+            if arr.dtype.kind not in 'fiub':
+                arr = numeric_values(arr)
+                if np.isnan(arr).all():
+                    continue
+            n = len(arr) if n is None else n
+            self._values[(run, section, name)] = arr.astype(np.float32, copy=False)
+            metrics.append(name)
+        if n is None:
+            n = len(epoch) if epoch is not None else 0
+        self._clock[key] = epoch is not None
+        self._epoch[key] = (np.asarray(epoch, dtype=np.float64) if epoch is not None
+                            else np.arange(n, dtype=np.float64))
+        self._metrics[key] = metrics
+        self._lower[key] = {m.lower(): m for m in metrics}
+        if entity is not None:
+            self._entity[key] = factorize(entity)
+
+    def append_columns(self, run, section, columns, epoch, entity=None):
+        """
+        Acrescenta linhas a uma seção já gravada (modo contínuo). Os vetores
+        crescem com folga (capacidade dobrada), então cada append custa o
+        tamanho do trecho novo e não o da seção inteira. Métricas ausentes no
+        trecho ficam NaN; métricas novas são ignoradas.
+        """
+        key = (run, section)
+        if key not in self._metrics:
+            self.put_columns(run, section, columns, epoch, entity)
+            return
+        epoch = np.asarray(epoch, dtype=np.float64)
+        n, k = len(self._epoch[key]), len(epoch)
+        if k == 0:
+            return
+        backing = self._backing.get(key)
+        if backing is None or len(backing['epoch']) < n + k:
+            capacity = max(n + k, 2 * n, 64)
+            current = {'epoch': self._epoch[key]}
+            if key in self._entity:
+                current['codes'] = self._entity[key][0]
+            for m in self._metrics[key]:
+                current[m] = self._values[(run, section, m)]
+            backing = {}
+            for name, arr in current.items():
+                buf = np.empty(capacity, dtype=arr.dtype)
+                buf[:n] = arr
+                backing[name] = buf
+            self._backing[key] = backing
+
+        backing['epoch'][n:n + k] = epoch
+        self._epoch[key] = backing['epoch'][:n + k]
+        for m in self._metrics[key]:
+            values = columns.get(m)
+            backing[m][n:n + k] = np.nan if values is None else np.asarray(values, dtype=np.float32)
+            self._values[(run, section, m)] = backing[m][:n + k]
+        if key in self._entity:
+            _, names = self._entity[key]
+            code_of = {name: i for i, name in enumerate(names)}
+            codes, chunk_names = factorize(entity)
+            for name in chunk_names:
+                if name not in code_of:
+                    code_of[name] = len(names)
+                    names.append(name)
+            backing['codes'][n:n + k] = np.array([code_of[name] for name in chunk_names], dtype=np.int32)[codes]
+            self._entity[key] = (backing['codes'][:n + k], names)
+
+    def put_frame(self, run, section, df):
+        """
+        Grava uma seção: DataFrame (parser de texto, cache) ou {coluna: array}
+        (sar_binary, sar_sampler, cache sem pandas).
+        """
+        epoch = np.asarray(df['epoch']) if 'epoch' in df else None
+        entity_col = ENTITY_SECTIONS.get(section)
+        entity = np.asarray(df[entity_col]) if entity_col in df else None
+        columns = {c: np.asarray(df[c]) for c in df
+                   if c not in ('epoch', 'timestamp', entity_col) and c is not None}
+        self.put_columns(run, section, columns, epoch, entity)
+
+    def drop(self, run, section):
+        key = (run, section)
+        for m in self._metrics.pop(key, []):
+            self._values.pop((run, section, m), None)
+        self._epoch.pop(key, None)
+        self._clock.pop(key, None)
+        self._lower.pop(key, None)
+        self._entity.pop(key, None)
+        self._backing.pop(key, None)
+
+    def update(self, other):
+        """Mescla outro MetricStore (ex: vindo de um worker), na ordem dele."""
+        for run, section in other.keys():
+            self.drop(run, section)
+            self._epoch[(run, section)] = other._epoch[(run, section)]
+            self._clock[(run, section)] = other._clock[(run, section)]
+            self._metrics[(run, section)] = list(other._metrics[(run, section)])
+            self._lower[(run, section)] = dict(other._lower[(run, section)])
+            if (run, section) in other._entity:
+                codes, names = other._entity[(run, section)]
+                self._entity[(run, section)] = (codes, list(names))
+            for m in other._metrics[(run, section)]:
+                self._values[(run, section, m)] = other._values[(run, section, m)]
+
+    # -----------------------
+    # Leitura
+    # -----------------------
+    def keys(self):
+        return list(self._metrics.keys())
+
+    def runs(self):
+        return list(dict.fromkeys(run for run, _ in self._metrics))
+
+    def has(self, run, section):
+        return (run, section) in self._metrics
+
+    def metrics(self, run, section):
+        return self._metrics.get((run, section), [])
+
+    def find_metric(self, run, section, name):
+        """Nome exato da métrica, sem diferenciar maiúsculas (O(1)); None se não existir."""
+        return self._lower.get((run, section), {}).get(name.lower())
+
+    def values(self, run, section, metric):
+        return self._values.get((run, section, metric))
+
+    def epoch(self, run, section):
+        return self._epoch.get((run, section))
+
+    def entities(self, run, section):
+        """Nomes das entidades de uma seção por entidade ([] nas demais)."""
+        return self._entity.get((run, section), (None, []))[1]
+
+    def matrix(self, run, section, metric):
+        """
+        Métrica de uma seção por entidade como matriz float32 (horário x entidade),
+        montada de uma vez por indexação; NaN onde a entidade não tem amostra.
+        Retorna (epoch dos horários, nomes das entidades, matriz).
+        """
+        codes, names = self._entity[(run, section)]
+        times, row = np.unique(self._epoch[(run, section)], return_inverse=True)
+        out = np.full((len(times), len(names)), np.nan, dtype=np.float32)
+        out[row, codes] = self._values[(run, section, metric)]
+        return times, names, out
+
+    def frame(self, run, section):
+        """
+        DataFrame largo (timestamp + métricas) de uma seção, como o parser produzia.
+        Seções por entidade são indexadas por (timestamp, entidade).
+        """
+        import pandas as pd
+
+        key = (run, section)
+        data = {}
+        if self._clock[key]:
+            data['timestamp'] = epoch_to_clock(self._epoch[key])
+        for m in self._metrics[key]:
+            data[m] = self._values[(run, section, m)]
+        df = pd.DataFrame(data)
+        if key in self._entity:
+            codes, names = self._entity[key]
+            time_level = df.pop('timestamp') if 'timestamp' in df else pd.RangeIndex(len(df))
+            df.index = pd.MultiIndex.from_arrays(
+                [time_level, pd.Categorical.from_codes(codes, names)],
+                names=['timestamp', ENTITY_SECTIONS.get(section, 'entity')])
+        return df
+
+
+class StoreView(MutableMapping):
+    """
+    Mapeamento 'RUN_SEÇÃO' -> DataFrame largo sobre um MetricStore, para o
+    código que usa parser.data[...] continuar funcionando. Os DataFrames são
+    montados sob demanda e reaproveitados até a seção ser regravada.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._frames = {}
+
+    @staticmethod
+    def split_key(key):
+        run, _, section = key.rpartition('_')
+        return run, section
+
+    def __getitem__(self, key):
+        run, section = self.split_key(key)
+        if not self.store.has(run, section):
+            raise KeyError(key)
+        if key not in self._frames:
+            self._frames[key] = self.store.frame(run, section)
+        return self._frames[key]
+
+    def __setitem__(self, key, df):
+        run, section = self.split_key(key)
+        self.store.put_frame(run, section, df)
+        self._frames.pop(key, None)
+
+    def __delitem__(self, key):
+        run, section = self.split_key(key)
+        if not self.store.has(run, section):
+            raise KeyError(key)
+        self.store.drop(run, section)
+        self._frames.pop(key, None)
+
+    def invalidate(self, key=None):
+        """Descarta os DataFrames montados (todos ou o de `key`) após gravar direto no store."""
+        if key is None:
+            self._frames.clear()
+        else:
+            self._frames.pop(key, None)
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self.store.has(*self.split_key(key))
+
+    def __iter__(self):
+        return (f'{run}_{section}' for run, section in self.store.keys())
+
+    def __len__(self):
+        return len(self.store.keys())
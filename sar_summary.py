@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+sar_summary.py
+Resumos compactos por nó, combináveis para a frota inteira.
+
+Em vez de copiar todos os report.sar para uma máquina, cada nó gera um
+arquivo pequeno (alguns KB) com, por métrica: contagem, média/M2 (desvio),
+mínimo/máximo, t-digest (percentis) e histograma logarítmico (sar_stats).
+A combinação é associativa, então milhares de resumos viram tabelas por
+grupo (ex: tuned x baseline) em segundos, lidos em paralelo.
+
+  # em cada nó, depois do stress_test.sh
+  python sar_summary.py build report.sar --group tuned -o $(hostname)-tuned.json.gz
+
+  # na máquina de análise
+  python sar_summary.py merge resumos/*.json.gz
+  python sar_summary.py merge --group tuned t/*.json.gz --group base b/*.json.gz --csv frota.csv
+"""
+
+import argparse
+import gzip
+import json
+import os
+import socket
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from CV_metric_final import CV_METRICS, file_stats
+from sar_cache import SectionCache, DEFAULT_CACHE_DIR
+from sar_runs import add_run_arguments, resolve_runs
+from sar_modes import modes_of_stats
+from sar_stats import RunningStats, summary_table
+
+# Incrementar quando o formato do arquivo de resumo mudar
+SUMMARY_VERSION = 1
+
+# Resumos lidos por tarefa do pool no merge (cada tarefa devolve um parcial já combinado)
+MERGE_BATCH = 64
+
+
+# -----------------------
+# Arquivo de resumo
+# -----------------------
+def _open(path, mode, compressed=None):
+    # .gz comprimido, qualquer outro nome em texto puro
+    if compressed is None:
+        compressed = str(path).endswith('.gz')
+    return gzip.open(path, mode + 't', encoding='utf-8') if compressed else open(path, mode, encoding='utf-8')
+
+
+def build_summary(path, run=None, group=None, cache=None, trim=True):
+    """
+    Resumo (dict serializável) de um report.sar; com `trim`, só do patamar
+    estável, e 'regimes' guarda (regimes, início, fim, n) de cada métrica.
+    """
+    stats, regimes, _ = file_stats(str(path), cache, trim)
+    return {
+        'version': SUMMARY_VERSION,
+        'run': run or socket.gethostname(),
+        'group': group,
+        'source': str(path),
+        'metrics': {name: acc.to_dict() for name, acc in stats.items() if acc is not None and acc.count},
+        'regimes': {name: list(r) for name, r in regimes.items()},
+    }
+
+
+def write_summary(summary, out_path):
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    with _open(tmp, 'w', compressed=str(out_path).endswith('.gz')) as f:
+        json.dump(summary, f, separators=(',', ':'))
+    os.replace(tmp, out_path)
+
+
+def read_summary(path):
+    with _open(path, 'r') as f:
+        summary = json.load(f)
+    if summary.get('version') != SUMMARY_VERSION:
+        raise ValueError(f"{path}: versão de resumo {summary.get('version')} (esperada {SUMMARY_VERSION})")
+    return summary
+
+
+# -----------------------
+# Combinação
+# -----------------------
+def merge_into(acc, key, metrics):
+    """Combina {métrica: dict de RunningStats} em acc[(key, métrica)]."""
+    for name, d in metrics.items():
+        stats = RunningStats.from_dict(d)
+        if (key, name) in acc:
+            acc[(key, name)].merge(stats)
+        else:
+            acc[(key, name)] = stats
+    return acc
+
+
+def _merge_batch(items, by):
+    # Worker: lê e combina um lote de (rótulo, grupo da linha de comando, caminho)
+    acc = {}
+    for label, group, path in items:
+        summary = read_summary(path)
+        if by == 'run':
+            # Rótulo gravado no nó (hostname), que identifica a máquina melhor que VM1, VM2...
+            key = summary.get('run') or label
+        else:
+            key = group or summary.get('group') or summary.get('run') or label
+        merge_into(acc, key, summary['metrics'])
+    return acc
+
+
+def merge_summaries(runs, by='group', jobs=None):
+    """
+    {(grupo ou run, métrica): RunningStats} de vários arquivos de resumo.
+    runs: lista de (rótulo, grupo, caminho) como em sar_runs.resolve_runs; sem
+    grupo na linha de comando vale o grupo gravado no resumo.
+    """
+    batches = [runs[i:i + MERGE_BATCH] for i in range(0, len(runs), MERGE_BATCH)]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(batches)))
+    if jobs == 1:
+        partials = [_merge_batch(b, by) for b in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            partials = list(executor.map(_merge_batch, batches, [by] * len(batches)))
+    out = {}
+    for partial in partials:
+        for key, stats in partial.items():
+            if key in out:
+                out[key].merge(stats)
+            else:
+                out[key] = stats
+    # Ordem: chaves na ordem em que aparecem, métricas na ordem de CV_METRICS
+    order = {name: i for i, (name, _, _) in enumerate(CV_METRICS)}
+    keys = list(dict.fromkeys(k for k, _ in out))
+    return dict(sorted(out.items(), key=lambda kv: (keys.index(kv[0][0]), order.get(kv[0][1], len(order)))))
+
+
+# -----------------------
+# Main
+# -----------------------
+def cmd_build(args):
+    cache = None if args.no_cache else SectionCache(args.cache_dir)
+    out = args.output or f"{Path(args.file).stem}.summary.json.gz"
+    summary = build_summary(args.file, run=args.run, group=args.group, cache=cache,
+                            trim=not args.no_trim)
+    write_summary(summary, out)
+    print(f"Resumo salvo em '{out}' ({os.path.getsize(out)} bytes, {len(summary['metrics'])} métricas)")
+
+
+def cmd_merge(args):
+    try:
+        runs = resolve_runs(args.files, args.group)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    if not runs:
+        print("Uso: python3 sar_summary.py merge resumo1.json.gz resumo2.json.gz [...] [--group NOME arq ...]")
+        sys.exit(1)
+    try:
+        stats = merge_summaries(runs, by=args.by, jobs=args.jobs)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Erro ao ler resumo: {e}")
+        sys.exit(1)
+
+    table = summary_table(stats)
+    table['modes'] = modes_of_stats(list(stats.values()))
+    print(f"\n=== RESUMO POR {args.by.upper()} ({len(runs)} arquivos) ===")
+    for (key, metric_name), r in table.iterrows():
+        print(f"{key:<12} {metric_name:<12}: n={int(r['count'])} | Média={r['mean']:.2f} | "
+              f"Mediana={r['median']:.2f} | P95={r['p95']:.2f} | P99={r['p99']:.2f} | "
+              f"Desvio={r['std']:.2f} | CV={r['cv']:.3f} | Modos={int(r['modes'])}")
+    if args.csv:
+        table.to_csv(args.csv)
+        print(f"\nTabela salva em '{args.csv}'")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Resumos compactos por nó e combinação para a frota")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    b = sub.add_parser("build", help="gera o resumo de um report.sar")
+    b.add_argument("file", help="arquivo report.sar")
+    b.add_argument("-o", "--output", help="arquivo de saída (.json ou .json.gz)")
+    b.add_argument("--run", help="rótulo da run (padrão: hostname)")
+    b.add_argument("--group", help="grupo gravado no resumo (ex: tuned, baseline)")
+    b.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                   help="diretório do cache de dados já parseados")
+    b.add_argument("--no-cache", action="store_true", help="não usa o cache em disco")
+    b.add_argument("--no-trim", action="store_true",
+                   help="resume a captura inteira (sem descartar aquecimento/desaceleração)")
+    b.set_defaults(func=cmd_build)
+
+    m = sub.add_parser("merge", help="combina resumos em tabelas por grupo ou run")
+    add_run_arguments(m)
+    m.add_argument("--by", choices=("group", "run"), default="group",
+                   help="agrupar por grupo (padrão) ou manter uma linha por run")
+    m.add_argument("-j", "--jobs", type=int, default=None,
+                   help="processos para ler os resumos em paralelo (padrão: nº de CPUs)")
+    m.add_argument("--csv", help="salva a tabela também em CSV")
+    m.set_defaults(func=cmd_merge)
+
+    args = ap.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+sar_synth.py
+Gerador de saídas sintéticas do sar (texto do `sar -u -r -S -b`) e do
+`sadf -d` (CSV com ';'), para medir o parser e as estatísticas em escala sem
+capturas reais (ver sar_bench.py).
+
+  python3 sar_synth.py sar  -n 100000 -o vm1.txt [--cpus 4] [--disks 2] [--locale pt] [--clock 12h]
+  python3 sar_synth.py sadf -n 100000 -o vm1.csv
+
+Cada métrica segue o formato de um teste de stress: subida (aquecimento),
+patamar com ruído autocorrelacionado e picos esporádicos, e descida no fim.
+As linhas são geradas em blocos de CHUNK intervalos (NumPy + formatação %) e
+escritas à medida que saem: 10M de intervalos não ficam em memória.
+Seções com uma linha por entidade (-P ALL, -d) repetem o header a cada
+intervalo e fecham com um header 'Average:', como o sysstat faz.
+
+Locales:
+  en  ponto decimal e 'Average:'
+  pt  vírgula decimal e 'Média:'
+Relógio: 24h ('13:00:01') ou 12h ('01:00:01 PM'). A ordem da data no header
+segue o relógio, como o parser assume: mês/dia com 12h (en_US), dia/mês com 24h.
+"""
+
+import argparse
+import datetime
+import functools
+import os
+import sys
+
+import numpy as np
+
+CHUNK = 1 << 16
+# Incrementar quando a saída gerada mudar (sar_bench regera os arquivos)
+SYNTH_VERSION = 2
+DEFAULT_START = datetime.datetime(2025, 11, 7, 0, 0, 1)
+HOSTNAME = 'node1'
+KERNEL = '6.1.0-13-amd64'
+MEM_TOTAL_KB = 16 * 1024 * 1024
+SWAP_TOTAL_KB = 4 * 1024 * 1024
+
+# Colunas de cada seção (sysstat 12)
+CPU_COLUMNS = ['%user', '%nice', '%system', '%iowait', '%steal', '%idle']
+MEMORY_COLUMNS = ['kbmemfree', 'kbavail', 'kbmemused', '%memused', 'kbbuffers', 'kbcached',
+                  'kbcommit', '%commit', 'kbactive', 'kbinact', 'kbdirty']
+SWAP_COLUMNS = ['kbswpfree', 'kbswpused', '%swpused', 'kbswpcad', '%swpcad']
+IO_COLUMNS = ['tps', 'rtps', 'wtps', 'dtps', 'bread/s', 'bwrtn/s', 'bdscd/s']
+DISK_COLUMNS = ['tps', 'rkB/s', 'wkB/s', 'dkB/s', 'areq-sz', 'aqu-sz', 'await', '%util']
+
+LOCALES = {
+    'en': {'average': 'Average:', 'decimal': '.'},
+    'pt': {'average': 'Média:', 'decimal': ','},
+}
+CLOCKS = ('24h', '12h')
+
+
+# -----------------------
+# Sinais
+# -----------------------
+class Signal:
+    """
+    Série de uma métrica gerada em blocos: patamar `level` alcançado depois
+    da subida (RAMP das amostras), ruído suavizado por média móvel (o estado
+    passa de um bloco para o outro) e picos com probabilidade `spike_rate`.
+    """
+
+    RAMP = 0.05
+    SMOOTH = 16
+
+    def __init__(self, rng, n, idle, level, noise, spike=0.0, spike_rate=0.0, lo=0.0, hi=None):
+        self.rng, self.n = rng, n
+        self.idle, self.level, self.noise = idle, level, noise
+        self.spike, self.spike_rate = spike, spike_rate
+        self.lo, self.hi = lo, hi
+        self._carry = rng.standard_normal(self.SMOOTH - 1)
+
+    def take(self, start, count):
+        pos = (start + np.arange(count)) / max(self.n - 1, 1)
+        ramp = int(self.n * self.RAMP) / max(self.n, 1)
+        # 0 -> 1 na subida, 1 no patamar, 1 -> 0 na descida
+        phase = np.clip(np.minimum(pos, 1 - pos) / ramp, 0, 1) if ramp > 0 else np.ones(count)
+        white = np.concatenate([self._carry, self.rng.standard_normal(count)])
+        self._carry = white[-(self.SMOOTH - 1):]
+        smooth = np.convolve(white, np.ones(self.SMOOTH) / np.sqrt(self.SMOOTH), 'valid')
+        values = self.idle + (self.level - self.idle) * phase + self.noise * smooth * phase
+        if self.spike_rate:
+            hits = self.rng.random(count) < self.spike_rate
+            values[hits] += self.spike * self.rng.uniform(0.5, 1.0, hits.sum())
+        return np.clip(values, self.lo, self.hi)
+
+
+# -----------------------
+# Valores por seção (arrays de um bloco)
+# -----------------------
+def cpu_block(signals, start, count):
+    user = signals['user'].take(start, count)
+    system = np.minimum(signals['system'].take(start, count), 100 - user)
+    iowait = np.minimum(signals['iowait'].take(start, count), 100 - user - system)
+    nice = np.zeros(count)
+    steal = np.zeros(count)
+    idle = np.maximum(100 - user - system - iowait, 0)
+    return [user, nice, system, iowait, steal, idle]
+
+
+def memory_block(signals, start, count):
+    pct = signals['memused'].take(start, count)
+    used = pct / 100 * MEM_TOTAL_KB
+    free = MEM_TOTAL_KB - used
+    cached = 0.3 * free
+    buffers = np.full(count, 0.01 * MEM_TOTAL_KB)
+    commit = used * 1.4
+    active = used * 0.7
+    inact = used * 0.2
+    dirty = signals['dirty'].take(start, count)
+    return [free, free + cached, used, pct, buffers, cached, commit, commit / MEM_TOTAL_KB * 100,
+            active, inact, dirty]
+
+
+def swap_block(signals, start, count):
+    pct = signals['swpused'].take(start, count)
+    used = pct / 100 * SWAP_TOTAL_KB
+    cad = used * 0.1
+    return [SWAP_TOTAL_KB - used, used, pct, cad, np.where(used > 0, cad / np.maximum(used, 1) * 100, 0)]
+
+
+def io_block(signals, start, count):
+    rtps = signals['rtps'].take(start, count)
+    wtps = signals['wtps'].take(start, count)
+    return [rtps + wtps, rtps, wtps, np.zeros(count), rtps * 64, wtps * 128, np.zeros(count)]
+
+
+def disk_block(signals, start, count):
+    tps = signals['tps'].take(start, count)
+    util = signals['util'].take(start, count)
+    rkb = tps * 0.2 * 32
+    wkb = tps * 0.8 * 256
+    aqu = util / 100 * 2
+    busy = np.maximum(tps, 1e-3)
+    return [tps, rkb, wkb, np.zeros(count), (rkb + wkb) / busy, aqu, aqu / busy * 1000, util]
+
+
+def make_signals(n, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        'CPU': ({'user': Signal(rng, n, 2, 70, 3, spike=25, spike_rate=1e-3, hi=100),
+                 'system': Signal(rng, n, 1, 20, 1.5, spike=15, spike_rate=5e-4, hi=100),
+                 'iowait': Signal(rng, n, 0.1, 2, 0.5, hi=100)}, cpu_block),
+        'MEMORY': ({'memused': Signal(rng, n, 20, 80, 1, lo=1, hi=99),
+                    'dirty': Signal(rng, n, 100, 5000, 800, spike=20000, spike_rate=2e-3)}, memory_block),
+        'SWAP': ({'swpused': Signal(rng, n, 0, 5, 0.3, spike=10, spike_rate=5e-4, hi=100)}, swap_block),
+        'IO': ({'rtps': Signal(rng, n, 1, 150, 20, spike=800, spike_rate=2e-3),
+                'wtps': Signal(rng, n, 2, 400, 50, spike=2000, spike_rate=2e-3)}, io_block),
+        'DISK': ({'tps': Signal(rng, n, 1, 300, 40, spike=1500, spike_rate=2e-3),
+                  'util': Signal(rng, n, 1, 85, 5, spike=15, spike_rate=1e-3, hi=100)}, disk_block),
+    }
+
+
+# -----------------------
+# Formatação
+# -----------------------
+@functools.lru_cache(maxsize=None)
+def _clock_table(clock):
+    """Os 86400 horários do dia já formatados (índice = segundos desde 00:00:00)."""
+    secs = range(86400)
+    if clock == '12h':
+        table = [f'{(s // 3600 % 12) or 12:02d}:{s // 60 % 60:02d}:{s % 60:02d} {"AM" if s < 43200 else "PM"}'
+                 for s in secs]
+    else:
+        table = [f'{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}' for s in secs]
+    return np.array(table, dtype=object)
+
+
+def clock_strings(start, interval, first, count, clock='24h'):
+    """Horários 'HH:MM:SS' (ou 'hh:MM:SS AM/PM') dos intervalos first..first+count-1."""
+    secs = (start.hour * 3600 + start.minute * 60 + start.second
+            + interval * np.arange(first, first + count)) % 86400
+    return _clock_table(clock)[secs].tolist()
+
+
+def stamp_strings(start, interval, first, count):
+    """Data e hora 'AAAA-MM-DD HH:MM:SS' (formato do sadf -d) dos intervalos."""
+    clock = clock_strings(start, interval, first, count)
+    base = start.hour * 3600 + start.minute * 60 + start.second
+    days = ((base + interval * np.arange(first, first + count)) // 86400).tolist()
+    dates = {d: (start.date() + datetime.timedelta(days=d)).isoformat() for d in set(days)}
+    return [f'{dates[d]} {c}' for d, c in zip(days, clock)]
+
+
+def value_format(column, sep=' '):
+    """Formato de uma coluna: contadores em kB saem inteiros (como no sar), o resto com 2 casas."""
+    spec = '.0f' if column.startswith('kb') else '.2f'
+    return f' %9{spec}' if sep == ' ' else f'{sep}%{spec}'
+
+
+def header_line(start, clock, cpus):
+    date = start.strftime('%m/%d/%Y' if clock == '12h' else '%d/%m/%Y')
+    return f'Linux {KERNEL} ({HOSTNAME}) \t{date} \t_x86_64_\t({max(cpus, 1)} CPU)\n'
+
+
+def _decimal(text, locale):
+    return text.replace('.', ',') if LOCALES[locale]['decimal'] == ',' else text
+
+
+def _rows(fmt, *columns):
+    # %-format sobre tuplas: ~2x mais rápido que str.format por linha
+    return ''.join([fmt % r for r in zip(*columns)])
+
+
+def _spread(rng, v, k, column):
+    """`k` variações de uma coluna (núcleos, dispositivos) em torno da série `v`."""
+    if column.startswith('%'):
+        return np.clip(v[:, None] + rng.normal(0, 2, (len(v), k)), 0, 100)
+    return np.maximum(v[:, None] * rng.normal(1, 0.1, (len(v), k)), 0)
+
+
+def sar_section(name, n, signals, block, columns, start, interval, locale, clock, label=None, entities=()):
+    """
+    Linhas de uma seção do `sar` (header, dados em blocos e a média).
+
+    Com `entities` (-P ALL, -d) cada intervalo sai com o próprio header e uma
+    linha por entidade na coluna `label` (a primeira é a série do sinal, as
+    outras variações dela), e a média ganha um header 'Average:', como no
+    sysstat. Sem elas, um header só e a linha 'all' na coluna `label`, se houver.
+    """
+    time_width = 11 if clock == '12h' else 8
+    avg = LOCALES[locale]['average']
+    head = ''.join(f' {c:>9}' for c in ([label] if label else []) + columns) + '\n'
+    fields = (' %9s' if label else '') + ''.join(map(value_format, columns)) + '\n'
+    row = f'%-{time_width}s' + fields
+    per_row = max(len(entities), 1)
+    totals = np.zeros((per_row, len(columns)))
+    if not entities:
+        # O horário do header é o da amostra anterior (o início do intervalo)
+        yield '\n' + f'{clock_strings(start, interval, -1, 1, clock)[0]:<{time_width}}' + head
+    for begin in range(0, n, CHUNK):
+        count = min(CHUNK, n - begin)
+        times = clock_strings(start, interval, begin, count, clock)
+        values = block(signals, begin, count)
+        if entities:
+            rng = np.random.default_rng(begin)
+            stacked = [np.column_stack([v, _spread(rng, v, per_row - 1, c)]) for v, c in zip(values, columns)]
+            totals += np.array([s.sum(axis=0) for s in stacked]).T
+            # Um intervalo por registro: linha em branco, header e uma linha por entidade
+            fmt = f'\n%-{time_width}s' + head.replace('%', '%%') + row * per_row
+            args = [clock_strings(start, interval, begin - 1, count, clock)]
+            for j, entity in enumerate(entities):
+                args += [times, [entity] * count, *(s[:, j].tolist() for s in stacked)]
+            text = _rows(fmt, *args)
+        else:
+            totals[0] += [v.sum() for v in values]
+            text = _rows(row, times, *([['all'] * count] if label else []), *(v.tolist() for v in values))
+        yield _decimal(text, locale)
+    average = totals / max(n, 1)
+    if entities:
+        yield _decimal('\n' + f'{avg:<{time_width}}' + head
+                       + ''.join(f'{avg:<{time_width}}' + fields % (e, *a) for e, a in zip(entities, average)),
+                       locale)
+    else:
+        yield _decimal(f'{avg:<{time_width}}' + fields % ((('all',) if label else ()) + tuple(average[0])),
+                       locale)
+
+
+def sadf_section(name, n, signals, block, columns, start, interval, locale):
+    """Linhas de uma seção do `sadf -d` (header '# ...' e dados)."""
+    label = name == 'CPU'
+    yield '# hostname;interval;timestamp;' + ('CPU;' if label else '') + ';'.join(columns) + '\n'
+    row = (f'{HOSTNAME};{interval};%s UTC' + (';-1' if label else '')
+           + ''.join(value_format(c, ';') for c in columns) + '\n')
+    for begin in range(0, n, CHUNK):
+        count = min(CHUNK, n - begin)
+        stamps = stamp_strings(start, interval, begin, count)
+        yield _decimal(_rows(row, stamps, *(v.tolist() for v in block(signals, begin, count))), locale)
+
+
+SECTIONS = [('CPU', CPU_COLUMNS), ('MEMORY', MEMORY_COLUMNS), ('SWAP', SWAP_COLUMNS), ('IO', IO_COLUMNS)]
+
+
+def generate_sar(n, cpus=0, locale='en', clock='24h', start=DEFAULT_START, interval=1, seed=0, disks=0):
+    """
+    Texto do `sar -u [-P ALL] -r -S -b [-d]` com `n` intervalos, em pedaços (str).
+    `cpus` > 0 acrescenta as linhas por núcleo (-P ALL) na seção de CPU e
+    `disks` > 0 a seção por dispositivo (-d), ambas com um header por intervalo.
+    """
+    signals = make_signals(n, seed)
+    yield header_line(start, clock, cpus)
+    cpu_entities = ['all'] + [str(c) for c in range(cpus)] if cpus > 0 else ()
+    sections = [(name, columns, 'CPU' if name == 'CPU' else None, cpu_entities if name == 'CPU' else ())
+                for name, columns in SECTIONS]
+    if disks > 0:
+        sections.append(('DISK', DISK_COLUMNS, 'DEV', [f'vd{chr(ord("a") + d)}' for d in range(disks)]))
+    for name, columns, label, entities in sections:
+        sig, block = signals[name]
+        yield from sar_section(name, n, sig, block, columns, start, interval, locale, clock, label, entities)
+
+
+def generate_sadf(n, locale='en', start=DEFAULT_START, interval=1, seed=0):
+    """CSV do `sadf -d -- -u -r -S -b` com `n` intervalos, em pedaços (str)."""
+    signals = make_signals(n, seed)
+    for name, columns in SECTIONS:
+        sig, block = signals[name]
+        yield from sadf_section(name, n, sig, block, columns, start, interval, locale)
+
+
+def write(chunks, path):
+    """Grava os pedaços gerados em `path` ('-' = saída padrão); retorna o nº de bytes."""
+    out = sys.stdout if str(path) == '-' else open(path, 'w', encoding='utf-8')
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0 if out is sys.stdout else os.path.getsize(path)
+
+
+# -----------------------
+# Main
+# -----------------------
+def main():
+    ap = argparse.ArgumentParser(description="Gera saídas sintéticas do sar/sadf para benchmarks")
+    ap.add_argument("kind", choices=('sar', 'sadf'), help="texto do sar ou CSV do sadf -d")
+    ap.add_argument("-n", "--rows", type=int, default=3600, help="intervalos (amostras por métrica)")
+    ap.add_argument("-o", "--output", default='-', help="arquivo de saída (padrão: saída padrão)")
+    ap.add_argument("--cpus", type=int, default=0, help="linhas por núcleo (sar -P ALL); só no texto do sar")
+    ap.add_argument("--disks", type=int, default=0, help="dispositivos da seção DISK (sar -d); só no texto do sar")
+    ap.add_argument("--locale", choices=sorted(LOCALES), default='en')
+    ap.add_argument("--clock", choices=CLOCKS, default='24h', help="formato do horário no texto do sar")
+    ap.add_argument("--interval", type=int, default=1, help="segundos entre amostras")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    if args.kind == 'sar':
+        chunks = generate_sar(args.rows, args.cpus, args.locale, args.clock, interval=args.interval, seed=args.seed,
+                              disks=args.disks)
+    else:
+        chunks = generate_sadf(args.rows, args.locale, interval=args.interval, seed=args.seed)
+    size = write(chunks, args.output)
+    if args.output != '-':
+        print(f"{args.rows} intervalos gravados em '{args.output}' ({size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,16 @@ sar_visualize.py - v1
 Marllus Lustosa 07-11-25
 
 Lê arquivos report.sar gerados pelo comando:
-  sar -u -r -S -b -o report.sar 1 60
+  sar -u -P ALL -r -S -b -d -n DEV -o report.sar 1 60
 
-Executa automaticamente:
-  sar -u -r -S -b -f <report.sar>
+Lê o arquivo binário diretamente (sar_binary.py) e, se o formato
+não for suportado, executa automaticamente:
+  sar -u -P ALL -r -S -b -d -p -n DEV -f <report.sar>
+(discos e interfaces sempre vêm do sar, mesmo com o leitor nativo)
 
-Parseia as seções (CPU, MEMORY, SWAP, IO) de forma robusta,
-plota comparativo entre duas VMs e imprime estatísticas.
+Parseia as seções (CPU, MEMORY, SWAP, IO) de forma robusta, e as seções por
+entidade (PERCPU, DISK, NET) com uma linha por (horário, núcleo/disco/interface),
+plota comparativo entre duas ou mais VMs (ou grupos de VMs) e imprime estatísticas.
 
 Modificações:
  - Coloca a média de cada VM na legenda (ex: VM1 (Média=93.10))
@@ -19,27 +22,62 @@ Modificações:
  - Mantém o parser que você indicou como funcional
 """
 
+import argparse
+import csv
+import datetime
 import subprocess
 import sys
+import io
+import os
 import re
-import pandas as pd
-import matplotlib.pyplot as plt
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import numpy as np
 
+from sar_binary import SAFormatError, SATail
+from sar_sampler import read_metrics_file
+from sar_cache import SectionCache, DEFAULT_CACHE_DIR
+from sar_align import align_values, common_grid
+from sar_downsample import LOD_METHODS, axis_pixel_width, bucket_reduce, downsample
+from sar_store import ENTITY_SECTIONS, MetricStore, StoreView, clock_to_epoch
+from sar_runs import METRICS, add_run_arguments, resolve_runs
+from sar_stats import STATS_CHUNK, RunningStats, merge_stats
+from sar_compare import DEFAULT_ALPHA, DEFAULT_BOOT, compare_all
+from sar_spikes import SPIKE_COLUMNS, THRESHOLD as SPIKE_THRESHOLD, detect_spikes
+from sar_correlate import MAX_LAG, PAIR_COLUMNS, analyze_run, pair_table, plot_correlation
+from sar_render import DEFAULT_FORMAT, FORMATS, headless, is_batch, render_all, save_figure, use_batch_backend
+from sar_profile import add_profile_arguments, finish_profile, pool_map, stage, start_profile
+
 # -----------------------
 # Utilitários de parsing
 # -----------------------
-def run_sar_on_file(sarfile_path):
-    """Executa: sar -u -r -S -b -f <sarfile_path> e retorna saída (texto)."""
-    cmd = ["sar", "-u", "-r", "-S", "-b", "-f", str(sarfile_path)]
-    try:
-        out = subprocess.check_output(cmd, stderr=subprocess.STDOUT, encoding='utf-8', errors='ignore')
-        return out
-    except subprocess.CalledProcessError as e:
+# Atividades pedidas ao sar: as ausentes no arquivo são ignoradas por ele
+SAR_FLAGS = ["-u", "-P", "ALL", "-r", "-S", "-b", "-d", "-p", "-n", "DEV"]
+# Só discos e interfaces (o que o leitor nativo não decodifica)
+SAR_ENTITY_FLAGS = ["-d", "-p", "-n", "DEV"]
+
+def iter_sar_on_file(sarfile_path, flags=SAR_FLAGS):
+    """
+    Executa: sar <flags> -f <sarfile_path> e devolve as linhas da saída
+    à medida que o sar as produz (sem acumular o texto inteiro).
+    O stderr vai para um arquivo temporário, e não para um pipe: avisos em
+    excesso (ex: arquivo de outra versão do sysstat) não travam o sar
+    esperando alguém ler o stderr enquanto lemos o stdout.
+    """
+    cmd = ["sar", *flags, "-f", str(sarfile_path)]
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8', errors='ignore') as errfile:
+        with stage('subprocess', child=True, cmd=' '.join(cmd)), \
+                subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errfile,
+                                 encoding='utf-8', errors='ignore') as proc:
+            yield from proc.stdout
+        errfile.seek(0)
+        err = errfile.read()
+    if proc.returncode != 0:
         print(f"Erro ao executar sar para {sarfile_path}:")
-        print(e.output)
-        raise
+        print(err)
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=err)
 
 def normalize_num(s):
     """Converte string com vírgula para float; retorna None em falha."""
@@ -51,140 +89,455 @@ def normalize_num(s):
     except Exception:
         return None
 
+TIME_COLUMNS = ('timestamp', 'hr', 'time', 'hora', 'ampm')
+# Colunas com o nome da entidade (núcleo, disco, interface): ficam como texto
+ENTITY_COLUMNS = ('cpu', 'dev', 'iface')
+
+def split_header(line):
+    """
+    Colunas do header de uma seção. O primeiro campo do header do sar é um
+    horário (ex: '12:00:01' e, no formato 12h, 'AM'): ele vira 'timestamp'
+    (e 'ampm'), alinhado com o horário de cada linha de dados.
+    """
+    cols = re.split(r'\s+', line)
+    if re.match(r'^\d{1,2}:\d{2}:\d{2}', cols[0]):
+        cols[0] = 'timestamp'
+        if len(cols) > 1 and cols[1].upper() in ('AM', 'PM'):
+            cols[1] = 'ampm'
+    elif not re.match(r'^\d', cols[0]) and cols[0].lower() not in ('time', 'timestamp'):
+        cols = ['timestamp'] + cols
+    return cols
+
+def header_section(low):
+    """Seção cujo header é a linha `low` (em minúsculas), ou None se não for header."""
+    if '%user' in low and 'cpu' in low:
+        return 'CPU'
+    if ('kbmemfree' in low or 'kbmemused' in low) and '%memused' in low:
+        return 'MEMORY'
+    if 'kbswpfree' in low or 'kbswpused' in low:
+        return 'SWAP'
+    # sar -d (um disco por linha) e sar -n DEV (uma interface por linha)
+    if re.search(r'\bdev\b', low) and ('%util' in low or 'await' in low):
+        return 'DISK'
+    if 'iface' in low and 'rxpck/s' in low:
+        return 'NET'
+    if 'tps' in low and ('wtps' in low or 'bwrtn' in low or 'bread' in low or 'wrtn' in low):
+        return 'IO'
+    return None
+
+def parse_header_date(line):
+    """
+    Data da linha 'Linux ... (host)  07/11/2025 ...' como (a, b, ano) ou
+    (ano, mês, dia, 'iso'); a ordem dia/mês depende do locale e é resolvida
+    em resolve_header_date.
+    """
+    m = re.search(r'(\d{4})-(\d{2})-(\d{2})', line)
+    if m:
+        return (int(m.group(1)), int(m.group(2)), int(m.group(3)), 'iso')
+    m = re.search(r'(\d{1,2})/(\d{1,2})/(\d{2,4})', line)
+    if m:
+        year = int(m.group(3))
+        return (int(m.group(1)), int(m.group(2)), year + 2000 if year < 100 else year)
+    return None
+
+def resolve_header_date(raw, month_first):
+    """datetime.date a partir de parse_header_date; month_first para locales 12h (en_US)."""
+    if raw is None:
+        return None
+    try:
+        if len(raw) == 4:
+            return datetime.date(raw[0], raw[1], raw[2])
+        a, b, year = raw
+        if a > 12 or (b <= 12 and not month_first):
+            return datetime.date(year, b, a)
+        return datetime.date(year, a, b)
+    except ValueError:
+        return None
+
+def add_epoch_column(df, header_date):
+    """Acrescenta 'epoch' (int64) ao DataFrame de uma seção a partir de 'timestamp'/'ampm'."""
+    if 'timestamp' not in df.columns:
+        return df
+    ampm = df['ampm'] if 'ampm' in df.columns else None
+    date = resolve_header_date(header_date, month_first=ampm is not None)
+    epoch = clock_to_epoch(df['timestamp'], ampm, date)
+    if epoch is not None:
+        df['epoch'] = epoch
+    return df
+
+def continue_epoch(previous, part):
+    """
+    `part` é um trecho da mesma seção depois de `previous` (após um LINUX
+    RESTART): o epoch dele recomeça no dia do header, então soma os dias que
+    já viraram no trecho anterior.
+    """
+    if 'epoch' not in previous.columns or 'epoch' not in part.columns or previous.empty or part.empty:
+        return part
+    behind = int(previous['epoch'].iloc[-1]) - int(part['epoch'].iloc[0])
+    if behind > 0:
+        part = part.assign(epoch=part['epoch'] + -(-behind // 86400) * 86400)
+    return part
+
+def concat(frames):
+    """Junta os DataFrames de uma seção (pandas só é importado no parse do texto)."""
+    import pandas as pd
+
+    return pd.concat(frames, ignore_index=True)
+
+def frame_from_rows(buffer, header_cols):
+    """Modo original: um dict por linha e normalize_num célula a célula."""
+    import pandas as pd
+
+    # Construir DataFrame a partir do buffer usando header_cols
+    rows = []
+    for ln in buffer:
+        ln = ln.strip()
+        if not ln:
+            continue
+        if ln.lower().startswith('average') or 'média' in ln.lower():
+            continue
+        parts = re.split(r'\s+', ln)
+        if len(parts) < 2:
+            continue
+
+        row = {}
+        if len(parts) >= len(header_cols):
+            for idx, col in enumerate(header_cols):
+                if idx < len(parts):
+                    row[col] = parts[idx]
+                else:
+                    row[col] = None
+        else:
+            offset = len(header_cols) - len(parts)
+            for idx, col in enumerate(header_cols):
+                part_index = idx - offset
+                row[col] = parts[part_index] if 0 <= part_index < len(parts) else None
+        rows.append(row)
+
+    if rows:
+        df = pd.DataFrame(rows)
+        df.columns = [c.strip() for c in df.columns]
+
+        for col in df.columns:
+            if col is None:
+                continue
+            if col.lower() in TIME_COLUMNS or col.lower() in ENTITY_COLUMNS:
+                continue
+            df[col] = df[col].apply(lambda x: normalize_num(x) if isinstance(x, str) or x is not None else None)
+        return df
+    return None
+
+def frame_from_buffer(buffer, header_cols):
+    """
+    Modo vetorizado: junta as linhas da seção num único texto, troca a vírgula
+    decimal de uma vez e converte tudo com pd.read_csv (engine C) +
+    pd.to_numeric por coluna. Gera o mesmo DataFrame de frame_from_rows; se
+    houver linhas fora do padrão (colunas a mais/a menos), usa frame_from_rows.
+    """
+    import pandas as pd
+
+    if not buffer:
+        return None
+    text = '\n'.join(buffer).replace(',', '.')
+    try:
+        df = pd.read_csv(io.StringIO(text), sep=r'\s+', header=None, names=header_cols,
+                         dtype=str, engine='c', index_col=False)
+    except (pd.errors.ParserError, ValueError):
+        return frame_from_rows(buffer, header_cols)
+    if df.empty or df[header_cols[-1]].isna().any():
+        # Linhas mais curtas que o header são alinhadas à direita no modo original
+        return frame_from_rows(buffer, header_cols)
+
+    df.columns = [c.strip() for c in df.columns]
+    for col in df.columns:
+        if col.lower() in TIME_COLUMNS or col.lower() in ENTITY_COLUMNS:
+            continue
+        values = pd.to_numeric(df[col], errors='coerce').astype(np.float64)
+        if values.isna().all():
+            # Coluna sem nenhum número: None, como no modo original
+            values = pd.Series([None] * len(df), index=df.index, dtype=object)
+        df[col] = values
+    return df
+
+def split_cpu_section(df):
+    """
+    Com sar -P ALL a seção de CPU traz, em cada horário, a linha 'all' e uma
+    por núcleo: separa em CPU (só 'all', como antes) e PERCPU (por núcleo).
+    """
+    if 'CPU' not in df.columns:
+        return {'CPU': df}
+    per_core = df['CPU'].astype(str).str.lower() != 'all'
+    if not per_core.any():
+        return {'CPU': df}
+    sections = {'PERCPU': df[per_core].reset_index(drop=True)}
+    if not per_core.all():
+        sections['CPU'] = df[~per_core].reset_index(drop=True)
+    return sections
+
 # -----------------------
 # Parser robusto por header
 # -----------------------
+CHUNK_LINES = 50000
+# Identifica as entradas do parser no cache em disco (ver sar_cache.CACHE_VERSION)
+CACHE_TAG = "parser"
+
 class SARDataParser2:
-    def __init__(self):
-        self.data = {}
+    def __init__(self, vectorized=True, chunk_lines=CHUNK_LINES, cache=None):
+        # Métricas em formato colunar; self.data é a visão 'VM1_CPU' -> DataFrame sobre ele
+        self.store = MetricStore()
+        self.data = StoreView(self.store)
+        # Resultado de get_column_by_candidates por (chave, candidatos)
+        self._column_cache = {}
+        # vectorized=False mantém a conversão linha a linha original
+        self.vectorized = vectorized
+        # Máximo de linhas de texto mantidas antes de converter para DataFrame
+        self.chunk_lines = chunk_lines
+        # SectionCache opcional (sar_cache.py) com as seções já parseadas por arquivo
+        self.cache = cache
+        # Modo contínuo: (rótulo, SATail) por arquivo e estatísticas acumuladas
+        self.followed = []
+        self.running = {}
 
     def parse_sar_output(self, content, vm_name):
-        lines = content.splitlines()
+        """
+        Parseia a saída do sar. `content` pode ser o texto completo ou um
+        iterável de linhas (pipe do Popen, arquivo aberto): as linhas são
+        consumidas uma a uma e convertidas em blocos de `chunk_lines`, então
+        o texto nunca fica inteiro em memória.
+        """
+        for section, df in self.parse_sar_sections(content).items():
+            self.data[f'{vm_name}_{section}'] = df
+        self._column_cache.clear()
+
+    def parse_sar_sections(self, content):
+        """Como parse_sar_output, mas devolve {seção: DataFrame} sem rótulo de VM."""
+        sections = {}
+        lines = io.StringIO(content) if isinstance(content, str) else content
         current_section = None
         header_cols = []
         buffer = []
+        chunks = []
+        header_date = None
 
         # regex para detectar timestamp início de linha: ex "12:00:01" ou "12:00:01 AM"
         time_re = re.compile(r'^\d{1,2}:\d{2}:\d{2}')
 
-        def flush_section():
-            nonlocal current_section, header_cols, buffer
-            if not current_section or not header_cols or not buffer:
-                current_section = None
-                header_cols = []
-                buffer = []
-                return
-
-            # Construir DataFrame a partir do buffer usando header_cols
-            rows = []
-            for ln in buffer:
-                ln = ln.strip()
-                if not ln:
-                    continue
-                if ln.lower().startswith('average') or 'média' in ln.lower():
-                    continue
-                parts = re.split(r'\s+', ln)
-                if len(parts) < 2:
-                    continue
-
-                row = {}
-                if len(parts) >= len(header_cols):
-                    for idx, col in enumerate(header_cols):
-                        if idx < len(parts):
-                            row[col] = parts[idx]
-                        else:
-                            row[col] = None
+        def convert_buffer():
+            nonlocal buffer
+            parsing.rows += len(buffer)
+            with stage('convert', rows=len(buffer), section=current_section):
+                if self.vectorized:
+                    df = frame_from_buffer(buffer, header_cols)
                 else:
-                    offset = len(header_cols) - len(parts)
-                    for idx, col in enumerate(header_cols):
-                        part_index = idx - offset
-                        row[col] = parts[part_index] if 0 <= part_index < len(parts) else None
-                rows.append(row)
-
-            if rows:
-                df = pd.DataFrame(rows)
-                df.columns = [c.strip() for c in df.columns]
-
-                for col in df.columns:
-                    if col is None:
-                        continue
-                    if col.lower() in ('timestamp', 'hr', 'time', 'hora'):
-                        continue
-                    df[col] = df[col].apply(lambda x: normalize_num(x) if isinstance(x, str) or x is not None else None)
-                # Armazenar dataset
-                self.data[f'{vm_name}_{current_section}'] = df
+                    df = frame_from_rows(buffer, header_cols)
+            if df is not None:
+                chunks.append(df)
+            buffer = []
+
+        def flush_section():
+            nonlocal current_section, header_cols, buffer, chunks
+            if current_section and header_cols and buffer:
+                convert_buffer()
+            if current_section and chunks:
+                with stage('flush', section=current_section) as flushing:
+                    df = chunks[0] if len(chunks) == 1 else concat(chunks)
+                    # Armazenar dataset (com epoch após juntar os blocos, por causa da meia-noite)
+                    df = add_epoch_column(df, header_date)
+                    flushing.rows = len(df)
+                parts = split_cpu_section(df) if current_section == 'CPU' else {current_section: df}
+                for key, part in parts.items():
+                    # Mesma seção de novo no arquivo (ex: após um LINUX RESTART): acrescenta
+                    sections[key] = (concat([sections[key], continue_epoch(sections[key], part)])
+                                     if key in sections else part)
             current_section = None
             header_cols = []
             buffer = []
+            chunks = []
 
-        for line in lines:
-            l = line.strip()
-            if not l:
-                continue
+        parsing = stage('parse', rows=0)
+        with parsing:
+            for line in lines:
+                l = line.strip()
+                if not l:
+                    continue
 
-            low = l.lower()
+                low = l.lower()
 
-            # Detecção de headers
-            if '%user' in l and 'cpu' in l.lower():
-                header_cols = re.split(r'\s+', l)
-                if not re.match(r'^\d', header_cols[0]):
-                    if header_cols[0].lower() not in ('time', 'timestamp'):
-                        header_cols = ['timestamp'] + header_cols
-                current_section = 'CPU'
-                buffer = []
-                continue
+                # Banner 'Linux <kernel> (<host>) <data> ...', 'HH:MM:SS LINUX RESTART
+                # (N CPU)' no meio de uma seção e as médias do sar ('Average:'/'Média:',
+                # header e dados) fecham a seção: nenhum deles é linha de dados, e o
+                # header de média não pode abrir uma seção nova
+                if low.startswith('linux'):
+                    header_date = parse_header_date(l) or header_date
+                    flush_section()
+                    continue
+                if 'linux restart' in low or low.startswith('average') or low.startswith('média'):
+                    flush_section()
+                    continue
 
-            if ('kbmemfree' in low or 'kbmemused' in low) and '%memused' in low:
-                header_cols = re.split(r'\s+', l)
-                if not re.match(r'^\d', header_cols[0]):
-                    header_cols = ['timestamp'] + header_cols
-                current_section = 'MEMORY'
-                buffer = []
-                continue
+                # Detecção de headers. Com -P ALL, -d e -n DEV o sar repete o header
+                # antes de cada intervalo: o da seção já aberta só continua acumulando
+                section = header_section(low)
+                if section:
+                    cols = split_header(l)
+                    if section != current_section:
+                        flush_section()
+                        current_section = section
+                    elif cols != header_cols and buffer:
+                        convert_buffer()
+                    header_cols = cols
+                    continue
 
-            if 'kbswpfree' in low or 'kbswpused' in low:
-                header_cols = re.split(r'\s+', l)
-                if not re.match(r'^\d', header_cols[0]):
-                    header_cols = ['timestamp'] + header_cols
-                current_section = 'SWAP'
-                buffer = []
-                continue
+                if current_section and time_re.match(l):
+                    buffer.append(l)
+                    if len(buffer) >= self.chunk_lines:
+                        convert_buffer()
+                    continue
 
-            if 'tps' in low and ('wtps' in low or 'bwrtn' in low or 'bread' in low or 'wrtn' in low):
-                header_cols = re.split(r'\s+', l)
-                if not re.match(r'^\d', header_cols[0]):
-                    header_cols = ['timestamp'] + header_cols
-                current_section = 'IO'
-                buffer = []
-                continue
+                if current_section:
+                    if re.search(r'\d', l):
+                        buffer.append(l)
+                        if len(buffer) >= self.chunk_lines:
+                            convert_buffer()
 
-            if current_section and time_re.match(l):
-                buffer.append(l)
-                continue
+            flush_section()
+        return sections
 
-            if ('linux' in low and 'node' in low) or 'média' in low or low.startswith('average:') or low.startswith('average'):
-                flush_section()
-                continue
+    def read_sa_sections(self, sarfile_path):
+        """
+        Lê um report.sar (ou um arquivo do sar_sampler) e devolve {seção: colunas},
+        com as colunas num dict de arrays (leitor nativo, sem o pandas) ou num
+        DataFrame (seções que passaram pelo parse do texto do sar).
+        Usa o leitor binário nativo e, se o formato não for suportado, cai para
+        sar + parse. Discos e interfaces gravados no arquivo são lidos via sar
+        mesmo com o leitor nativo.
+        """
+        try:
+            with stage('read') as reading:
+                hdr, columns_by_section = read_metrics_file(sarfile_path)
+                reading.rows = sum(len(columns['epoch']) for columns in columns_by_section.values())
+        except SAFormatError as e:
+            print(f"Leitor nativo indisponível para {sarfile_path} ({e}); executando sar ...")
+            return self.parse_sar_sections(iter_sar_on_file(sarfile_path))
+        # Colunas do parser de texto + 'epoch'; o 'timestamp' em texto só é
+        # refeito pelo MetricStore se parser.data[...] for lido
+        sections = {section: columns for section, columns in columns_by_section.items() if len(columns['epoch'])}
+        if hdr['text_sections']:
+            text = self.parse_sar_sections(iter_sar_on_file(sarfile_path, SAR_ENTITY_FLAGS))
+            sections.update({k: v for k, v in text.items() if k in hdr['text_sections']})
+        return sections
 
-            if current_section:
-                if re.search(r'\d', l):
-                    buffer.append(l)
+    def load_sa_file(self, sarfile_path, vm_name):
+        """Carrega um report.sar em self.data, passando pelo cache em disco se houver."""
+        sections = None
+        if self.cache is not None:
+            with stage('cache', op='load'):
+                sections = self.cache.load(sarfile_path, CACHE_TAG, frames=False)
+        if sections is None:
+            sections = self.read_sa_sections(sarfile_path)
+            if self.cache is not None:
+                with stage('cache', op='store'):
+                    self.cache.store(sarfile_path, CACHE_TAG, sections)
+        with stage('store', rows=sum(len(df['epoch']) for df in sections.values() if 'epoch' in df)):
+            for section, df in sections.items():
+                self.data[f'{vm_name}_{section}'] = df
+        self._column_cache.clear()
+
+    def load_sa_files(self, files, jobs=None):
+        """
+        Carrega vários report.sar em paralelo (ProcessPoolExecutor, um arquivo por
+        worker). `files` é uma lista de (caminho, rótulo); o resultado é mesclado
+        em self.data na ordem da lista, independente de qual worker termina antes.
+        """
+        files = [(str(path), label) for path, label in files]
+        jobs = resolve_jobs(jobs, len(files))
+        tasks = [(path, label, self.vectorized, self.chunk_lines, self.cache) for path, label in files]
+        if jobs <= 1:
+            for store in map(_load_sa_file_worker, tasks):
+                self.store.update(store)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                for store in pool_map(executor, _load_sa_file_worker, tasks):
+                    self.store.update(store)
+        self.data.invalidate()
+        self._column_cache.clear()
+
+    def follow_sa_files(self, files):
+        """
+        Passa a acompanhar report.sar ainda em gravação (`files`: lista de
+        (caminho, rótulo)); os dados entram em self.data a cada poll_followed().
+        Só com o leitor nativo: formatos não suportados levantam SAFormatError.
+        """
+        self.followed = [(label, SATail(str(path))) for path, label in files]
+        for label, _ in self.followed:
+            for name, _, _ in METRICS:
+                self.running[(label, name)] = RunningStats()
+        return self.poll_followed()
 
-        flush_section()
+    def poll_followed(self):
+        """
+        Lê só os registros novos de cada arquivo acompanhado, acrescenta-os ao
+        MetricStore e atualiza as estatísticas acumuladas (self.running).
+        Retorna o nº de intervalos novos.
+        """
+        new_rows = 0
+        for label, tail in self.followed:
+            sections = tail.poll()
+            for section, columns in sections.items():
+                entity_col = ENTITY_SECTIONS.get(section)
+                metrics = {c: v for c, v in columns.items() if c not in ('epoch', 'CPU', entity_col)}
+                entity = columns.get(entity_col) if entity_col else None
+                self.store.append_columns(label, section, metrics, columns['epoch'], entity)
+                self.data.invalidate(f'{label}_{section}')
+            if 'CPU' in sections:
+                new_rows += len(sections['CPU']['epoch'])
+            for name, section, candidates in METRICS:
+                if section not in sections:
+                    continue
+                col = self.get_column_by_candidates(f'{label}_{section}', candidates)
+                if col is not None:
+                    self.running[(label, name)].update(sections[section][col])
+        return new_rows
 
     def get_column_by_candidates(self, vm_section_key, candidates):
         """
-        Retorna a primeira coluna que corresponder a qualquer candidato (case-insensitive substring)
+        Retorna a primeira coluna que corresponder a qualquer candidato (case-insensitive substring).
+        Nome exato é resolvido direto no índice do MetricStore; a busca por substring
+        só roda na primeira consulta de cada (chave, candidatos) e fica em cache.
         """
         if vm_section_key not in self.data:
             return None
-        df = self.data[vm_section_key]
-        cols = df.columns
+        run, section = StoreView.split_key(vm_section_key)
+        memo_key = (vm_section_key, tuple(candidates))
+        if memo_key in self._column_cache:
+            return self._column_cache[memo_key]
+        found = None
         for cand in candidates:
-            for c in cols:
+            found = self.store.find_metric(run, section, cand)
+            if found:
+                break
+            for c in self.store.metrics(run, section):
                 if c and cand.lower() in c.lower():
-                    return c
-        return None
+                    found = c
+                    break
+            if found:
+                break
+        self._column_cache[memo_key] = found
+        return found
+
+def resolve_jobs(jobs, n_tasks):
+    """Nº de workers: `jobs` se informado, senão um por tarefa até o nº de CPUs."""
+    if not jobs or jobs < 1:
+        jobs = os.cpu_count() or 1
+    return max(1, min(jobs, n_tasks))
+
+def _load_sa_file_worker(task):
+    # Executado no processo filho: um sar (ou leitura nativa) + parse por arquivo
+    path, label, vectorized, chunk_lines, cache = task
+    parser = SARDataParser2(vectorized=vectorized, chunk_lines=chunk_lines, cache=cache)
+    print(f"Lendo {path} ...")
+    parser.load_sa_file(path, label)
+    return parser.store
 
 # -----------------------
 # Preferências de "melhor"
@@ -203,257 +556,603 @@ metric_preferences = {
 # -----------------------
 # Plots e estatísticas
 # -----------------------
-def create_time_series_plots(parser, vm1_label='VM1', vm2_label='VM2'):
+# Painéis da figura de séries temporais:
+# (linha, coluna, seção, colunas candidatas, chave em metric_preferences, título, eixo y, escala, ylim)
+TIME_SERIES_PANELS = [
+    (0, 0, 'CPU', ['%user', 'user'], 'CPU_user', 'CPU - % User', 'Percentual (%)', 1, (0, 100)),
+    (0, 1, 'CPU', ['%system', 'system'], 'CPU_system', 'CPU - % System', 'Percentual (%)', 1, None),
+    (1, 0, 'MEMORY', ['%memused', 'memused'], 'MEMORY_used', 'Memória - % Utilizada', 'Percentual (%)', 1, None),
+    (1, 1, 'MEMORY', ['kbactive', 'active'], 'MEMORY_used', 'Memória Ativa (MB)', 'MB', 1 / 1024, None),
+    (2, 0, 'SWAP', ['%swpused', 'swpused'], 'SWAP_used', 'Swap - % Utilizado', 'Percentual (%)', 1, None),
+    (2, 1, 'SWAP', ['kbswpused', 'swpused'], 'SWAP_used', 'Swap Utilizado (MB)', 'MB', 1 / 1024, None),
+    (3, 0, 'IO', ['tps'], 'IO_tps', 'I/O - TPS', 'TPS', 1, None),
+    (3, 1, 'IO', ['bwrtn', 'wrtn', 'wrtn/s'], 'IO_bytes', 'I/O - Bytes Escritos (por segundo)',
+     'Bytes/s (ou valor correspondente)', 1, None),
+]
+
+# Janelas de anomalia destacadas por painel (as de maior |z|)
+MAX_SPIKE_SPANS = 40
+
+# Até quantas runs/grupos a média aparece no título de cada gráfico
+MAX_TITLE_MEANS = 4
+
+PLOT_DPI = 300
+# Os heatmaps de correlação têm muitas células e ficam enormes a 300 dpi
+CORRELATION_DPI = 150
+
+def mean_str(values):
+    values = None if values is None else np.asarray(values, dtype=np.float64)
+    if values is None or not np.isfinite(values).any():
+        return "N/A"
+    return f"{np.nanmean(values):.2f}"
+
+def write_csv(path, rows, columns):
+    """Grava uma lista de dicts (uma linha cada) com o módulo csv."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+def pref_text(pref_key):
+    pref = metric_preferences.get(pref_key, 'higher')
+    return "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
+
+def group_of(label, groups):
+    """Grupo da run (ou o próprio rótulo quando não há grupos)."""
+    return (groups or {}).get(label, label)
+
+def run_colors(keys):
+    """Azul e vermelho para as duas primeiras runs/grupos (como antes), depois o ciclo do matplotlib."""
+    import matplotlib
+
+    palette = ['blue', 'red'] + matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+    return {k: palette[i % len(palette)] for i, k in enumerate(keys)}
+
+def get_series(parser, label, section, candidates, scale=1):
+    """Valores (float64, sem NaN) de uma run/seção, ou None se a coluna não existir."""
+    col = parser.get_column_by_candidates(f'{label}_{section}', candidates)
+    if col is None:
+        return None
+    # Direto do MetricStore (float32), sem montar o DataFrame largo
+    s = parser.store.values(label, section, col).astype(np.float64)
+    s = s[~np.isnan(s)]
+    return s * scale if scale != 1 else s
+
+def aligned_panel(parser, labels, section, candidates, scale=1, step=None):
+    """
+    Séries de um painel alinhadas no tempo (sar_align): devolve (grade em
+    segundos desde o início de cada run, {rótulo: valores na grade}).
+    """
+    cols = {}
+    for label in labels:
+        col = parser.get_column_by_candidates(f'{label}_{section}', candidates)
+        if col is not None:
+            cols[label] = col
+    grid = common_grid([parser.store.epoch(l, section) for l in cols], step)
+    aligned = {}
+    for label, col in cols.items():
+        values = parser.store.values(label, section, col).astype(np.float64) * scale
+        aligned[label] = align_values(parser.store.epoch(label, section), values, grid)
+    return grid, aligned
+
+def spike_spans(parser, spikes, labels, section, col_by_label, colors, groups):
+    """
+    Janelas de anomalia (sar_spikes) das séries do painel, como (início, fim,
+    cor) em segundos desde o início da run, e o total de janelas.
+    """
+    rows = []
+    for label in labels:
+        col = col_by_label.get(label)
+        epoch = parser.store.epoch(label, section)
+        if col is None or epoch is None or not len(epoch):
+            continue
+        for r in spikes:
+            if r['run'] != label or r['section'] != section or r['metric'] != col:
+                continue
+            rows.append((abs(r['score']), r['start'] - epoch[0], r['end'] - epoch[0], label))
+    # Tabela já vem por |z|, mas as runs do painel se misturam: reordena
+    spans = [(float(start), float(end), colors[group_of(label, groups)])
+             for _, start, end, label in sorted(rows, reverse=True)[:MAX_SPIKE_SPANS]]
+    return spans, len(rows)
+
+def time_series_tasks(parser, labels=('VM1', 'VM2'), groups=None, step=None, points=None,
+                      lod='lttb', spikes=None, dpi=PLOT_DPI, fmt=DEFAULT_FORMAT):
+    """
+    Tarefa de renderização (sar_render) da figura 4x2 com uma linha por run.
+    Com `groups` ({rótulo: grupo}), as runs de um mesmo grupo compartilham cor
+    e a média da legenda é a do grupo.
+    O eixo x é o tempo desde o início de cada run: todas as runs são
+    reamostradas numa grade comum (passo `step` em segundos; padrão: o maior
+    intervalo de coleta entre elas).
+    Antes de plotar cada série é reduzida (sar_downsample, método `lod`) para
+    `points` pontos; por padrão ~a largura do eixo em pixels, e 0 desativa.
+    `spikes` (janelas de sar_spikes.detect_spikes) destaca as janelas de anomalia.
+    """
+    labels = list(labels)
+    keys = list(dict.fromkeys(group_of(l, groups) for l in labels))
+    colors = run_colors(keys)
+
+    panels = []
+    for row, col, section, candidates, pref_key, title, ylabel, scale, ylim in TIME_SERIES_PANELS:
+        series = {}
+        for label in labels:
+            s = get_series(parser, label, section, candidates, scale)
+            if s is not None:
+                series[label] = s
+        if not series:
+            continue
+
+        by_key = {}
+        for label, s in series.items():
+            by_key.setdefault(group_of(label, groups), []).append(s)
+        means = {k: mean_str(np.concatenate(v)) for k, v in by_key.items()}
+
+        grid, aligned = aligned_panel(parser, series.keys(), section, candidates, scale, step)
+        lines = []
+        in_legend = set()
+        for label, values in aligned.items():
+            k = group_of(label, groups)
+            lines.append((values, f'{k} (Média={means[k]})' if k not in in_legend else None, colors[k]))
+            in_legend.add(k)
+
+        spans, n_spikes = [], 0
+        if spikes is not None and len(spikes):
+            cols = {l: parser.get_column_by_candidates(f'{l}_{section}', candidates) for l in series}
+            spans, n_spikes = spike_spans(parser, spikes, series, section, cols, colors, groups)
+
+        mean_txt = ""
+        if len(means) <= MAX_TITLE_MEANS:
+            mean_txt = "Média " + ", ".join(f"{k}={m}" for k, m in means.items()) + " — "
+        panels.append({
+            'row': row, 'col': col, 'grid': grid, 'lines': lines,
+            'spans': spans, 'n_spikes': n_spikes, 'ylabel': ylabel, 'ylim': ylim,
+            'title': f'{title} ({mean_txt}{pref_text(pref_key)})',
+        })
+
+    return (render_time_series, {
+        'panels': panels, 'grouped': len(keys) < len(labels), 'points': points, 'lod': lod,
+        'filename': 'series_temporais_comparacao', 'dpi': dpi, 'fmt': fmt,
+    })
+
+def render_time_series(panels, grouped, points, lod, filename, dpi=PLOT_DPI, fmt=DEFAULT_FORMAT, show=False):
+    """Monta e salva a figura de séries temporais a partir de time_series_tasks."""
+    import matplotlib.pyplot as plt
+
     fig, axes = plt.subplots(4, 2, figsize=(20, 16))
     fig.suptitle('Séries Temporais - Comparação de Performance', fontsize=16, fontweight='bold', y=0.98)
-    colors = {vm1_label: 'blue', vm2_label: 'red'}
-
-    # helper para montar legenda com média
-    def mean_str(series):
-        if series is None or len(series.dropna()) == 0:
-            return "N/A"
-        return f"{series.mean():.2f}"
-
-    # --- CPU ---
-    vm1_cpu_key = f'{vm1_label}_CPU'
-    vm2_cpu_key = f'{vm2_label}_CPU'
-    if vm1_cpu_key in parser.data and vm2_cpu_key in parser.data:
-        vm1_cpu = parser.data[vm1_cpu_key]
-        vm2_cpu = parser.data[vm2_cpu_key]
-
-        user_col = parser.get_column_by_candidates(vm1_cpu_key, ['%user', 'user'])
-        system_col = parser.get_column_by_candidates(vm1_cpu_key, ['%system', 'system'])
-        iowait_col = parser.get_column_by_candidates(vm1_cpu_key, ['%iowait', 'iowait'])
-        idle_col = parser.get_column_by_candidates(vm1_cpu_key, ['%idle', 'idle'])
-
-        # CPU % User
-        if user_col:
-            s1 = vm1_cpu[user_col].dropna().astype(float)
-            s2 = vm2_cpu[user_col].dropna().astype(float)
-            m1 = mean_str(s1)
-            m2 = mean_str(s2)
-            pref = metric_preferences.get('CPU_user', 'higher')
-            pref_txt = "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
-            title = f'CPU - % User (Média VM1={m1}, VM2={m2} — {pref_txt})'
-            axes[0,0].plot(vm1_cpu.index, s1, label=f'{vm1_label} (Média={m1})', linewidth=2, color=colors[vm1_label])
-            axes[0,0].plot(vm2_cpu.index, s2, label=f'{vm2_label} (Média={m2})', linewidth=2, color=colors[vm2_label])
-            axes[0,0].set_title(title, fontweight='bold')
-            axes[0,0].set_ylabel('Percentual (%)')
-            axes[0,0].legend()
-            axes[0,0].grid(True, alpha=0.3)
-            axes[0,0].set_ylim(0, 100)
-
-        # CPU % System
-        if system_col:
-            s1 = vm1_cpu[system_col].dropna().astype(float)
-            s2 = vm2_cpu[system_col].dropna().astype(float)
-            m1 = mean_str(s1)
-            m2 = mean_str(s2)
-            pref = metric_preferences.get('CPU_system', 'lower')
-            pref_txt = "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
-            title = f'CPU - % System (Média VM1={m1}, VM2={m2} — {pref_txt})'
-            axes[0,1].plot(vm1_cpu.index, s1, label=f'{vm1_label} (Média={m1})', linewidth=2, color=colors[vm1_label])
-            axes[0,1].plot(vm2_cpu.index, s2, label=f'{vm2_label} (Média={m2})', linewidth=2, color=colors[vm2_label])
-            axes[0,1].set_title(title, fontweight='bold')
-            axes[0,1].set_ylabel('Percentual (%)')
-            axes[0,1].legend()
-            axes[0,1].grid(True, alpha=0.3)
-
-    # --- MEMORY ---
-    vm1_mem_key = f'{vm1_label}_MEMORY'
-    vm2_mem_key = f'{vm2_label}_MEMORY'
-    if vm1_mem_key in parser.data and vm2_mem_key in parser.data:
-        vm1_mem = parser.data[vm1_mem_key]
-        vm2_mem = parser.data[vm2_mem_key]
-
-        memused_col = parser.get_column_by_candidates(vm1_mem_key, ['%memused', 'memused'])
-        kbactive_col = parser.get_column_by_candidates(vm1_mem_key, ['kbactive', 'active'])
-
-        if memused_col:
-            s1 = vm1_mem[memused_col].dropna().astype(float)
-            s2 = vm2_mem[memused_col].dropna().astype(float)
-            m1 = mean_str(s1)
-            m2 = mean_str(s2)
-            pref = metric_preferences.get('MEMORY_used', 'lower')
-            pref_txt = "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
-            title = f'Memória - % Utilizada (Média VM1={m1}, VM2={m2} — {pref_txt})'
-            axes[1,0].plot(vm1_mem.index, s1, label=f'{vm1_label} (Média={m1})', linewidth=2, color=colors[vm1_label])
-            axes[1,0].plot(vm2_mem.index, s2, label=f'{vm2_label} (Média={m2})', linewidth=2, color=colors[vm2_label])
-            axes[1,0].set_title(title, fontweight='bold')
-            axes[1,0].set_ylabel('Percentual (%)')
-            axes[1,0].legend()
-            axes[1,0].grid(True, alpha=0.3)
-
-        if kbactive_col:
-            s1 = vm1_mem[kbactive_col].dropna().apply(lambda x: x/1024 if x is not None else None).astype(float)
-            s2 = vm2_mem[kbactive_col].dropna().apply(lambda x: x/1024 if x is not None else None).astype(float)
-            m1 = mean_str(s1)
-            m2 = mean_str(s2)
-            pref = metric_preferences.get('MEMORY_used', 'lower')
-            pref_txt = "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
-            title = f'Memória Ativa (MB) (Média VM1={m1}, VM2={m2} — {pref_txt})'
-            axes[1,1].plot(vm1_mem.index, s1, label=f'{vm1_label} (Média={m1})', linewidth=2, color=colors[vm1_label])
-            axes[1,1].plot(vm2_mem.index, s2, label=f'{vm2_label} (Média={m2})', linewidth=2, color=colors[vm2_label])
-            axes[1,1].set_title(title, fontweight='bold')
-            axes[1,1].set_ylabel('MB')
-            axes[1,1].legend()
-            axes[1,1].grid(True, alpha=0.3)
-
-    # --- SWAP ---
-    vm1_swap_key = f'{vm1_label}_SWAP'
-    vm2_swap_key = f'{vm2_label}_SWAP'
-    if vm1_swap_key in parser.data and vm2_swap_key in parser.data:
-        vm1_swap = parser.data[vm1_swap_key]
-        vm2_swap = parser.data[vm2_swap_key]
-
-        swpused_col = parser.get_column_by_candidates(vm1_swap_key, ['%swpused', 'swpused'])
-        kbswpused_col = parser.get_column_by_candidates(vm1_swap_key, ['kbswpused', 'swpused'])
-
-        if swpused_col:
-            s1 = vm1_swap[swpused_col].dropna().astype(float)
-            s2 = vm2_swap[swpused_col].dropna().astype(float)
-            m1 = mean_str(s1)
-            m2 = mean_str(s2)
-            pref = metric_preferences.get('SWAP_used', 'lower')
-            pref_txt = "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
-            title = f'Swap - % Utilizado (Média VM1={m1}, VM2={m2} — {pref_txt})'
-            axes[2,0].plot(vm1_swap.index, s1, label=f'{vm1_label} (Média={m1})', linewidth=2, color=colors[vm1_label])
-            axes[2,0].plot(vm2_swap.index, s2, label=f'{vm2_label} (Média={m2})', linewidth=2, color=colors[vm2_label])
-            axes[2,0].set_title(title, fontweight='bold')
-            axes[2,0].set_ylabel('Percentual (%)')
-            axes[2,0].legend()
-            axes[2,0].grid(True, alpha=0.3)
-
-        if kbswpused_col:
-            s1 = vm1_swap[kbswpused_col].dropna().apply(lambda x: x/1024 if x is not None else None).astype(float)
-            s2 = vm2_swap[kbswpused_col].dropna().apply(lambda x: x/1024 if x is not None else None).astype(float)
-            m1 = mean_str(s1)
-            m2 = mean_str(s2)
-            pref = metric_preferences.get('SWAP_used', 'lower')
-            pref_txt = "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
-            title = f'Swap Utilizado (MB) (Média VM1={m1}, VM2={m2} — {pref_txt})'
-            axes[2,1].plot(vm1_swap.index, s1, label=f'{vm1_label} (Média={m1})', linewidth=2, color=colors[vm1_label])
-            axes[2,1].plot(vm2_swap.index, s2, label=f'{vm2_label} (Média={m2})', linewidth=2, color=colors[vm2_label])
-            axes[2,1].set_title(title, fontweight='bold')
-            axes[2,1].set_ylabel('MB')
-            axes[2,1].legend()
-            axes[2,1].grid(True, alpha=0.3)
-
-    # --- IO ---
-    vm1_io_key = f'{vm1_label}_IO'
-    vm2_io_key = f'{vm2_label}_IO'
-    if vm1_io_key in parser.data and vm2_io_key in parser.data:
-        vm1_io = parser.data[vm1_io_key]
-        vm2_io = parser.data[vm2_io_key]
-
-        tps_col = parser.get_column_by_candidates(vm1_io_key, ['tps'])
-        bwrtn_col = parser.get_column_by_candidates(vm1_io_key, ['bwrtn', 'wrtn', 'wrtn/s', 'wrtn/s'])
-
-        if tps_col:
-            s1 = vm1_io[tps_col].dropna().astype(float)
-            s2 = vm2_io[tps_col].dropna().astype(float)
-            m1 = mean_str(s1)
-            m2 = mean_str(s2)
-            pref = metric_preferences.get('IO_tps', 'higher')
-            pref_txt = "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
-            title = f'I/O - TPS (Média VM1={m1}, VM2={m2} — {pref_txt})'
-            axes[3,0].plot(vm1_io.index, s1, label=f'{vm1_label} (Média={m1})', linewidth=2, color=colors[vm1_label])
-            axes[3,0].plot(vm2_io.index, s2, label=f'{vm2_label} (Média={m2})', linewidth=2, color=colors[vm2_label])
-            axes[3,0].set_title(title, fontweight='bold')
-            axes[3,0].set_ylabel('TPS')
-            axes[3,0].legend()
-            axes[3,0].grid(True, alpha=0.3)
-
-        if bwrtn_col:
-            s1 = vm1_io[bwrtn_col].dropna().astype(float)
-            s2 = vm2_io[bwrtn_col].dropna().astype(float)
-            m1 = mean_str(s1)
-            m2 = mean_str(s2)
-            pref = metric_preferences.get('IO_bytes', 'higher')
-            pref_txt = "Mais alto melhor" if pref == 'higher' else "Mais baixo melhor"
-            title = f'I/O - Bytes Escritos (por segundo) (Média VM1={m1}, VM2={m2} — {pref_txt})'
-            axes[3,1].plot(vm1_io.index, s1, label=f'{vm1_label} (Média={m1})', linewidth=2, color=colors[vm1_label])
-            axes[3,1].plot(vm2_io.index, s2, label=f'{vm2_label} (Média={m2})', linewidth=2, color=colors[vm2_label])
-            axes[3,1].set_title(title, fontweight='bold')
-            axes[3,1].set_ylabel('Bytes/s (ou valor correspondente)')
-            axes[3,1].legend()
-            axes[3,1].grid(True, alpha=0.3)
+
+    for panel in panels:
+        ax = axes[panel['row'], panel['col']]
+        n_points = axis_pixel_width(ax, dpi) if points is None else points
+        for values, legend, color in panel['lines']:
+            x, y = downsample(panel['grid'], values, n_points, lod)
+            # Com várias runs por grupo as linhas ficam finas e translúcidas
+            ax.plot(x, y, label=legend, color=color,
+                    linewidth=1 if grouped else 2, alpha=0.6 if grouped else 1)
+        for start, end, color in panel['spans']:
+            ax.axvspan(start - 0.5, end + 0.5, color=color, alpha=0.2, linewidth=0)
+        if panel['n_spikes']:
+            ax.plot([], [], color='gray', alpha=0.4, linewidth=8, label=f"Anomalias ({panel['n_spikes']})")
+
+        ax.set_title(panel['title'], fontweight='bold')
+        ax.set_ylabel(panel['ylabel'])
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        if panel['ylim']:
+            ax.set_ylim(*panel['ylim'])
 
     # labels x
     for i in range(4):
         for j in range(2):
-            axes[i,j].set_xlabel('Amostras')
+            axes[i,j].set_xlabel('Tempo desde o início (s)')
+
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    return save_figure(fig, filename, dpi, fmt, show=show)
+
+def create_time_series_plots(parser, labels=('VM1', 'VM2'), groups=None, step=None,
+                             points=None, lod='lttb', spikes=None, dpi=PLOT_DPI, fmt=DEFAULT_FORMAT):
+    """Gera (e, fora do modo lote, mostra) a figura de séries temporais; retorna o arquivo."""
+    fn, kwargs = time_series_tasks(parser, labels, groups, step, points, lod, spikes, dpi, fmt)
+    return fn(**kwargs, show=True)
+
+# Heatmaps das seções por entidade:
+# (seção, colunas candidatas, nome do arquivo, título, barra de cor, usar 100 - valor, limites)
+ENTITY_PANELS = [
+    ('PERCPU', ['%idle'], 'cpu_nucleos', 'CPU por núcleo - % Ocupado (100 - %idle)', '% ocupado', True, (0, 100)),
+    ('DISK', ['%util'], 'discos', 'Discos - % Utilização', '%util', False, (0, 100)),
+    ('NET', ['rxkB/s', 'rxkb'], 'rede_rx', 'Interfaces - kB/s Recebidos', 'kB/s', False, None),
+    ('NET', ['txkB/s', 'txkb'], 'rede_tx', 'Interfaces - kB/s Enviados', 'kB/s', False, None),
+]
+
+# Até quantos nomes de entidade aparecem no eixo y de cada heatmap
+MAX_ENTITY_TICKS = 32
+
+def entity_heatmap_tasks(parser, labels=('VM1', 'VM2'), points=None, dpi=PLOT_DPI, fmt=DEFAULT_FORMAT):
+    """
+    Tarefas de renderização (sar_render) dos heatmaps (tempo x entidade), um
+    por painel de ENTITY_PANELS com uma linha por run, em vez de uma linha
+    por núcleo/disco: escala para centenas de entidades.
+    """
+    tasks = []
+    for section, candidates, slug, title, cbar_label, complement, vlim in ENTITY_PANELS:
+        panels = []
+        for label in labels:
+            col = parser.get_column_by_candidates(f'{label}_{section}', candidates)
+            if col is None:
+                continue
+            times, names, m = parser.store.matrix(label, section, col)
+            if complement:
+                m = 100 - m
+            panels.append((label, times, names, m))
+        if not panels:
+            continue
+        # Mesma escala de cor em todas as runs, para serem comparáveis
+        vmin, vmax = vlim or (0, max(float(np.nanmax(m)) if np.isfinite(m).any() else 1 for *_, m in panels))
+        tasks.append((render_entity_heatmap, {
+            'section': section, 'panels': panels, 'title': title, 'cbar_label': cbar_label,
+            'vmin': vmin, 'vmax': vmax, 'points': points,
+            'filename': f'heatmap_{slug}', 'dpi': dpi, 'fmt': fmt,
+        }))
+    return tasks
+
+def render_entity_heatmap(section, panels, title, cbar_label, vmin, vmax, points, filename,
+                          dpi=PLOT_DPI, fmt=DEFAULT_FORMAT):
+    """
+    Monta e salva um heatmap de entity_heatmap_tasks. O tempo é reduzido para
+    ~a largura do eixo em pixels pelo máximo de cada balde (picos de saturação
+    não somem).
+    """
+    import matplotlib.pyplot as plt
+
+    heights = [min(max(2.5, 0.12 * len(names)), 8) for _, _, names, _ in panels]
+    fig, axes = plt.subplots(len(panels), 1, figsize=(20, sum(heights) + 1), squeeze=False,
+                             sharex=True, gridspec_kw={'height_ratios': heights})
+    fig.suptitle(title, fontsize=16, fontweight='bold')
+    # Eixo x comum: tempo desde o início de cada run, até a run mais longa
+    duration = max(float(times[-1] - times[0]) if len(times) > 1 else 1.0 for _, times, _, _ in panels)
+    for ax, (label, times, names, m) in zip(axes[:, 0], panels):
+        n_points = axis_pixel_width(ax, dpi) if points is None else points
+        _, reduced = bucket_reduce(m, n_points, 'max')
+        rel_end = float(times[-1] - times[0]) if len(times) > 1 else 1.0
+        im = ax.imshow(reduced.T, aspect='auto', interpolation='nearest', cmap='inferno',
+                       vmin=vmin, vmax=vmax, extent=[0, rel_end, len(names) - 0.5, -0.5])
+        tick_step = -(-len(names) // MAX_ENTITY_TICKS)
+        ax.set_yticks(range(0, len(names), tick_step))
+        ax.set_yticklabels(names[::tick_step])
+        ax.set_ylabel(f'{label}\n{ENTITY_SECTIONS[section]}')
+        with np.errstate(all='ignore'):
+            means = np.nanmean(m, axis=0)
+        # Desequilíbrio: entidade mais e menos carregada na média
+        if np.isfinite(means).any():
+            hi, lo = np.nanargmax(means), np.nanargmin(means)
+            ax.set_title(f'{label} - Média por {ENTITY_SECTIONS[section]}: '
+                         f'maior {names[hi]}={means[hi]:.2f}, menor {names[lo]}={means[lo]:.2f}')
+        fig.colorbar(im, ax=ax, label=cbar_label, pad=0.01)
+    axes[-1, 0].set_xlim(0, duration)
+    axes[-1, 0].set_xlabel('Tempo desde o início (s)')
+    return save_figure(fig, filename, dpi, fmt)
 
-    plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-    plt.savefig('series_temporais_comparacao.png', dpi=300, bbox_inches='tight')
-    plt.show()
+def create_entity_heatmaps(parser, labels=('VM1', 'VM2'), points=None, dpi=PLOT_DPI,
+                           fmt=DEFAULT_FORMAT, jobs=1):
+    """Gera os heatmaps por entidade (`jobs` processos); retorna os arquivos gerados."""
+    return render_all(entity_heatmap_tasks(parser, labels, points, dpi, fmt), jobs)
+
+def parser_stats(parser, labels, metrics=METRICS):
+    """
+    {(rótulo, métrica): RunningStats} alimentados em blocos direto do
+    MetricStore, sem montar um DataFrame com todas as amostras.
+    """
+    stats = {}
+    with stage('summarize') as summarizing:
+        for name, section, candidates in metrics:
+            for label in labels:
+                col = parser.get_column_by_candidates(f'{label}_{section}', candidates)
+                if col is None:
+                    continue
+                values = parser.store.values(label, section, col)
+                acc = RunningStats()
+                for start in range(0, len(values), STATS_CHUNK):
+                    acc.update(values[start:start + STATS_CHUNK])
+                if acc.count:
+                    stats[(label, name)] = acc
+        summarizing.rows = sum(acc.count for acc in stats.values())
+    return stats
 
-def print_stats(parser, vm1_label='VM1', vm2_label='VM2'):
+def print_spikes(spikes, limit=20):
+    """Maiores anomalias (por |z|) e o total por run/métrica."""
+    print(f"\nANOMALIAS (|z| robusto >= limiar, mediana/MAD móveis): {len(spikes)} janelas")
+    print("="*80)
+    for r in spikes[:limit]:
+        start = datetime.datetime.fromtimestamp(r['start']).strftime('%H:%M:%S')
+        print(f"  {r['run']:<10} {r['section']:<7} {r['metric']:<12} {start} ({r['samples']} amostra(s)): "
+              f"pico={r['peak']:.2f}, referência={r['baseline']:.2f}, z={r['score']:+.1f}")
+    if len(spikes) > limit:
+        print(f"  ... mais {len(spikes) - limit} em 'anomalias.csv'")
+
+def print_correlations(parser, labels, max_lag=MAX_LAG, step=None, limit=15,
+                       dpi=CORRELATION_DPI, fmt=DEFAULT_FORMAT):
+    """
+    Correlação e defasagem entre todas as métricas de cada run (sar_correlate):
+    imprime os pares mais correlacionados e salva 'correlacoes.csv'. Retorna
+    as tarefas de renderização (sar_render) de um heatmap por run.
+    """
+    tables, tasks = [], []
+    for label in labels:
+        result = analyze_run(parser.store, label, max_lag=max_lag, step=step)
+        if result is None:
+            continue
+        tables.append(pair_table(label, result))
+        tasks.append((plot_correlation, {'run': label, 'result': result, 'filename': f'correlacao_{label}',
+                                         'dpi': dpi, 'fmt': fmt}))
+    if not tables:
+        return tasks
+    table = sorted((r for t in tables for r in t), key=lambda r: abs(r['peak_corr']), reverse=True)
+    write_csv('correlacoes.csv', table, PAIR_COLUMNS)
+
+    print(f"\nCORRELAÇÕES ENTRE MÉTRICAS (defasagem até ±{max_lag:g}s)")
+    print("="*80)
+    for r in table[:limit]:
+        if r['lag_s'] > 0:
+            lead = f"{r['a']} antecede em {r['lag_s']:g}s"
+        elif r['lag_s'] < 0:
+            lead = f"{r['b']} antecede em {-r['lag_s']:g}s"
+        else:
+            lead = "simultâneas"
+        print(f"  {r['run']:<10} {r['a']:<22} x {r['b']:<22}: r={r['corr']:+.2f}, "
+              f"pico={r['peak_corr']:+.2f} ({lead})")
+    return tasks
+
+def parser_samples(parser, labels, groups=None, metrics=METRICS):
+    """
+    {(run ou grupo, métrica): amostras} para os testes de sar_compare; com
+    grupos, as runs de cada grupo são concatenadas na ordem informada.
+    """
+    parts = {}
+    for name, section, candidates in metrics:
+        for label in labels:
+            s = get_series(parser, label, section, candidates)
+            if s is not None and len(s):
+                parts.setdefault((group_of(label, groups), name), []).append(s)
+    return {key: np.concatenate(arrays) for key, arrays in parts.items()}
+
+def print_comparison(parser, labels, groups=None, n_boot=DEFAULT_BOOT, alpha=DEFAULT_ALPHA, jobs=None):
+    """
+    Significância (Mann-Whitney U com n efetivo) e IC por bootstrap das
+    diferenças de mediana e p99 entre a primeira run/grupo e as demais.
+    """
+    keys = list(dict.fromkeys(group_of(l, groups) for l in labels))
+    if len(keys) < 2:
+        return
+    base = keys[0]
+    pairs = [(name, base, other) for name, _, _ in METRICS for other in keys[1:]]
+    table = compare_all(parser_samples(parser, labels, groups), pairs,
+                        n_boot=n_boot, alpha=alpha, jobs=jobs)
+    if not table:
+        return
+    level = f"IC{100 * (1 - alpha):g}%"
+    print(f"\nSIGNIFICÂNCIA ({base} - outra; n efetivo desconta a autocorrelação)")
+    print("="*80)
+    for r in table:
+        verdict = "diferença significativa" if r['significant'] else "sem diferença significativa"
+        print(f"  {r['metric']:<12} {base} - {r['other']}: p={r['p_value']:.4f}, efeito={r['effect']:+.2f}, "
+              f"n_ef={r['n_eff_a']:.0f}/{r['n_eff_b']:.0f} → {verdict}")
+        if n_boot:
+            print(f"    Δmediana={r['median_diff']:+.2f} [{level} {r['median_low']:+.2f}, {r['median_high']:+.2f}] | "
+                  f"Δp99={r['p99_diff']:+.2f} [{level} {r['p99_low']:+.2f}, {r['p99_high']:+.2f}]")
+
+def print_stats(parser, labels=('VM1', 'VM2'), groups=None, n_boot=DEFAULT_BOOT,
+                alpha=DEFAULT_ALPHA, jobs=None):
     print("ESTATÍSTICAS RESUMIDAS")
     print("="*80)
 
-    metric_map = [
-        (f'{vm1_label}_CPU', '%user', 'CPU_User'),
-        (f'{vm1_label}_CPU', '%system', 'CPU_System'),
-        (f'{vm1_label}_MEMORY', '%memused', 'Memory_Used'),
-        (f'{vm1_label}_SWAP', '%swpused', 'Swap_Used'),
-        (f'{vm1_label}_IO', 'tps', 'IO_TPS'),
-    ]
-
-    for vm_section, col_cand, metric_name in metric_map:
-        base = vm_section.split('_', 1)[1]
-        vm1_key = f'{vm1_label}_{base}'
-        vm2_key = f'{vm2_label}_{base}'
-        if vm1_key in parser.data and vm2_key in parser.data:
-            col1 = parser.get_column_by_candidates(vm1_key, [col_cand])
-            col2 = parser.get_column_by_candidates(vm2_key, [col_cand])
-            if col1 and col2:
-                s1 = parser.data[vm1_key][col1].dropna().astype(float)
-                s2 = parser.data[vm2_key][col2].dropna().astype(float)
-                if len(s1) == 0 or len(s2) == 0:
-                    continue
-                print(f"\n{metric_name}:")
-                print(f"  {vm1_label}: Média={s1.mean():.2f}, Max={s1.max():.2f}, Min={s1.min():.2f}")
-                print(f"  {vm2_label}: Média={s2.mean():.2f}, Max={s2.max():.2f}, Min={s2.min():.2f}")
-                print(f"  Diferença Média: {s1.mean() - s2.mean():.2f}")
+    labels = list(labels)
+    stats = parser_stats(parser, labels)
+    if not stats:
+        return
+    table = {key: acc.as_row() for key, acc in stats.items()}
+    base = labels[0]
+
+    for metric_name, _, _ in METRICS:
+        present = [l for l in labels if (l, metric_name) in table]
+        if not present:
+            continue
+        print(f"\n{metric_name}:")
+        for label in present:
+            r = table[(label, metric_name)]
+            print(f"  {label}: Média={r['mean']:.2f}, Max={r['max']:.2f}, Min={r['min']:.2f}")
+        if base not in present:
+            continue
+        others = [l for l in present if l != base]
+        base_mean = table[(base, metric_name)]['mean']
+        for label in others:
+            diff = base_mean - table[(label, metric_name)]['mean']
+            if len(labels) == 2:
+                print(f"  Diferença Média: {diff:.2f}")
+            else:
+                print(f"  Diferença Média ({base} - {label}): {diff:.2f}")
+
+    if groups:
+        print("\nPOR GRUPO")
+        print("="*80)
+        # Grupos: os acumuladores das runs são combinados (média, desvio e quantis)
+        by_group = {}
+        for (label, metric_name), acc in stats.items():
+            by_group.setdefault((group_of(label, groups), metric_name), []).append(acc)
+        gtable = {key: merge_stats(accs).as_row() for key, accs in by_group.items()}
+        for (group, metric_name), r in gtable.items():
+            print(f"  {group:<12} {metric_name:<12}: runs={len(by_group[(group, metric_name)])}, "
+                  f"Média={r['mean']:.2f}, Mediana={r['median']:.2f}, P95={r['p95']:.2f}, CV={r['cv']:.3f}")
+
+    print_comparison(parser, labels, groups, n_boot=n_boot, alpha=alpha, jobs=jobs)
 
 # -----------------------
 # Main
 # -----------------------
-def main():
-    if len(sys.argv) >= 3:
-        vm1_file = Path(sys.argv[1])
-        vm2_file = Path(sys.argv[2])
-    else:
-        vm1_file = Path("vm1_report.sar")
-        vm2_file = Path("vm2_report.sar")
+def print_running_stats(parser, labels):
+    """Uma linha por run com a média acumulada (modo contínuo) de cada métrica."""
+    for label in labels:
+        parts = []
+        for name, _, _ in METRICS:
+            acc = parser.running[(label, name)]
+            if acc.count:
+                parts.append(f"{name}={acc.mean:.2f} (max {acc.max:.2f})")
+        n = parser.running[(label, METRICS[0][0])].count
+        print(f"  {label}: n={n} " + ", ".join(parts))
 
-    if not vm1_file.exists():
-        print(f"Arquivo não encontrado: {vm1_file}")
-        sys.exit(1)
-    if not vm2_file.exists():
-        print(f"Arquivo não encontrado: {vm2_file}")
+def follow_runs(parser, runs, interval):
+    """
+    Modo contínuo: a cada `interval` segundos lê só os registros novos dos
+    arquivos (sar -o ainda gravando) e imprime as estatísticas acumuladas.
+    Termina com Ctrl+C; os dados lidos seguem para os gráficos.
+    """
+    labels = [label for label, _, _ in runs]
+    try:
+        parser.follow_sa_files([(path, label) for label, _, path in runs])
+    except SAFormatError as e:
+        print(f"Modo contínuo requer o leitor nativo ({e})")
         sys.exit(1)
+    print(f"Acompanhando {len(runs)} arquivo(s) a cada {interval:g}s (Ctrl+C para encerrar)...")
+    print_running_stats(parser, labels)
+    try:
+        while True:
+            started = time.monotonic()
+            if parser.poll_followed():
+                print(time.strftime('%H:%M:%S'))
+                print_running_stats(parser, labels)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        print("\nModo contínuo encerrado.")
+
+def build_arg_parser(description):
+    ap = argparse.ArgumentParser(description=description)
+    add_run_arguments(ap)
+    ap.add_argument("-j", "--jobs", type=int, default=None,
+                    help="processos para ler os arquivos em paralelo (padrão: nº de CPUs)")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR,
+                    help="diretório do cache de dados já parseados")
+    ap.add_argument("--no-cache", action="store_true", help="não usa o cache em disco")
+    ap.add_argument("--step", type=float, default=None,
+                    help="passo (s) da grade comum das séries temporais (padrão: maior intervalo de coleta)")
+    ap.add_argument("--points", type=int, default=None,
+                    help="pontos por série nos gráficos (padrão: largura do eixo em pixels; 0 = todos)")
+    ap.add_argument("--lod", choices=LOD_METHODS, default='lttb',
+                    help="método de redução de pontos: lttb (forma) ou minmax (envelope de picos)")
+    ap.add_argument("--spikes", type=float, default=SPIKE_THRESHOLD, metavar="Z",
+                    help="limiar de |z| robusto para marcar anomalias (0 = não detecta)")
+    ap.add_argument("--boot", type=int, default=DEFAULT_BOOT,
+                    help="reamostragens do bootstrap nos ICs das diferenças (0 = só o teste U)")
+    ap.add_argument("--alpha", type=float, default=DEFAULT_ALPHA,
+                    help="nível de significância dos testes e ICs")
+    ap.add_argument("--dpi", type=int, default=None,
+                    help=f"resolução das figuras (padrão: {PLOT_DPI}; {CORRELATION_DPI} nas de correlação)")
+    ap.add_argument("--format", choices=FORMATS, default=DEFAULT_FORMAT, dest="fmt",
+                    help="formato das figuras")
+    ap.add_argument("--batch", action="store_true",
+                    help="modo lote: backend Agg, sem janelas (automático sem DISPLAY)")
+    ap.add_argument("--stats-only", action="store_true",
+                    help="só as estatísticas: não gera gráficos (nem importa o matplotlib)")
+    add_profile_arguments(ap)
+    return ap
+
+def setup_backend(args):
+    """Força o backend Agg em modo lote (--batch ou sem servidor gráfico)."""
+    if not args.stats_only and (args.batch or headless()):
+        use_batch_backend()
+
+def render_figures(series, tasks, jobs=None):
+    """
+    Renderiza as figuras em paralelo (sar_render). Fora do modo lote a figura
+    de séries temporais é montada neste processo, por último, e mostrada na tela.
+    """
+    if is_batch():
+        return render_all([series] + tasks, jobs)
+    saved = render_all(tasks, jobs)
+    fn, kwargs = series
+    return [fn(**kwargs, show=True)] + saved
 
-    parser = SARDataParser2()
+def find_spikes(parser, labels, threshold):
+    """Detecta as anomalias de todas as séries, imprime as maiores e salva 'anomalias.csv'."""
+    if not threshold:
+        return None
+    spikes = detect_spikes(parser.store, labels, threshold=threshold)
+    print_spikes(spikes)
+    if spikes:
+        write_csv('anomalias.csv', spikes, SPIKE_COLUMNS)
+    return spikes
+
+def cache_from_args(args):
+    return None if args.no_cache else SectionCache(args.cache_dir)
+
+def runs_from_args(args):
+    """
+    Runs (rótulo, grupo, caminho) a partir dos arquivos e de --group.
+    Sem nenhum arquivo, usa vm1_report.sar e vm2_report.sar como antes.
+    """
+    files = args.files
+    if not files and not args.group:
+        files = ["vm1_report.sar", "vm2_report.sar"]
+    try:
+        runs = resolve_runs(files, args.group)
+    except ValueError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+    for _, _, path in runs:
+        if not path.exists():
+            print(f"Arquivo não encontrado: {path}")
+            sys.exit(1)
+    return runs
 
-    print(f"Executando sar para {vm1_file} ...")
-    out1 = run_sar_on_file(vm1_file)
-    parser.parse_sar_output(out1, "VM1")
+def main():
+    ap = build_arg_parser("Comparativo de séries temporais do sar entre N runs")
+    ap.add_argument("--follow", type=float, metavar="SEGUNDOS", default=None,
+                    help="acompanha arquivos ainda em gravação, lendo só os registros novos a cada SEGUNDOS")
+    ap.add_argument("--max-lag", type=float, metavar="SEGUNDOS", default=MAX_LAG,
+                    help="maior defasagem na correlação entre métricas (0 = não calcula)")
+    args = ap.parse_args()
+    setup_backend(args)
+    runs = runs_from_args(args)
+    labels = [label for label, _, _ in runs]
+    groups = {label: group for label, group, _ in runs if group}
 
-    print(f"Executando sar para {vm2_file} ...")
-    out2 = run_sar_on_file(vm2_file)
-    parser.parse_sar_output(out2, "VM2")
+    start_profile(args)
+    parser = SARDataParser2(cache=cache_from_args(args))
+    if args.follow:
+        follow_runs(parser, runs, args.follow)
+    else:
+        with stage('load'):
+            parser.load_sa_files([(path, label) for label, _, path in runs], jobs=args.jobs)
 
     print("\nDados carregados:", list(parser.data.keys()))
 
-    print("\nGerando gráficos...")
-    create_time_series_plots(parser, vm1_label='VM1', vm2_label='VM2')
+    with stage('spikes'):
+        spikes = find_spikes(parser, labels, args.spikes)
+    series, tasks = None, []
+    if not args.stats_only:
+        with stage('prepare'):
+            series = time_series_tasks(parser, labels, groups, step=args.step, points=args.points,
+                                       lod=args.lod, spikes=spikes, dpi=args.dpi or PLOT_DPI, fmt=args.fmt)
+            tasks = entity_heatmap_tasks(parser, labels, args.points, args.dpi or PLOT_DPI, args.fmt)
 
     print("\nCalculando estatísticas...")
-    print_stats(parser, vm1_label='VM1', vm2_label='VM2')
+    with stage('stats'):
+        print_stats(parser, labels, groups, n_boot=args.boot, alpha=args.alpha, jobs=args.jobs)
+    if args.max_lag:
+        with stage('correlate'):
+            correlations = print_correlations(parser, labels, args.max_lag, args.step,
+                                              dpi=args.dpi or CORRELATION_DPI, fmt=args.fmt)
+        if not args.stats_only:
+            tasks += correlations
+
+    saved = []
+    if series is not None:
+        print("\nGerando gráficos...")
+        with stage('figures'):
+            saved = render_figures(series, tasks, args.jobs)
 
-    print("\nConcluído. Gráfico salvo em 'series_temporais_comparacao.png'")
+    print("\nConcluído.")
+    for filename in saved:
+        print(f"Figura salva em '{filename}'")
+    finish_profile(args)
 
 if __name__ == "__main__":
     main()
@@ -1,15 +1,27 @@
 #!/bin-bash
 echo "🚀 Iniciando teste de stress combinado (CPU, Memória e I/O)..."
-echo "O sistema ficará sob carga pesada por 60 segundos."
-echo "Um relatório 'report.sar' será gerado."
 
 TEST_DURATION=60
+# Coletor: sar (padrão) ou proc (sar_sampler.py: sem sysstat, intervalo abaixo de 1 s)
+COLLECTOR=${COLLECTOR:-sar}
+PROC_INTERVAL=${PROC_INTERVAL:-0.1}
+if [ "$COLLECTOR" = "proc" ]; then REPORT="report.proc"; else REPORT="report.sar"; fi
+
+echo "O sistema ficará sob carga pesada por $TEST_DURATION segundos."
+echo "Um relatório '$REPORT' será gerado."
+
 TEMP_DIR="fio-test-data"
 mkdir -p $TEMP_DIR
 
 # 1. Coleta de Métricas (background)
-echo "Iniciando monitoramento com 'sar'..."
-sudo sar -u -r -S -b -o report.sar 1 $TEST_DURATION &
+if [ "$COLLECTOR" = "proc" ]; then
+    echo "Iniciando monitoramento com 'sar_sampler.py' (a cada ${PROC_INTERVAL}s)..."
+    python3 "$(dirname "$0")/sar_sampler.py" record -o $REPORT -i $PROC_INTERVAL -d $TEST_DURATION &
+else
+    echo "Iniciando monitoramento com 'sar'..."
+    # -P ALL: por núcleo; -d: por disco; -n DEV: por interface de rede
+    sudo sar -u -P ALL -r -S -b -d -n DEV -o $REPORT 1 $TEST_DURATION &
+fi
 SAR_PID=$!
 
 # 2. Stress de I/O (fio)
@@ -35,4 +47,4 @@ sudo pkill -f fio
 sudo pkill -f stress-ng
 sudo pkill -f sysbench
 rm -rf $TEMP_DIR
-echo "✅ Teste concluído! Relatório salvo em 'report.sar'."
+echo "✅ Teste concluído! Relatório salvo em '$REPORT'."
@@ -0,0 +1,203 @@
+"""
+Leitor nativo (sar_binary): um sa file montado com struct, com contadores
+escolhidos à mão, decodifica nos mesmos valores que o `sar` imprime para ele
+(%system = sys + hardirq + softirq, %memused pela conta do sar com slab).
+SATail lê o mesmo arquivo enquanto ele cresce, só a partir do último
+registro completo.
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from sar_binary import (A_CPU, A_MEMORY, FILE_MAGIC_SIZE, FORMAT_MAGIC, R_RESTART, R_STATS, SYSSTAT_MAGIC,
+                        SATail, decode_sa_buffer, read_sa_header)
+from sar_visualize import SARDataParser2
+
+HEADER_SIZE = 200
+ACT_SIZE = 36
+REC_SIZE = 24
+# Itens com folga depois dos campos unsigned long long, como no sysstat
+CPU_ITEM = 88
+MEMORY_ITEM = 144
+START = 1710072001   # 10/03/2024 12:00:01 UTC
+
+# Contadores acumulados do 'all' em cada registro:
+# user nice sys idle iowait steal hardirq softirq guest guest_nice
+CPU_ALL = [
+    [1000, 100, 300, 5000, 200, 0, 40, 60, 0, 0],
+    [1100, 100, 320, 5600, 250, 0, 50, 80, 0, 0],
+    [1300, 140, 360, 5680, 250, 20, 60, 90, 40, 0],
+]
+# frmkb bufkb camkb tlmkb frskb tlskb caskb comkb activekb
+# inactkb dirtykb anonpgkb slabkb kstackkb pgtblkb vmusedkb availablekb
+MEMORY = [
+    [900, 200, 300, 4000, 750, 1000, 50, 2400, 1400, 600, 10, 0, 500, 0, 0, 0, 1700],
+    [1000, 200, 300, 4000, 750, 1000, 50, 2500, 1500, 600, 10, 0, 500, 0, 0, 0, 1800],
+    [3000, 400, 500, 4000, 1000, 1000, 0, 2000, 1000, 400, 5, 0, 300, 0, 0, 0, 3500],
+]
+
+# Saída do `sar -u -P ALL -r -S -f` para os registros acima (TZ=UTC)
+SAR_TEXT = """\
+Linux 6.1.0-13-amd64 (node1) \t03/10/2024 \t_x86_64_\t(2 CPU)
+
+12:00:01        CPU     %user     %nice   %system   %iowait    %steal     %idle
+12:00:02        all     12.50      0.00      6.25      6.25      0.00     75.00
+12:00:02          0     12.50      0.00      6.25      6.25      0.00     75.00
+12:00:02          1     12.50      0.00      6.25      6.25      0.00     75.00
+
+12:00:02        CPU     %user     %nice   %system   %iowait    %steal     %idle
+12:00:03        all     40.00     10.00     15.00      0.00      5.00     20.00
+12:00:03          0     40.00     10.00     15.00      0.00      5.00     20.00
+12:00:03          1     40.00     10.00     15.00      0.00      5.00     20.00
+
+Average:        CPU     %user     %nice   %system   %iowait    %steal     %idle
+Average:        all     26.25      5.00     10.62      3.12      2.50     52.50
+
+12:00:01    kbmemfree   kbavail kbmemused  %memused kbbuffers  kbcached  kbcommit   %commit  kbactive   kbinact   kbdirty
+12:00:02         1000      1800      2000     50.00       200       300      2500     50.00      1500       600        10
+12:00:03         3000      3500      1000     25.00       400       500      2000     40.00      1000       400         5
+Average:         2000      2650      1500     37.50       300       400      2250     45.00      1250       500         8
+
+12:00:01    kbswpfree kbswpused  %swpused  kbswpcad   %swpcad
+12:00:02          750       250     25.00        50     20.00
+12:00:03         1000         0      0.00         0      0.00
+Average:          875       125     12.50        25     20.00
+"""
+
+
+def sa_file(cpu_nr=2, restart_after=None):
+    """sa file (sysstat >= 11.7.1, little-endian) com CPU (-P ALL) e memória."""
+    magic = struct.pack('<HHBBBBI', SYSSTAT_MAGIC, FORMAT_MAGIC, 12, 6, 1, 0, HEADER_SIZE)
+    header = bytearray(HEADER_SIZE)
+    struct.pack_into('<III', header, 16, cpu_nr + 1, 2, 124)
+    struct.pack_into('<III', header, 52, ACT_SIZE, REC_SIZE, 0)
+    struct.pack_into('<BB', header, 64, 10, 2)
+    header[67 + 65:67 + 65 + 5] = b'node1'
+    acts = (struct.pack('<IIiiiiIII', A_CPU, 0, cpu_nr + 1, 1, 1, CPU_ITEM, 10, 0, 0)
+            + struct.pack('<IIiiiiIII', A_MEMORY, 0, 1, 1, 0, MEMORY_ITEM, 17, 0, 0))
+    out = bytearray(magic.ljust(FILE_MAGIC_SIZE, b'\0') + bytes(header) + acts)
+
+    for i, (cpu, mem) in enumerate(zip(CPU_ALL, MEMORY)):
+        out += struct.pack('<QQIBBBB', 100 * (i + 1), START + i, 0, R_STATS, 12, 0, 1 + i)
+        # CPU: o 'all' e cada núcleo com uma parte igual dos contadores
+        out += struct.pack('<i', cpu_nr + 1)
+        for item in [cpu] + [[v // cpu_nr for v in cpu]] * cpu_nr:
+            out += struct.pack('<10Q', *item).ljust(CPU_ITEM, b'\0')
+        out += struct.pack('<17Q', *mem).ljust(MEMORY_ITEM, b'\0')
+        if restart_after == i:
+            out += struct.pack('<QQIBBBB', 0, START + i, 0, R_RESTART, 12, 0, 1 + i) + struct.pack('<i', cpu_nr)
+    return bytes(out)
+
+
+@pytest.fixture(scope='module')
+def text_sections():
+    return SARDataParser2().parse_sar_sections(SAR_TEXT)
+
+
+def test_header():
+    hdr, _ = decode_sa_buffer(sa_file())
+    assert hdr['date'] == (2024, 3, 10)
+    assert hdr['nodename'] == 'node1'
+    assert hdr['cpu_nr'] == 3
+    assert hdr['text_sections'] == []
+
+
+@pytest.mark.parametrize('section', ['CPU', 'PERCPU', 'MEMORY', 'SWAP'])
+def test_values_match_sar_text(section, text_sections):
+    _, sections = decode_sa_buffer(sa_file())
+    decoded, text = sections[section], text_sections[section]
+    assert len(decoded['epoch']) == len(text)
+    # O epoch é o do fim de cada intervalo
+    expected_epoch = np.repeat([START + 1, START + 2], 2 if section == 'PERCPU' else 1)
+    np.testing.assert_array_equal(decoded['epoch'], expected_epoch)
+    columns = [c for c in text.columns if c.startswith('%') or c.startswith('kb')]
+    assert columns
+    for col in columns:
+        # O sar imprime 2 casas
+        np.testing.assert_allclose(decoded[col], text[col].to_numpy(dtype=float), atol=0.005, err_msg=col)
+    if section == 'PERCPU':
+        assert list(decoded['CPU']) == ['0', '1', '0', '1']
+
+
+def test_system_includes_irq_time():
+    _, sections = decode_sa_buffer(sa_file())
+    d = np.diff(np.array(CPU_ALL, dtype=float), axis=0)
+    user, nice, sys_, idle, iowait, steal, hardirq, softirq = d[:, :8].T
+    total = d[:, :8].sum(axis=1)
+    np.testing.assert_allclose(sections['CPU']['%system'], 100 * (sys_ + hardirq + softirq) / total)
+    np.testing.assert_allclose(sections['CPU']['%user'], 100 * (user - d[:, 8]) / total)
+
+
+def test_memused_counts_slab_as_free():
+    _, sections = decode_sa_buffer(sa_file())
+    m = np.array(MEMORY[1:], dtype=float)
+    free, buffers, cached, total, slab = m[:, 0], m[:, 1], m[:, 2], m[:, 3], m[:, 12]
+    nouse = free + buffers + cached + slab
+    # Quando buffers + cache + slab passam do total, o sar usa só a memória livre
+    expected = np.where(nouse > total, total - free, total - nouse)
+    np.testing.assert_allclose(sections['MEMORY']['kbmemused'], expected)
+    assert nouse[1] > total[1]
+
+
+def test_restart_starts_new_interval():
+    # Após o RESTART o primeiro registro só serve de base: uma linha a menos
+    _, sections = decode_sa_buffer(sa_file(restart_after=0))
+    np.testing.assert_array_equal(sections['CPU']['epoch'], [START + 2])
+    np.testing.assert_allclose(sections['CPU']['%user'], [40.0])
+
+
+def record_ends(data):
+    """Offset do fim de cada registro de sa_file() (todos têm o mesmo tamanho)."""
+    start = read_sa_header(data)['data_offset']
+    size = (len(data) - start) // len(CPU_ALL)
+    return start, [start + size * (i + 1) for i in range(len(CPU_ALL))]
+
+
+def test_tail_reads_growing_file(tmp_path):
+    data = sa_file()
+    start, ends = record_ends(data)
+    path = tmp_path / 'report.sar'
+    tail = SATail(str(path))
+    assert tail.poll() == {}                      # sar ainda não criou o arquivo
+
+    def grow(size):
+        path.write_bytes(data[:size])
+        return tail.poll()
+
+    assert grow(FILE_MAGIC_SIZE + 10) == {}       # cabeçalho truncado
+    assert tail.hdr is None
+    assert grow(start) == {} and tail.offset == start
+    # Primeiro registro: só base das diferenças
+    assert grow(ends[0]) == {} and tail.offset == ends[0]
+    # Registro pela metade fica para o próximo poll
+    assert grow(ends[0] + 30) == {} and tail.offset == ends[0]
+    first = grow(ends[1])
+    assert tail.offset == ends[1]
+    assert grow(ends[1]) == {} and tail.offset == ends[1]
+    second = grow(ends[2])
+    assert tail.offset == ends[2] == len(data)
+
+    _, full = decode_sa_buffer(data)
+    for section, columns in full.items():
+        for col, values in columns.items():
+            np.testing.assert_array_equal(np.concatenate([first[section][col], second[section][col]]),
+                                          values, err_msg=f'{section} {col}')
+
+
+def test_tail_restart_between_polls(tmp_path):
+    data = sa_file(restart_after=0)
+    _, ends = record_ends(sa_file())
+    path = tmp_path / 'report.sar'
+    tail = SATail(str(path))
+    path.write_bytes(data[:ends[0]])
+    assert tail.poll() == {}
+    # O RESTART chega junto com o registro seguinte: ele vira base, sem linha
+    path.write_bytes(data[:len(data) - (ends[2] - ends[1])])
+    assert tail.poll() == {}
+    path.write_bytes(data)
+    rows = tail.poll()
+    np.testing.assert_array_equal(rows['CPU']['epoch'], [START + 2])
+    np.testing.assert_allclose(rows['CPU']['%user'], [40.0])
+    assert tail.offset == len(data)
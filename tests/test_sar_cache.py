@@ -0,0 +1,75 @@
+"""
+SectionCache: entradas invalidadas quando o arquivo ou a versão mudam,
+remoção LRU pelo tamanho do diretório e diretório sem escrita.
+"""
+
+import os
+
+import numpy as np
+
+import sar_cache
+from sar_cache import SectionCache
+
+TAG = "parser"
+
+
+def sections(n=100, seed=0):
+    rng = np.random.default_rng(seed)
+    return {'CPU': {'epoch': np.arange(n, dtype=np.int64) + 1_700_000_000,
+                    '%user': rng.random(n).astype(np.float32)}}
+
+
+def write_sar(path, content):
+    path.write_bytes(content)
+    return path
+
+
+def test_roundtrip_and_invalidation(tmp_path, monkeypatch):
+    sar = write_sar(tmp_path / 'a.sar', b'primeira captura')
+    cache = SectionCache(tmp_path / 'cache')
+    assert cache.load(sar, TAG, frames=False) is None
+    data = sections()
+    cache.store(sar, TAG, data)
+    loaded = cache.load(sar, TAG, frames=False)
+    np.testing.assert_array_equal(loaded['CPU']['epoch'], data['CPU']['epoch'])
+    np.testing.assert_array_equal(loaded['CPU']['%user'], data['CPU']['%user'])
+
+    # Outra tag (outro leitor) não enxerga a entrada
+    assert SectionCache(tmp_path / 'cache').load(sar, 'outro', frames=False) is None
+    # Conteúdo diferente: outro hash, entrada antiga ignorada (cache novo, sem o hash memorizado)
+    write_sar(sar, b'captura regravada')
+    assert SectionCache(tmp_path / 'cache').load(sar, TAG, frames=False) is None
+    # Nova versão do parser invalida tudo
+    write_sar(sar, b'primeira captura')
+    assert SectionCache(tmp_path / 'cache').load(sar, TAG, frames=False) is not None
+    monkeypatch.setattr(sar_cache, 'CACHE_VERSION', sar_cache.CACHE_VERSION + 1)
+    assert SectionCache(tmp_path / 'cache').load(sar, TAG, frames=False) is None
+
+
+def test_lru_eviction(tmp_path):
+    sars = [write_sar(tmp_path / f'{i}.sar', f'captura {i}'.encode()) for i in range(4)]
+    cache = SectionCache(tmp_path / 'cache', max_bytes=10 ** 9)
+    for i, sar in enumerate(sars):
+        cache.store(sar, TAG, sections(seed=i))
+        entry = cache.entry_path(sar, TAG)
+        os.utime(entry, (1000 + i, 1000 + i))
+    size = cache.entry_path(sars[0], TAG).stat().st_size
+
+    # A mais antiga (0) foi lida agora: passa a ser a mais recente
+    assert cache.load(sars[0], TAG, frames=False) is not None
+    cache.max_bytes = 2 * size + size // 2
+    cache.evict()
+    kept = [sar.name for sar in sars if cache.entry_path(sar, TAG).exists()]
+    assert kept == ['0.sar', '3.sar']
+
+
+def test_unwritable_dir_warns_once(tmp_path, capsys):
+    blocker = tmp_path / 'arquivo'
+    blocker.write_text('não é diretório')
+    sar = write_sar(tmp_path / 'a.sar', b'captura')
+    cache = SectionCache(blocker / 'cache')
+    cache.store(sar, TAG, sections())
+    cache.store(sar, TAG, sections())
+    assert cache.disabled
+    assert capsys.readouterr().err.count('seguindo sem cache') == 1
+    assert cache.load(sar, TAG, frames=False) is None
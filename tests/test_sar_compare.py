@@ -0,0 +1,94 @@
+"""
+sar_compare: n efetivo de séries autocorrelacionadas, Mann-Whitney com esse
+n (taxa de falso positivo perto de alpha) e cobertura do IC por bootstrap de
+blocos.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from sar_compare import (autocorrelation_time, block_bootstrap, compare_all, compare_samples,
+                         effective_sample_size, mann_whitney_u)
+
+
+def ar1(n, phi, rng, mean=0.0):
+    """AR(1) estacionário: tau integrado = (1 + phi) / (1 - phi)."""
+    e = rng.normal(size=n)
+    x = np.empty(n)
+    x[0] = e[0] / math.sqrt(1 - phi ** 2)
+    for i in range(1, n):
+        x[i] = phi * x[i - 1] + e[i]
+    return x + mean
+
+
+@pytest.mark.parametrize('phi', [0.0, 0.5, 0.8])
+def test_effective_sample_size(phi):
+    rng = np.random.default_rng(1)
+    x = ar1(20_000, phi, rng)
+    tau = (1 + phi) / (1 - phi)
+    assert autocorrelation_time(x) == pytest.approx(tau, rel=0.15)
+    assert effective_sample_size(x) == pytest.approx(len(x) / tau, rel=0.15)
+
+
+def test_u_matches_pairwise_count():
+    rng = np.random.default_rng(2)
+    a = rng.integers(0, 20, 60).astype(float)
+    b = rng.integers(5, 25, 45).astype(float)
+    u, p, effect = mann_whitney_u(a, b)
+    diff = a[:, None] - b[None, :]
+    assert u == pytest.approx((diff > 0).sum() + 0.5 * (diff == 0).sum())
+    assert effect == pytest.approx(((diff > 0).sum() - (diff < 0).sum()) / diff.size)
+    # n efetivo igual a n: mesma variância, mesmo p
+    assert mann_whitney_u(a, b, len(a), len(b))[1] == pytest.approx(p)
+    # Menos amostras independentes: p maior
+    assert mann_whitney_u(a, b, len(a) / 5, len(b) / 5)[1] > p
+
+
+def test_effective_n_controls_false_positives():
+    rng = np.random.default_rng(3)
+    naive = corrected = 0
+    reps = 200
+    for _ in range(reps):
+        a, b = ar1(400, 0.9, rng), ar1(400, 0.9, rng)
+        naive += mann_whitney_u(a, b)[1] < 0.05
+        corrected += mann_whitney_u(a, b, effective_sample_size(a), effective_sample_size(b))[1] < 0.05
+    # Sem o n efetivo, séries sem diferença "diferem" na maioria das vezes
+    assert naive / reps > 0.4
+    assert corrected / reps < 0.12
+
+
+def test_block_bootstrap_shapes_and_values():
+    rng = np.random.default_rng(4)
+    x = np.arange(50, dtype=float)
+    boot = block_bootstrap(x, 300, 7, rng)
+    assert set(boot) == {'mean', 'median', 'p99'}
+    assert all(v.shape == (300,) for v in boot.values())
+    assert boot['p99'].max() <= x.max() and boot['mean'].min() >= x.min()
+    # Um bloco do tamanho da série só pode reamostrar a própria série
+    np.testing.assert_allclose(block_bootstrap(x, 20, 50, rng)['mean'], x.mean())
+
+
+def test_block_bootstrap_ci_coverage():
+    rng = np.random.default_rng(5)
+    true_diff = 1.0
+    covered = 0
+    reps = 100
+    for i in range(reps):
+        a, b = ar1(400, 0.8, rng, mean=true_diff), ar1(400, 0.8, rng)
+        row = compare_samples(a, b, n_boot=300, seed=i)
+        covered += row['mean_low'] <= true_diff <= row['mean_high']
+    # Blocos de ~tau amostras cobrem um pouco abaixo do nominal (95%) em séries curtas
+    assert covered / reps >= 0.8
+
+
+def test_compare_all_is_reproducible():
+    rng = np.random.default_rng(6)
+    samples = {('A', 'cpu'): ar1(300, 0.5, rng, 10), ('B', 'cpu'): ar1(300, 0.5, rng, 9),
+               ('A', 'mem'): ar1(300, 0.5, rng), ('B', 'mem'): ar1(300, 0.5, rng)}
+    pairs = [('cpu', 'A', 'B'), ('mem', 'A', 'B'), ('io', 'A', 'B')]
+    rows = compare_all(samples, pairs, n_boot=200, jobs=1, seed=11)
+    assert [r['metric'] for r in rows] == ['cpu', 'mem']
+    assert rows == compare_all(samples, pairs, n_boot=200, jobs=1, seed=11)
+    assert rows[0]['significant'] and rows[0]['mean_low'] > 0
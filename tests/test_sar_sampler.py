@@ -0,0 +1,90 @@
+"""
+Leitura do arquivo do sar_sampler com intervalos abaixo de 1 s: todas as
+amostras viram linhas, com epochs fracionários estritamente crescentes (o
+MetricStore e o sar_align contam com isso).
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from sar_sampler import CPU_FIELDS, IO_FIELDS, MEMORY_KEYS, read_sample_file, write_block, write_end, write_header
+from sar_align import common_grid
+from sar_visualize import SARDataParser2
+
+START_NS = 1_700_000_000_550_000_000
+
+
+def write_samples(path, interval, n, jitter_ns=0, seed=0, wall_step_ns=0):
+    """
+    Arquivo com `n` amostras a cada `interval` s: CPU a 25% de user, sem discos.
+    `wall_step_ns` ajusta o relógio de parede na metade da captura (NTP).
+    """
+    rng = np.random.default_rng(seed)
+    cpu_nr = 2
+    widths = {'t': 1, 'wall': 1, 'cpu': (cpu_nr + 1) * CPU_FIELDS, 'mem': len(MEMORY_KEYS),
+              'io': IO_FIELDS, 'disk': 0}
+    offsets = np.round(np.arange(n) * interval * 1e9).astype(np.int64) + rng.integers(0, jitter_ns + 1, n)
+    ticks = np.round(np.arange(n) * interval * 100).astype(np.int64)
+    cpu = np.zeros((n, cpu_nr + 1, CPU_FIELDS), dtype=np.int64)
+    cpu[:, :, 0] = ticks[:, None]          # user
+    cpu[:, :, 3] = 3 * ticks[:, None]      # idle
+    wall = START_NS + offsets + np.where(np.arange(n) >= n // 2, wall_step_ns, 0)
+    block = {'t': offsets[:, None], 'wall': wall[:, None],
+             'cpu': cpu.reshape(n, -1), 'mem': np.ones((n, widths['mem']), dtype=np.int64),
+             'io': np.zeros((n, IO_FIELDS), dtype=np.int64), 'disk': np.zeros((n, 0), dtype=np.int64)}
+    with open(path, 'wb') as f:
+        write_header(f, SimpleNamespace(cpu_nr=cpu_nr, disks=[], widths=widths), interval)
+        write_block(f, block, n)
+        write_end(f, {})
+
+
+@pytest.mark.parametrize('interval', [0.1, 0.3, 0.4, 1])
+@pytest.mark.parametrize('jitter_ns', [0, 20_000_000])
+def test_every_sample_is_a_row(tmp_path, interval, jitter_ns):
+    path = tmp_path / 'run.proc'
+    write_samples(path, interval, 200, jitter_ns)
+    _, sections = read_sample_file(path)
+    for name in ('CPU', 'MEMORY', 'SWAP'):
+        epoch = sections[name]['epoch']
+        assert epoch.dtype == np.float64 and len(epoch) == 199
+        assert np.all(np.diff(epoch) > 0)
+        np.testing.assert_allclose(np.diff(epoch), interval, atol=2 * jitter_ns / 1e9 + 1e-6)
+    # Uma linha por núcleo em cada horário
+    assert np.all(np.diff(sections['PERCPU']['epoch'].reshape(-1, 2)[:, 0]) > 0)
+    # Intervalos de tamanhos diferentes, mesma taxa: contadores cumulativos
+    np.testing.assert_allclose(sections['CPU']['%user'], 25.0, atol=1.0)
+
+
+def test_every_keeps_rates(tmp_path):
+    path = tmp_path / 'run.proc'
+    write_samples(path, 0.1, 201)
+    _, sections = read_sample_file(path, every=10)
+    np.testing.assert_allclose(np.diff(sections['CPU']['epoch']), 1.0)
+    assert len(sections['CPU']['epoch']) == 20
+    np.testing.assert_allclose(sections['CPU']['%user'], 25.0, atol=1.0)
+
+
+def test_wall_clock_step_back(tmp_path):
+    # Relógio atrasado 5 s no meio da captura: o epoch segue o relógio monotônico
+    path = tmp_path / 'run.proc'
+    write_samples(path, 0.1, 100, wall_step_ns=-5 * 10**9)
+    _, sections = read_sample_file(path)
+    assert np.all(np.diff(sections['CPU']['epoch']) > 0)
+
+
+def test_store_keeps_sub_second_rows(tmp_path):
+    path = tmp_path / 'run.proc'
+    write_samples(path, 0.1, 601, jitter_ns=5_000_000)
+    parser = SARDataParser2()
+    parser.load_sa_file(str(path), 'VM1')
+    epoch = parser.store.epoch('VM1', 'CPU')
+    assert len(epoch) == 600
+    # ~10 linhas por segundo de captura
+    per_second = np.bincount(np.floor(epoch - epoch[0]).astype(int))
+    assert per_second[:-1].min() >= 9 and per_second.max() <= 11
+    assert len(parser.store.values('VM1', 'CPU', '%user')) == 600
+    # A grade comum do sar_align fica na resolução da coleta
+    grid = common_grid([epoch])
+    assert grid[1] - grid[0] == pytest.approx(0.1, abs=0.01)
@@ -0,0 +1,76 @@
+"""
+RunningStats e t-digest contra o NumPy exato: momentos idênticos ao cálculo
+direto (inclusive combinando blocos e acumuladores de vários arquivos), quantis
+exatos em séries curtas e com erro pequeno de posição nas longas.
+"""
+
+import numpy as np
+import pytest
+
+from CV_metric_final import stats
+from sar_stats import QUANTILES, RunningStats, merge_stats
+
+
+def samples(n, seed=0):
+    """Bimodal e com cauda longa, como CPU de uma run com dois patamares."""
+    rng = np.random.default_rng(seed)
+    low = rng.normal(20, 3, n // 2)
+    high = rng.lognormal(4, 0.4, n - n // 2)
+    return rng.permutation(np.concatenate([low, high]))
+
+
+def rank_error(x, estimate, q):
+    """Distância, em fração das amostras, entre a posição do estimado e q."""
+    x = np.sort(x)
+    lo = np.searchsorted(x, estimate, side='left') / len(x)
+    hi = np.searchsorted(x, estimate, side='right') / len(x)
+    return 0.0 if lo <= q <= hi else min(abs(lo - q), abs(hi - q))
+
+
+def check_moments(acc, x):
+    assert acc.count == len(x)
+    assert acc.mean == pytest.approx(x.mean(), rel=1e-12)
+    assert acc.std == pytest.approx(x.std(ddof=1), rel=1e-9)
+    assert acc.min == x.min() and acc.max == x.max()
+
+
+def test_short_series_is_exact():
+    # Até `compression` pontos o t-digest não comprime
+    x = samples(200)
+    acc = RunningStats.from_values(x, chunk=64)
+    check_moments(acc, x)
+    for _, q in QUANTILES:
+        assert acc.quantile(q) == pytest.approx(np.quantile(x, q), rel=1e-12)
+
+
+@pytest.mark.parametrize('parts', [1, 3, 8])
+def test_merge_matches_numpy(parts):
+    x = samples(120_000, seed=parts)
+    accs = [RunningStats.from_values(chunk, chunk=10_000) for chunk in np.array_split(x, parts)]
+    acc = merge_stats(accs)
+    check_moments(acc, x)
+    # Quantis pelo t-digest: erro de posição pequeno nas caudas e maior no
+    # meio, onde os centroides são grandes (daí a mediana exata no CV_metric_final)
+    for name, q in QUANTILES:
+        tolerance = 0.01 if q == 0.5 else 0.002
+        assert rank_error(x, acc.quantile(q), q) <= tolerance, name
+
+
+def test_merge_after_serialization():
+    x = samples(30_000, seed=7)
+    a, b = np.array_split(x, 2)
+    direct = merge_stats([RunningStats.from_values(a), RunningStats.from_values(b)])
+    restored = merge_stats([RunningStats.from_dict(RunningStats.from_values(a).to_dict()),
+                            RunningStats.from_dict(RunningStats.from_values(b).to_dict())])
+    check_moments(restored, x)
+    for _, q in QUANTILES:
+        assert restored.quantile(q) == pytest.approx(direct.quantile(q))
+
+
+def test_cv_metric_median_is_exact():
+    x = samples(50_001, seed=3)
+    acc = RunningStats.from_values(x)
+    assert stats(x)[1] == np.median(x)
+    # Com o acumulador, a mediana exata calculada no worker tem precedência
+    assert stats(acc, median=float(np.median(x)))[1] == np.median(x)
+    assert stats(acc)[1] != np.median(x)
@@ -0,0 +1,39 @@
+"""
+Horário local refeito a partir do epoch (MetricStore.frame): o fuso de cada
+registro, inclusive quando a captura atravessa a troca do horário de verão.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from sar_store import MetricStore, epoch_to_clock
+
+# Europa central: CEST começa em 31/03/2024 às 01:00 UTC e termina em 27/10/2024 às 01:00 UTC
+CET = 'CET-1CEST,M3.5.0,M10.5.0/3'
+SPRING = 1711846800
+AUTUMN = 1729990800
+
+
+@pytest.fixture
+def central_europe(monkeypatch):
+    monkeypatch.setenv('TZ', CET)
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_clock_follows_dst(central_europe):
+    epoch = np.array([SPRING - 1, SPRING, SPRING + 3600, AUTUMN - 1, AUTUMN])
+    assert list(epoch_to_clock(epoch)) == ['01:59:59', '03:00:00', '04:00:00', '02:59:59', '02:00:00']
+    # O primeiro registro não decide o fuso dos outros
+    assert list(epoch_to_clock(epoch[1:])) == ['03:00:00', '04:00:00', '02:59:59', '02:00:00']
+
+
+def test_frame_timestamp_across_dst(central_europe):
+    store = MetricStore()
+    epoch = SPRING + np.arange(-2, 2) * 60
+    store.put_columns('VM1', 'CPU', {'%user': np.arange(4.0)}, epoch=epoch)
+    assert list(store.frame('VM1', 'CPU')['timestamp']) == ['01:58:00', '01:59:00', '03:00:00', '03:01:00']
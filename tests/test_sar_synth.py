@@ -0,0 +1,22 @@
+"""
+O texto gerado pelo sar_synth tem o formato do sysstat (header por intervalo
+com -P ALL e -d, bloco 'Average:' com header) e o parser o lê por inteiro.
+"""
+
+import numpy as np
+import pytest
+
+from sar_synth import CLOCKS, LOCALES, generate_sar
+from sar_visualize import SARDataParser2
+
+
+@pytest.mark.parametrize('clock', CLOCKS)
+@pytest.mark.parametrize('locale', sorted(LOCALES))
+def test_generated_text_parses(locale, clock):
+    text = ''.join(generate_sar(5, cpus=2, locale=locale, clock=clock, disks=2))
+    sections = SARDataParser2().parse_sar_sections(text)
+    assert {k: len(v) for k, v in sections.items()} == {
+        'CPU': 5, 'PERCPU': 10, 'MEMORY': 5, 'SWAP': 5, 'IO': 5, 'DISK': 10}
+    assert sections['DISK']['DEV'].tolist() == ['vda', 'vdb'] * 5
+    for name in ('CPU', 'MEMORY', 'IO'):
+        assert np.diff(sections[name]['epoch'].to_numpy()).tolist() == [1] * 4
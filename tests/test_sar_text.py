@@ -0,0 +1,81 @@
+"""
+Parser de texto (SARDataParser2.parse_sar_sections) com a saída real do sar:
+com -P ALL, -d e -n DEV o header se repete antes de cada intervalo e cada
+atividade termina num bloco 'Average:' com header próprio.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from sar_visualize import SARDataParser2
+
+SAMPLE = Path(__file__).parent / 'data' / 'sar_multi_interval.txt'
+RESTART = Path(__file__).parent / 'data' / 'sar_restart.txt'
+
+
+def parse(text, **kwargs):
+    return SARDataParser2(**kwargs).parse_sar_sections(text)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'chunk_lines': 4}, {'vectorized': False}])
+def test_repeated_headers_keep_every_interval(kwargs):
+    sections = parse(SAMPLE.read_text(), **kwargs)
+    assert {k: len(v) for k, v in sections.items()} == {
+        'CPU': 3, 'PERCPU': 6, 'MEMORY': 3, 'SWAP': 3, 'IO': 3, 'DISK': 6, 'NET': 6}
+
+
+def test_average_block_is_not_data():
+    sections = parse(SAMPLE.read_text())
+    assert sections['CPU']['%user'].tolist() == [52.5, 51.0, 50.25]
+    assert sections['PERCPU']['CPU'].tolist() == ['0', '1'] * 3
+    assert sections['DISK']['DEV'].tolist() == ['vda', 'vdb'] * 3
+    assert sections['DISK']['%util'].tolist() == [97.6, 0.0, 96.8, 0.1, 98.4, 0.0]
+    assert sections['NET']['IFACE'].tolist() == ['lo', 'eth0'] * 3
+
+
+def test_epoch_crosses_midnight():
+    sections = parse(SAMPLE.read_text())
+    for name in ('CPU', 'MEMORY', 'IO'):
+        assert np.diff(sections[name]['epoch'].to_numpy()).tolist() == [1, 1]
+    disk = sections['DISK']['epoch'].to_numpy()
+    assert np.all(np.diff(disk[::2]) == 1)
+
+
+def test_localized_average():
+    sections = parse(SAMPLE.read_text().replace('Average:', 'Média:  '))
+    assert len(sections['PERCPU']) == 6 and len(sections['DISK']) == 6
+
+
+def test_loads_into_store():
+    parser = SARDataParser2()
+    with open(SAMPLE) as f:
+        parser.parse_sar_output(f, 'VM1')
+    assert len(parser.store.values('VM1', 'DISK', '%util')) == 6
+    assert parser.store.entities('VM1', 'PERCPU') == ['0', '1']
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'vectorized': False}])
+def test_restart_is_not_data(kwargs):
+    sections = parse(RESTART.read_text(), **kwargs)
+    assert {k: len(v) for k, v in sections.items()} == {'CPU': 3, 'PERCPU': 6, 'MEMORY': 3}
+    assert sections['CPU']['%user'].tolist() == [40.0, 10.0, 11.0]
+    assert sections['PERCPU']['CPU'].tolist() == ['0', '1'] * 3
+    assert not sections['PERCPU'].drop(columns='CPU').isna().any().any()
+
+
+def test_restart_keeps_day_after_midnight():
+    sections = parse(RESTART.read_text())
+    for name in ('CPU', 'MEMORY'):
+        assert np.diff(sections[name]['epoch'].to_numpy()).tolist() == [7, 1]
+
+
+def test_banner_of_any_host_closes_section():
+    # Dois arquivos concatenados sem as médias: o banner do segundo (outro
+    # host) cai no meio da última seção do primeiro e não é dado
+    text = ''.join(l for l in SAMPLE.read_text().splitlines(True) if not l.startswith('Average'))
+    sections = parse(text + '\n' + text.replace('(node01)', '(db-7.example.com)'))
+    assert len(sections['NET']) == 12 and sections['NET']['IFACE'].tolist() == ['lo', 'eth0'] * 6
+    assert len(sections['CPU']) == 6 and len(sections['PERCPU']) == 12
+    assert sections['CPU']['timestamp'].notna().all()
@@ -0,0 +1,33 @@
+"""
+Caminho --stats-only com o leitor nativo: estatísticas, anomalias e
+comparação sem importar o pandas (nem o matplotlib).
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from test_sar_sampler import write_samples
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCRIPT = """
+import runpy, sys
+sys.argv = ['sar_visualize.py', 'a.proc', 'b.proc', '--stats-only', '--no-cache', '-j', '1']
+runpy.run_path({script!r}, run_name='__main__')
+assert 'pandas' not in sys.modules, 'pandas importado'
+assert 'matplotlib' not in sys.modules, 'matplotlib importado'
+print('OK')
+"""
+
+
+def test_stats_only_does_not_import_pandas(tmp_path):
+    write_samples(tmp_path / 'a.proc', 1, 120)
+    write_samples(tmp_path / 'b.proc', 1, 120, seed=1)
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    out = subprocess.run([sys.executable, '-c', SCRIPT.format(script=str(ROOT / 'sar_visualize.py'))],
+                         cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    assert 'ESTATÍSTICAS RESUMIDAS' in out.stdout
+    assert out.stdout.rstrip().endswith('OK')